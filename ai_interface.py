@@ -1,10 +1,50 @@
 # ai_interface.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Dict, Optional
 from key_manager import KeyManager
+from cancellation import CancellationToken
+
+
+@dataclass
+class ToolCall:
+    """A provider-neutral tool invocation requested by a model"""
+    id: str
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Usage:
+    """
+    Token usage of one generate_response call, as reported by the provider.
+    prompt_tokens includes cached_tokens; image_tokens is an estimate of the
+    part of prompt_tokens spent on images, since providers do not report it.
+    """
+    provider: str = ""
+    model: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    image_tokens: int = 0
+    latency: float = 0.0  # Seconds from request to the end of the stream
+
+
+@dataclass
+class ModelResponse:
+    """Result of a single generate_response call"""
+    text: str
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    usage: Usage = field(default_factory=Usage)
+
 
 class AIModelInterface(ABC):
     """Abstract base class for AI model implementations"""
+
+    # Whether the adapter can declare provider-native tools (function calling)
+    supports_tools = False
+    # Whether the adapter keeps its own session next to the conversation history (Gemini)
+    is_stateful = False
     
     @abstractmethod
     def __init__(self, service_name: str):
@@ -14,20 +54,32 @@ class AIModelInterface(ABC):
             service_name: Name of the service ('openai', 'anthropic', 'google', 'x')
         """
         self.api_key = KeyManager.load_key(service_name)
+        self.base_url = KeyManager.get_base_url(service_name)
     
     @abstractmethod
     def generate_response(self, 
                          messages: List[Dict],
                          model: str,
-                         image_path: Optional[str] = None) -> str:
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """
         Generate response from the AI model
         Args:
             messages: List of conversation messages
             model: Model name to use
             image_path: Optional path to image file
+            cancel_token: Optional token that aborts the request when cancelled
+            tools: Optional provider-neutral tool specs (see tools.py); ignored
+                   unless supports_tools is True
+            on_tool_call: Called as soon as each tool call is complete in the stream
+            on_delta: Called with each chunk of response text as it streams in
         Returns:
-            str: Generated response
+            ModelResponse: Generated text, any requested tool calls and token usage
+        Raises:
+            TurnCancelledError: If cancel_token is cancelled before completion
         """
         pass
     
@@ -50,3 +102,18 @@ class AIModelInterface(ABC):
         """Return the name of the AI model"""
         pass
 
+    def record_exchange(self, user_text: str, answer: str) -> None:
+        """
+        Note an exchange that was answered without calling the model, e.g. from a cache.
+        Adapters that read the history on every call need nothing; adapters that keep
+        their own session (Gemini) add it there so their context matches the history.
+        """
+        pass
+
+    def reset_session(self, conversation_history: List[Dict]) -> None:
+        """
+        Start over from conversation_history, e.g. a cleared or resumed conversation.
+        Only adapters that keep their own session (Gemini) need to do anything.
+        """
+        pass
+
@@ -0,0 +1,272 @@
+# batch_runner.py
+"""
+Runs scripted conversation transcripts through ConversationManager without Tk.
+
+Each line of the input JSONL is one turn:
+
+    {"transcript": "zoo", "text": "What is this?", "image": "photos/giraffe.jpg", "expect_tool": "camera"}
+
+Turns with the same "transcript" run in file order in one conversation; lines
+without one are single-turn transcripts. "image" (relative to the input file)
+is shown to the conversation through a FakePicamera2; without it the turn has
+no camera. "expect_tool" is "camera", "search" or "none". Transcripts run
+concurrently on a worker pool, once per model. Replies are not played; with
+--audio they are synthesized to MP3 files instead.
+
+    python batch_runner.py turns.jsonl --models ChatGPT,Claude,Gemini,Grok,Perplexity
+    python batch_runner.py turns.jsonl --mock --workers 16   # throughput against the mock providers
+
+Writes results.jsonl (reply, tools used, per-stage timings per turn), the turn
+trace and the usage ledger to the output directory. Exits with status 1 when
+any turn failed or used other tools than expected.
+"""
+import os
+
+# Must be set before pygame is imported
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from conversation_store import ConversationStore, set_store
+from fake_camera import FakePicamera2
+from log_utils import setup_logging
+from turn_tracer import TurnTracer, set_tracer
+from usage_ledger import UsageLedger, set_ledger
+
+logger = logging.getLogger(__name__)
+
+MODELS = ["ChatGPT", "Claude", "Gemini", "Grok", "Perplexity"]
+
+# Trace stages that show a tool was used in a turn; "expect_tool" names one of them
+TOOL_STAGES = ("camera", "search")
+
+
+@dataclass
+class BatchTurn:
+    """One scripted turn"""
+    transcript: str
+    index: int
+    text: str
+    image: Optional[str] = None
+    expect_tool: Optional[str] = None
+
+
+def load_transcripts(path: Path) -> Dict[str, List[BatchTurn]]:
+    """Turns grouped by transcript, in file order"""
+    transcripts: Dict[str, List[BatchTurn]] = {}
+    with open(path, encoding="utf-8") as input_file:
+        for line_number, line in enumerate(input_file, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            transcript = str(entry.get("transcript") or f"line{line_number}")
+            image = entry.get("image")
+            if image and not Path(image).is_absolute():
+                image = str(path.parent / image)
+            turns = transcripts.setdefault(transcript, [])
+            turns.append(BatchTurn(transcript, len(turns), entry["text"], image, entry.get("expect_tool")))
+    return transcripts
+
+
+class BatchRunner:
+    """
+    Runs transcripts concurrently, each in its own ConversationManager.
+    The managers share one TTSManager, tool worker pool and provider clients.
+    """
+
+    def __init__(self, tracer: TurnTracer, workers: int = 8, audio_dir: Optional[Path] = None):
+        """
+        Args:
+            tracer: Tracer the turns are recorded with
+            workers: Transcripts run at once
+            audio_dir: Where to write synthesized replies; None skips speech
+        """
+        from conversation_manager import ConversationManager
+        from key_manager import KeyManager
+        from tool_executor import ToolExecutor
+        from tts_manager import TTSManager
+
+        self.conversation_manager_class = ConversationManager
+        self.tracer = tracer
+        self.workers = workers
+        self.audio_dir = audio_dir
+        self.tts_manager = TTSManager(KeyManager.get_key_path("openai"))
+        self.tool_executor = ToolExecutor(max_workers=workers * 2)
+
+    def run(self, transcripts: Dict[str, List[BatchTurn]], models: List[str]) -> List[Dict]:
+        """
+        Run every transcript with every model; results are in transcript and turn order.
+        A transcript that fails outright gets an error row per turn; the others still run.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers,
+                                                   thread_name_prefix="transcript") as pool:
+            futures = [
+                (model, turns, pool.submit(self.run_transcript, model, turns))
+                for model in models
+                for turns in transcripts.values()
+            ]
+            results = []
+            for model, turns, future in futures:
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    logger.error("%s/%s failed: %s", model, turns[0].transcript, e)
+                    results.extend(self.result_row(model, turn, None, f"Error: {e}", None) for turn in turns)
+        self.tool_executor.shutdown()
+        return results
+
+    @staticmethod
+    def result_row(model: str,
+                   turn: BatchTurn,
+                   turn_id: Optional[str],
+                   response: str,
+                   elapsed_ms: Optional[float]) -> Dict:
+        """Result of one turn; elapsed_ms is None for turns that never ran"""
+        return {
+            "model": model,
+            "transcript": turn.transcript,
+            "turn": turn.index,
+            "turn_id": turn_id,
+            "text": turn.text,
+            "image": turn.image,
+            "response": response,
+            "error": not response or response.startswith("Error"),
+            "expect_tool": turn.expect_tool,
+            "turn_ms": round(elapsed_ms, 1) if elapsed_ms is not None else None,
+        }
+
+    def run_transcript(self, model: str, turns: List[BatchTurn]) -> List[Dict]:
+        manager = self.conversation_manager_class(tts_manager=self.tts_manager,
+                                                  tool_executor=self.tool_executor,
+                                                  play_audio=False)
+        if model != "ChatGPT":
+            manager.set_ai_model(model)
+
+        results = []
+        for turn in turns:
+            turn_id = self.tracer.new_turn()
+            started = time.monotonic()
+            camera = None
+            try:
+                if turn.image:
+                    camera = FakePicamera2(source=turn.image)
+                    camera.start()
+                manager.set_camera(camera)
+                response = manager.get_response(turn.text, turn_id=turn_id)
+            except Exception as e:
+                # E.g. an unreadable image; the rest of the transcript still runs
+                response = f"Error: {e}"
+            finally:
+                if camera:
+                    camera.close()
+            elapsed_ms = (time.monotonic() - started) * 1000
+
+            result = self.result_row(model, turn, turn_id, response, elapsed_ms)
+            if self.audio_dir and not result["error"]:
+                try:
+                    audio = self.tts_manager.synthesize(response, model, turn_id=turn_id)
+                    (self.audio_dir / f"{model}_{turn.transcript}_{turn.index}.mp3").write_bytes(audio)
+                except Exception as e:
+                    logger.warning("%s/%s/%d: speech failed: %s", model, turn.transcript, turn.index, e)
+
+            results.append(result)
+            logger.info("%s/%s/%d: %.0f ms%s", model, turn.transcript, turn.index, elapsed_ms,
+                        " (error)" if result["error"] else "")
+        return results
+
+
+def add_trace(results: List[Dict], trace_path: Path) -> None:
+    """Add per-stage timings and the tools used to each result from the turn trace"""
+    stages: Dict[str, Dict[str, float]] = {}
+    if trace_path.exists():
+        with open(trace_path, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                entry = json.loads(line)
+                if "duration_ms" in entry:
+                    turn_stages = stages.setdefault(entry["turn_id"], {})
+                    turn_stages[entry["stage"]] = turn_stages.get(entry["stage"], 0.0) + entry["duration_ms"]
+
+    for result in results:
+        turn_stages = stages.get(result.pop("turn_id"), {})
+        result["stages"] = {stage: round(ms, 1) for stage, ms in sorted(turn_stages.items())}
+        result["tools"] = [stage for stage in TOOL_STAGES if stage in turn_stages]
+        expected = result["expect_tool"]
+        result["tool_ok"] = (expected is None
+                             or (expected == "none" and not result["tools"])
+                             or expected in result["tools"])
+
+
+def print_summary(results: List[Dict], elapsed: float) -> None:
+    print(f"{'model':<12}{'turns':>7}{'errors':>8}{'tool miss':>11}{'p50 ms':>10}{'p95 ms':>10}")
+    for model in dict.fromkeys(result["model"] for result in results):
+        rows = [result for result in results if result["model"] == model]
+        # Turns of transcripts that failed outright have no time
+        times = [row["turn_ms"] for row in rows if row["turn_ms"] is not None] or [0.0]
+        print(f"{model:<12}{len(rows):>7}{sum(row['error'] for row in rows):>8}"
+              f"{sum(not row['tool_ok'] for row in rows):>11}"
+              f"{TurnTracer.percentile(times, 0.50):>10.0f}{TurnTracer.percentile(times, 0.95):>10.0f}")
+    print(f"{len(results)} turns in {elapsed:.1f} s ({len(results) / elapsed:.1f} turns/s)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", type=Path, help="JSONL file of turns")
+    parser.add_argument("--models", default="ChatGPT", help=f"Comma-separated, from {','.join(MODELS)}")
+    parser.add_argument("--workers", type=int, default=8, help="Transcripts run at once")
+    parser.add_argument("--output", type=Path, help="Output directory (default traces/batch_<time>)")
+    parser.add_argument("--audio", action="store_true", help="Synthesize replies to MP3 files")
+    parser.add_argument("--mock", action="store_true", help="Use the local mock providers")
+    args = parser.parse_args()
+    setup_logging()
+
+    models = args.models.split(",")
+    unknown = [model for model in models if model not in MODELS]
+    if unknown:
+        parser.error(f"Unknown models: {', '.join(unknown)}")
+
+    output = args.output or Path("traces") / time.strftime("batch_%Y%m%d_%H%M%S")
+    output.mkdir(parents=True, exist_ok=True)
+    audio_dir = output / "audio" if args.audio else None
+    if audio_dir:
+        audio_dir.mkdir(exist_ok=True)
+
+    # Keep batch runs out of the app's trace, ledger and saved conversations
+    tracer = TurnTracer(output / "turns.jsonl")
+    set_tracer(tracer)
+    ledger = UsageLedger(output / "usage.sqlite3")
+    set_ledger(ledger)
+    set_store(ConversationStore(enabled=False))
+
+    transcripts = load_transcripts(args.input)
+    with contextlib.ExitStack() as stack:
+        if args.mock:
+            from mock_provider_server import MockBehavior, MockProviderServer
+            mock_server = stack.enter_context(MockProviderServer(MockBehavior()))
+            os.environ.update(mock_server.environment())
+
+        started = time.monotonic()
+        results = BatchRunner(tracer, args.workers, audio_dir).run(transcripts, models)
+        elapsed = time.monotonic() - started
+
+    tracer.close()
+    ledger.close()
+    add_trace(results, output / "turns.jsonl")
+    with open(output / "results.jsonl", "w", encoding="utf-8") as results_file:
+        for result in results:
+            results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print_summary(results, elapsed)
+    print(f"Results written to {output / 'results.jsonl'}")
+    return 1 if any(result["error"] or not result["tool_ok"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# benchmarks/bench_camera.py
+"""
+Camera pipeline benchmark on FakePicamera2.
+
+Measures the preview loop's frame rate (capture, flip and resize as in
+DualCameraGPTApp.capture_preview_loop), CameraManager.capture_and_convert
+latency and CameraManager.capture_high_res time, without camera hardware.
+
+    python benchmarks/bench_camera.py --source ~/Pictures/samples --fps 30
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+from camera_utils import CameraManager
+from fake_camera import FakePicamera2
+from turn_tracer import TurnTracer
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "p50_ms": TurnTracer.percentile(samples, 0.50) * 1000,
+        "p95_ms": TurnTracer.percentile(samples, 0.95) * 1000,
+    }
+
+
+def time_calls(call: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_preview(camera: FakePicamera2, seconds: float) -> Dict[str, float]:
+    """Run the preview loop's per-frame work (minus Tk) for a while"""
+    frames = 0
+    frame_times = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        frame = camera.capture_array()
+        image = Image.fromarray(frame)
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+        image.resize((426, 240), Image.Resampling.LANCZOS)
+        frame_times.append(time.perf_counter() - started)
+        frames += 1
+    stats = summarize(frame_times)
+    stats["fps"] = frames / seconds
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Camera pipeline benchmark on the fake camera")
+    parser.add_argument("--source", help="Image or directory to replay (default: test pattern)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the fake camera")
+    parser.add_argument("--preview-seconds", type=float, default=5.0)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--high-res-iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.source:
+        os.environ["CHATBOT4KIDS_CAMERA_SOURCE"] = args.source
+    os.environ["CHATBOT4KIDS_CAMERA_FPS"] = str(args.fps)
+    camera = CameraManager.setup_camera("fake")
+    if camera is None:
+        print("Could not set up the fake camera")
+        return 1
+
+    # First use decodes and scales the source frames; keep that out of the numbers
+    camera.capture_array()
+
+    results = {"preview": bench_preview(camera, args.preview_seconds)}
+    results["capture_and_convert"] = summarize(
+        time_calls(lambda: CameraManager.capture_and_convert(camera), args.iterations)
+    )
+
+    saved = []
+    results["capture_high_res"] = summarize(
+        time_calls(lambda: saved.append(CameraManager.capture_high_res(camera)), args.high_res_iterations)
+    )
+    for path in saved:
+        if path and Path(path).exists():
+            os.remove(path)
+    camera.close()
+
+    print(f"{'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'fps':>8}")
+    for stage, stats in results.items():
+        fps = f"{stats['fps']:>8.1f}" if "fps" in stats else ""
+        print(f"{stage:<24}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{fps}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
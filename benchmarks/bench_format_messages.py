@@ -0,0 +1,132 @@
+# benchmarks/bench_format_messages.py
+"""
+Microbenchmark for provider message formatting.
+
+For histories of 10 to 500 turns (with tool rounds and earlier camera images)
+it times format_messages for a new turn in two ways:
+
+    rebuild      a fresh transcript, i.e. every message is converted again
+    incremental  the adapter's cached transcript, as in a running conversation
+
+The incremental cost should stay flat as the history grows.
+
+    python benchmarks/bench_format_messages.py
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from key_manager import KeyManager
+
+# The adapters only build clients here; nothing is sent
+for service in KeyManager.DEFAULT_KEYS:
+    os.environ.setdefault(KeyManager.env_var(service, "KEY"), "benchmark")
+
+from chatgpt import ChatGPTModel
+from claude import ClaudeModel
+from grok import GrokModel
+from incremental_transcript import IncrementalTranscript
+from turn_tracer import TurnTracer
+
+TURN_COUNTS = [10, 50, 100, 250, 500]
+
+# Stand-in for a 512x512 JPEG from CameraManager.capture_and_convert
+IMAGE_URL = "data:image/jpeg;base64," + base64.b64encode(os.urandom(40_000)).decode()
+
+
+def build_history(turns: int) -> List[Dict]:
+    """A history with a camera image every 10th turn and a search every 7th"""
+    history = [{"role": "system", "content": "You are a helpful assistant."}]
+    for turn in range(turns):
+        if turn % 10 == 0:
+            history.append({"role": "user", "content": [
+                {"type": "text", "text": f"What is this? ({turn})"},
+                {"type": "image_url", "image_url": {"url": IMAGE_URL}},
+            ]})
+        else:
+            history.append({"role": "user", "content": f"Tell me something about topic {turn}"})
+        if turn % 7 == 0:
+            call_id = f"call_{turn}"
+            history.append({"role": "assistant", "content": "Let me look that up.", "tool_calls": [
+                {"id": call_id, "name": "online_search", "arguments": {"query": f"topic {turn}"}}
+            ]})
+            history.append({"role": "tool", "tool_call_id": call_id, "name": "online_search",
+                            "content": "Search results " * 40})
+        history.append({"role": "assistant", "content": "Here is an answer about the topic. " * 8})
+    return history
+
+
+def time_call(call, repeats: int) -> float:
+    """Median seconds per call"""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return TurnTracer.percentile(samples, 0.5)
+
+
+def bench_adapter(adapter, turns: int, repeats: int, image_path: str) -> Dict[str, float]:
+    history = build_history(turns)
+
+    def rebuild() -> None:
+        adapter.transcript = IncrementalTranscript(adapter.transcript.format_message,
+                                                   adapter.transcript.merge_roles)
+        adapter.format_messages(history)
+
+    rebuild_seconds = time_call(rebuild, repeats)
+
+    # Warm the cache, then time one new turn at a time like a running conversation
+    adapter.format_messages(history)
+    samples = []
+    for turn in range(repeats):
+        history.append({"role": "user", "content": f"Next question {turn}"})
+        started = time.perf_counter()
+        adapter.format_messages(history)
+        samples.append(time.perf_counter() - started)
+        history.append({"role": "assistant", "content": "Another answer."})
+
+    # A camera turn attaches the image to the newest message
+    history.append({"role": "user", "content": [
+        {"type": "text", "text": "What is this?"},
+        {"type": "image_url", "image_url": {"url": IMAGE_URL}},
+    ]})
+    image_seconds = time_call(lambda: adapter.format_messages(history, image_path), repeats)
+
+    return {
+        "rebuild_us": rebuild_seconds * 1e6,
+        "incremental_us": TurnTracer.percentile(samples, 0.5) * 1e6,
+        "image_turn_us": image_seconds * 1e6,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Provider message formatting microbenchmark")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--turns", default=",".join(map(str, TURN_COUNTS)))
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as image_file:
+        image_file.write(os.urandom(40_000))
+    try:
+        print(f"{'adapter':<10}{'turns':>7}{'rebuild us':>14}{'incremental us':>16}{'image turn us':>15}")
+        for adapter_class in (ChatGPTModel, ClaudeModel, GrokModel):
+            adapter = adapter_class()
+            for turns in map(int, args.turns.split(",")):
+                stats = bench_adapter(adapter, turns, args.repeats, image_file.name)
+                print(f"{adapter.get_model_name():<10}{turns:>7}{stats['rebuild_us']:>14.1f}"
+                      f"{stats['incremental_us']:>16.1f}{stats['image_turn_us']:>15.1f}")
+    finally:
+        os.remove(image_file.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
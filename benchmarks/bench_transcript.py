@@ -0,0 +1,116 @@
+# benchmarks/bench_transcript.py
+"""
+Transcript widget benchmark over a simulated all-day session.
+
+Plays back an 8-hour conversation (one exchange every 10 seconds by default,
+each reply streamed in small pieces) into TranscriptView and reports the
+cost per exchange in blocks, so growth over the session is visible. With
+the bounded view the first and last blocks should cost about the same.
+
+Needs a display (run under xvfb-run on a headless machine):
+
+    python benchmarks/bench_transcript.py --hours 8
+
+--model-only replays the same session into TranscriptModel alone (the
+message bookkeeping, trimming and paging math) and needs no display; it
+does not measure the Text widget.
+"""
+import argparse
+import sys
+import time
+import tkinter as tk
+from pathlib import Path
+from tkinter import font
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transcript_view import TranscriptModel, TranscriptView
+from turn_tracer import TurnTracer
+
+COLORS = {"human": "#666666", "ChatGPT": "#10a37f"}
+REPLY = "Octopuses have three hearts and blue blood, and they can change color in a fraction of a second. "
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Transcript widget cost over a long session")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--exchange-seconds", type=float, default=10.0, help="Simulated time between exchanges")
+    parser.add_argument("--deltas", type=int, default=40, help="Streamed pieces per reply")
+    parser.add_argument("--blocks", type=int, default=8)
+    parser.add_argument("--model-only", action="store_true", help="Measure TranscriptModel without a widget")
+    args = parser.parse_args()
+
+    exchanges = int(args.hours * 3600 / args.exchange_seconds)
+    per_block = max(1, exchanges // args.blocks)
+    if args.model_only:
+        return run_model_only(exchanges, per_block, args.deltas)
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No display available ({e}); run under xvfb-run, or use --model-only")
+        return 1
+    root.geometry("1024x600")
+    view = TranscriptView(root, font.Font(size=15), COLORS, height=10)
+    view.text.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    samples = []
+    print(f"{'exchanges':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for exchange in range(exchanges):
+        started = time.perf_counter()
+        view.add_message("human", "You: ", f"Tell me a fun fact ({exchange})")
+        message_id = view.begin_message("ChatGPT", "ChatGPT: ")
+        for piece in range(args.deltas):
+            view.append_text(message_id, REPLY[piece % 10::10][:8])
+            if piece % 8 == 0:
+                root.update()  # Lets the per-frame flush run mid-stream
+        view.finish_message(message_id)
+        # Wait for the batched flush, as the event loop would
+        time.sleep(TranscriptView.FRAME_MS / 1000)
+        root.update()
+        samples.append(time.perf_counter() - started - TranscriptView.FRAME_MS / 1000)
+
+        if len(samples) == per_block:
+            print(f"{exchange + 1:>12}{TurnTracer.percentile(samples, 0.5) * 1000:>10.2f}"
+                  f"{TurnTracer.percentile(samples, 0.95) * 1000:>10.2f}")
+            samples = []
+
+    root.destroy()
+    return 0
+
+
+def run_model_only(exchanges: int, per_block: int, deltas: int, max_visible: int = 200) -> int:
+    """Replay the session into TranscriptModel, flushing like TranscriptView does every few pieces"""
+    model = TranscriptModel()
+
+    def flush() -> None:
+        model.take_changed()
+        model.take_new()
+        model.trim(max_visible)
+
+    samples = []
+    print(f"{'exchanges':>12}{'p50 us':>10}{'p95 us':>10}{'held':>8}")
+    for exchange in range(exchanges):
+        started = time.perf_counter()
+        model.add("human", "You: ", f"Tell me a fun fact ({exchange})")
+        message = model.add("ChatGPT", "ChatGPT: ", "", streaming=True)
+        for piece in range(deltas):
+            if model.mark_dirty(message.id) is not None:
+                message.text += REPLY[piece % 10::10][:8]
+            if piece % 8 == 0:
+                flush()
+        model.mark_dirty(message.id)
+        message.streaming = False
+        flush()
+        samples.append(time.perf_counter() - started)
+
+        if len(samples) == per_block:
+            print(f"{exchange + 1:>12}{TurnTracer.percentile(samples, 0.5) * 1e6:>10.1f}"
+                  f"{TurnTracer.percentile(samples, 0.95) * 1e6:>10.1f}{len(model.messages):>8}")
+            samples = []
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
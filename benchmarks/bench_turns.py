@@ -0,0 +1,207 @@
+# benchmarks/bench_turns.py
+"""
+End-to-end turn latency benchmark against the local mock providers.
+
+Drives ConversationManager through scripted text, camera and search turns for
+each model, with mock_provider_server.py standing in for every API, and reports
+p50/p95 per stage from the turn traces. Runs headless: audio goes to SDL's
+dummy driver and the camera is FakePicamera2 (set CHATBOT4KIDS_CAMERA_SOURCE
+to replay real photos instead of the test pattern).
+
+    python benchmarks/bench_turns.py                   # compare with the baseline
+    python benchmarks/bench_turns.py --update-baseline # record a new baseline
+
+Exits with status 1 when a stage's p50 regresses past the tolerance.
+"""
+import os
+
+# Must be set before pygame is imported
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from camera_utils import CameraManager
+from conversation_store import ConversationStore, set_store
+from mock_provider_server import MockBehavior, MockProviderServer
+from search_cache import SearchCache, set_search_cache
+from turn_tracer import TurnTracer, set_tracer
+from usage_ledger import UsageLedger, set_ledger
+
+BASELINE_PATH = Path(__file__).with_name("baseline_turns.json")
+
+SCENARIOS = {
+    "text": "Tell me a fun fact about octopuses",
+    # Same question again: answered from the response cache
+    "text_repeat": "Tell me a fun fact about octopuses",
+    "camera": "What is this?",
+    # Same view and question again: answered from the scene cache
+    "camera_repeat": "What is this?",
+    "search": "Can you search the news about the Mars rover?",
+    # Same search again: answered from the search cache
+    "search_repeat": "Can you search the news about the Mars rover?",
+}
+
+DEFAULT_MODELS = ["ChatGPT", "Claude", "Gemini", "Grok"]
+
+# Models the router uses for small talk; like the real ones, they start answering sooner
+SMALL_MODELS = ["gpt-4o-mini", "claude-3-5-haiku-20241022", "gemini-1.5-flash-8b"]
+
+
+def run_benchmark(models: List[str],
+                  iterations: int,
+                  warmup: int,
+                  behavior: MockBehavior) -> Dict[str, Dict[str, float]]:
+    """
+    Run every scenario for every model
+    Returns:
+        Dict[str, Dict[str, float]]: "model/scenario/stage" -> count, p50_ms, p95_ms
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="bench_turns_"))
+    trace_path = workdir / "turns.jsonl"
+    tracer = TurnTracer(trace_path)
+    set_tracer(tracer)
+    # Mock traffic stays out of the real usage ledger
+    ledger = UsageLedger(workdir / "usage.sqlite3")
+    set_ledger(ledger)
+    store = ConversationStore(workdir / "conversations.sqlite3")
+    set_store(store)
+    search_cache = SearchCache()
+    set_search_cache(search_cache)
+
+    turn_keys: Dict[str, str] = {}
+    with MockProviderServer(behavior) as server:
+        os.environ.update(server.environment())
+        from conversation_manager import ConversationManager
+
+        manager = ConversationManager()
+        manager.set_camera(CameraManager.setup_camera("fake"))
+        recording = workdir / "recording.mp3"
+        recording.write_bytes(b"\x00" * 1024)
+
+        for model in models:
+            manager.set_ai_model(model)
+            for scenario, prompt in SCENARIOS.items():
+                for iteration in range(warmup + iterations):
+                    manager.clear_history()
+                    if scenario != "camera_repeat":
+                        manager.scene_cache.clear()
+                    if scenario != "text_repeat":
+                        manager.response_cache.clear()
+                    if scenario != "search_repeat":
+                        search_cache.clear()
+                    if not scenario.endswith("_repeat"):
+                        manager.tts_manager.clear_audio_cache()
+                    turn_id = tracer.new_turn()
+                    if iteration >= warmup:
+                        turn_keys[turn_id] = f"{model}/{scenario}"
+
+                    with tracer.span(turn_id, "transcribe"):
+                        manager.transcribe_audio(recording)
+                    response = manager.get_response(prompt, turn_id=turn_id)
+                    if response.startswith("Error"):
+                        raise RuntimeError(f"{model}/{scenario}: {response}")
+
+                    # Playback start is recorded by the player thread
+                    player = manager.tts_manager.current_thread
+                    if player:
+                        player.join(timeout=10.0)
+
+        manager.tool_executor.shutdown()
+
+    tracer.close()
+    ledger.close()
+    store.close()
+
+    durations: Dict[str, List[float]] = {}
+    with open(trace_path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            entry = json.loads(line)
+            key = turn_keys.get(entry["turn_id"])
+            if not key:
+                continue
+            if "duration_ms" in entry:
+                durations.setdefault(f"{key}/{entry['stage']}", []).append(entry["duration_ms"])
+            elif entry["stage"] == "camera.captures" and entry["value"] > 1:
+                raise RuntimeError(f"{key}: {entry['value']} camera captures in one turn")
+
+    return {
+        key: {
+            "count": len(values),
+            "p50_ms": TurnTracer.percentile(values, 0.50),
+            "p95_ms": TurnTracer.percentile(values, 0.95),
+        }
+        for key, values in sorted(durations.items())
+    }
+
+
+def find_regressions(results: Dict[str, Dict[str, float]],
+                     baseline: Dict[str, Dict[str, float]],
+                     tolerance: float,
+                     slack_ms: float) -> List[str]:
+    """List stages whose p50 exceeds baseline * (1 + tolerance) + slack_ms"""
+    regressions = []
+    for key, stats in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        limit = reference["p50_ms"] * (1 + tolerance) + slack_ms
+        if stats["p50_ms"] > limit:
+            regressions.append(f"{key}: p50 {stats['p50_ms']:.1f} ms > {limit:.1f} ms "
+                               f"(baseline {reference['p50_ms']:.1f} ms)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="Comma-separated model names")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--small-first-token-ms", type=float, default=80.0,
+                        help="First-token latency of the small models")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p50 increase")
+    parser.add_argument("--slack-ms", type=float, default=25.0, help="Allowed absolute p50 increase")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    behavior = MockBehavior(
+        first_token_latency=args.first_token_ms / 1000,
+        model_latency={model: args.small_first_token_ms / 1000 for model in SMALL_MODELS},
+        tokens_per_second=args.tokens_per_second,
+        transcription_latency=0.1,
+        speech_latency=0.1,
+        speech_seconds=0.2,
+    )
+    results = run_benchmark(args.models.split(","), args.iterations, args.warmup, behavior)
+
+    print(f"{'model/scenario/stage':<44}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for key, stats in results.items():
+        print(f"{key:<44}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = find_regressions(results, baseline, args.tolerance, args.slack_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,27 @@
 # camera_utils.py
-from picamera2 import Picamera2
 from PIL import Image, ImageTk
 import datetime
 import os
 from pathlib import Path
 from typing import Optional
+import logging
+from fake_camera import FakePicamera2
+from image_policy import ImagePolicy, ImageSpec
+
+logger = logging.getLogger(__name__)
+
+try:
+    from picamera2 import Picamera2
+except ImportError:
+    # Not a Raspberry Pi; the app and benchmarks run without a camera
+    Picamera2 = None
+
+# CHATBOT4KIDS_CAMERA=fake forces the replaying fake camera and =real disables it.
+# CHATBOT4KIDS_CAMERA_SOURCE is the image or directory of images to replay; when it
+# is set, the fake camera is also used whenever no real camera is found.
+CAMERA_ENV = "CHATBOT4KIDS_CAMERA"
+CAMERA_SOURCE_ENV = "CHATBOT4KIDS_CAMERA_SOURCE"
+CAMERA_FPS_ENV = "CHATBOT4KIDS_CAMERA_FPS"
 
 class CameraManager:
     """Manages single camera operations"""
@@ -16,24 +33,63 @@ class CameraManager:
         Returns:
             bool: True if camera is available, False otherwise
         """
+        return CameraManager.camera_backend() is not None
+
+    @staticmethod
+    def camera_backend() -> Optional[str]:
+        """
+        Decide which camera backend to use
+        Returns:
+            Optional[str]: 'real', 'fake', or None if there is no camera
+        """
+        mode = os.environ.get(CAMERA_ENV, "").lower()
+        if mode == "fake":
+            return "fake"
+        if CameraManager._real_camera_present():
+            return "real"
+        if mode != "real" and os.environ.get(CAMERA_SOURCE_ENV):
+            logger.info("No camera found; replaying frames from %s", os.environ[CAMERA_SOURCE_ENV])
+            return "fake"
+        return None
+
+    @staticmethod
+    def create_fake_camera() -> FakePicamera2:
+        """Create a fake camera from the CHATBOT4KIDS_CAMERA_* settings"""
+        return FakePicamera2(
+            0,
+            source=os.environ.get(CAMERA_SOURCE_ENV) or None,
+            fps=float(os.environ.get(CAMERA_FPS_ENV, "30"))
+        )
+
+    @staticmethod
+    def _real_camera_present() -> bool:
+        if Picamera2 is None:
+            logger.debug("Camera not available: picamera2 is not installed")
+            return False
         try:
             cam = Picamera2(0)
             cam.close()
-            print("[DEBUG] Camera detected")
+            logger.debug("Camera detected")
             return True
         except Exception as e:
-            print(f"[DEBUG] Camera not available: {e}")
+            logger.debug("Camera not available: %s", e)
             return False
 
     @staticmethod
-    def setup_camera() -> Optional[Picamera2]:
+    def setup_camera(backend: Optional[str] = None) -> Optional[Picamera2]:
         """
         Setup single camera with error handling
+        Args:
+            backend: 'real' or 'fake'; detected when omitted
         Returns:
             Optional[Picamera2]: Initialized camera object or None if failed
         """
         try:
-            camera = Picamera2(0)
+            backend = backend or CameraManager.camera_backend()
+            if backend is None:
+                logger.debug("No camera to set up")
+                return None
+            camera = CameraManager.create_fake_camera() if backend == "fake" else Picamera2(0)
             
             # Create preview configuration
             preview_config = camera.create_preview_configuration(
@@ -52,11 +108,11 @@ class CameraManager:
             })
             
             camera.start()
-            print("[DEBUG] Camera successfully initialized")
+            logger.debug("Camera successfully initialized")
             return camera
             
         except Exception as e:
-            print(f"[DEBUG] Error setting up camera: {e}")
+            logger.warning("Error setting up camera: %s", e)
             return None
 
     @staticmethod
@@ -67,13 +123,13 @@ class CameraManager:
             Optional[str]: Path to saved image or None if failed
         """
         if not camera:
-            print("[DEBUG] No camera provided")
+            logger.debug("No camera provided")
             return None
             
         original_config = None
         try:
             # Store original configuration
-            original_config = camera.camera_configuration
+            original_config = camera.camera_configuration()
             
             # Configure for high-res capture
             camera.stop()
@@ -98,12 +154,12 @@ class CameraManager:
             
             # Capture image
             camera.capture_file(str(filename))
-            print(f"[DEBUG] High-res image saved: {filename}")
+            logger.debug("High-res image saved: %s", filename)
             
             return str(filename)
             
         except Exception as e:
-            print(f"[DEBUG] Error capturing high-res image: {e}")
+            logger.warning("Error capturing high-res image: %s", e)
             return None
             
         finally:
@@ -114,20 +170,28 @@ class CameraManager:
                     camera.configure(original_config)
                     camera.start()
             except Exception as e:
-                print(f"[DEBUG] Error restoring camera configuration: {e}")
+                logger.warning("Error restoring camera configuration: %s", e)
 
     @staticmethod
-    def capture_and_convert(camera: Picamera2) -> Optional[str]:
+    def capture_and_convert(camera: Picamera2,
+                            output_path: Optional[str] = None,
+                            spec: Optional[ImageSpec] = None,
+                            provider: str = "") -> Optional[str]:
         """
         Capture and process image for AI analysis
+        Args:
+            camera: Camera to capture from
+            output_path: Where to save the JPEG (default: camera.jpg)
+            spec: Size, crop and quality (default: 512x512 center crop at quality 95)
+            provider: Model the image is for; only used for the logged token estimate
         Returns:
             Optional[str]: Path to processed image or None if failed
         """
         if not camera:
-            print("[DEBUG] No camera provided")
+            logger.debug("No camera provided")
             return None
             
-        final_path = "camera.jpg"
+        final_path = output_path or "camera.jpg"
         
         try:
             # Capture frame
@@ -136,29 +200,11 @@ class CameraManager:
                 raise ValueError("Captured frame is empty")
                 
             # Process image
-            img = Image.fromarray(image_array).convert('RGB')
-            
-            # Calculate resize dimensions
-            aspect_ratio = img.width / img.height
-            if aspect_ratio > 1:
-                resize_width = int(512 * aspect_ratio)
-                resize_height = 512
-            else:
-                resize_width = 512
-                resize_height = int(512 / aspect_ratio)
-            
-            # Resize and crop to 512x512
-            img = img.resize((resize_width, resize_height), Image.Resampling.LANCZOS)
-            left = (resize_width - 512) // 2
-            top = (resize_height - 512) // 2
-            img = img.crop((left, top, left + 512, top + 512))
-            
-            # Save processed image
-            img.save(final_path, "JPEG", quality=95)
-            print(f"[DEBUG] Processed image saved: {final_path}")
+            ImagePolicy.write(image_array, spec or ImageSpec(), final_path, provider)
+            logger.debug("Processed image saved: %s", final_path)
             return final_path
             
         except Exception as e:
-            print(f"[DEBUG] Error in image processing: {e}")
+            logger.warning("Error in image processing: %s", e)
             return None
 
@@ -0,0 +1,86 @@
+# cancellation.py
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TurnCancelledError(Exception):
+    """Raised when work belonging to a cancelled turn is interrupted"""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Turn cancelled: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Cancellation handle shared by every stage of a single conversation turn.
+
+    Producers (LLM streams, search, TTS) register cleanup callbacks, usually the
+    `close` method of an open HTTP stream, so a cancel tears the connection down
+    immediately instead of waiting for the next chunk to arrive.
+    """
+
+    def __init__(self, parent: Optional['CancellationToken'] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+        # Child tokens are cancelled together with their parent
+        if parent is not None:
+            parent.register(lambda: self.cancel(parent.reason or "cancelled"))
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the token and run all registered callbacks once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Error in cancellation callback: %s", e)
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Register a callback to run on cancellation
+        Returns:
+            Callable[[], None]: Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def unregister():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+                return unregister
+
+        # Already cancelled: run right away
+        callback()
+        return lambda: None
+
+    def raise_if_cancelled(self) -> None:
+        """Raise TurnCancelledError if the token has been cancelled"""
+        if self._event.is_set():
+            raise TurnCancelledError(self.reason or "cancelled")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or timeout expires. Returns True if cancelled"""
+        return self._event.wait(timeout)
+
+    def child(self) -> 'CancellationToken':
+        """Create a token that can be cancelled on its own or via this token"""
+        return CancellationToken(parent=self)
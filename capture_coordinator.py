@@ -0,0 +1,89 @@
+# capture_coordinator.py
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from camera_utils import CameraManager
+from image_policy import ImageSpec, estimate_image_tokens
+from turn_tracer import TurnTracer
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureCoordinator:
+    """
+    One camera capture per turn.
+
+    The first stage of a turn that needs a frame (a "what is this?" command or
+    a capture_camera tool call) captures it; every later request within the
+    freshness window gets the same processed image. Each turn writes to its
+    own file, so overlapping turns cannot overwrite each other's image.
+    close() records how many captures the turn took as the camera.captures
+    metric and removes the file.
+    """
+
+    def __init__(self,
+                 camera,
+                 turn_id: Optional[str],
+                 tracer: TurnTracer,
+                 freshness: float = 10.0,
+                 spec: Optional[ImageSpec] = None,
+                 provider: str = ""):
+        """
+        Args:
+            camera: Camera to capture from (may be None)
+            turn_id: Turn the captures belong to
+            tracer: Tracer for the camera span and the capture count
+            freshness: Seconds a captured frame may be reused
+            spec: How to shape the image (see image_policy.ImagePolicy)
+            provider: Model the image is for
+        """
+        self.camera = camera
+        self.turn_id = turn_id
+        self.tracer = tracer
+        self.freshness = freshness
+        self.spec = spec
+        self.provider = provider
+        self.output_path = str(Path(tempfile.gettempdir()) / f"camera_{os.getpid()}_{turn_id or id(self)}.jpg")
+        self.captures = 0
+        self.reuses = 0
+        self._lock = threading.Lock()
+        self._image_path: Optional[str] = None
+        self._captured_at = 0.0
+
+    def get_image(self) -> Optional[str]:
+        """
+        Get the turn's processed camera image, capturing it if needed
+        Returns:
+            Optional[str]: Path to the 512x512 JPEG, or None if there is no camera or capture failed
+        """
+        if not self.camera:
+            return None
+        # Concurrent tool calls wait for the capture in progress instead of starting another
+        with self._lock:
+            if self._image_path and time.monotonic() - self._captured_at <= self.freshness:
+                self.reuses += 1
+                logger.debug("Reusing camera frame from %.1fs ago", time.monotonic() - self._captured_at)
+                return self._image_path
+            with self.tracer.span(self.turn_id, "camera"):
+                self.captures += 1
+                self._image_path = CameraManager.capture_and_convert(self.camera, self.output_path,
+                                                                     self.spec, self.provider)
+            self._captured_at = time.monotonic()
+            if self._image_path:
+                self.tracer.metric(self.turn_id, "image.bytes", os.path.getsize(self._image_path),
+                                   tokens=estimate_image_tokens(self.provider, self._image_path))
+            return self._image_path
+
+    def close(self) -> None:
+        """Record the capture count and delete the turn's image"""
+        if self.camera:
+            self.tracer.metric(self.turn_id, "camera.captures", self.captures, reused=self.reuses)
+        if os.path.exists(self.output_path):
+            try:
+                os.remove(self.output_path)
+            except OSError as e:
+                logger.warning("Error removing %s: %s", self.output_path, e)
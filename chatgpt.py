@@ -1,16 +1,29 @@
 # chatgpt.py
 from ai_interface import AIModelInterface
-from openai import OpenAI
+from provider_clients import openai_client
 import base64
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from ai_interface import ModelResponse, ToolCall
 from system_prompts import SystemPrompts
+from cancellation import CancellationToken
+from image_policy import ImagePolicy, estimate_image_tokens
+from stream_utils import collect_chat_stream, count_image_parts, format_openai_tool_message, is_tool_message
+from tools import ToolDefinitions
+from resilience import ProviderError
+from cancellation import TurnCancelledError
+from incremental_transcript import IncrementalTranscript
+import time
 
 class ChatGPTModel(AIModelInterface):
+    supports_tools = True
+
     def __init__(self, service_name: str = "openai"):
         """Initialize ChatGPT with API key"""
         super().__init__(service_name)
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = openai_client(self.api_key, self.base_url)
+        self.default_model = "gpt-4o"
         self.system_prompt = SystemPrompts.get_prompt("ChatGPT")
+        self.transcript = IncrementalTranscript(self._format_message)
 
     def get_model_name(self) -> str:
         return "ChatGPT"
@@ -23,55 +36,99 @@ class ChatGPTModel(AIModelInterface):
     def format_messages(self, 
                        conversation_history: List[Dict],
                        image_path: Optional[str] = None) -> List[Dict]:
-        """Format messages for ChatGPT API"""
-        formatted_messages = [
-            {"role": "system", "content": self.system_prompt}
-        ]
-        
-        # Add non-system messages
-        for message in conversation_history:
-            if message["role"] != "system":  # Skip original system message
-                if isinstance(message['content'], str):
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": message["content"]
-                    })
-                else:  # Handle messages with images
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": message["content"]
-                    })
-        
-        # Add image to the last message if provided
-        if image_path:
+        """
+        Format messages for ChatGPT API.
+        Messages formatted on earlier turns are reused; only new ones are converted.
+        """
+        # The latest message carries the captured image, if any
+        last = None
+        last_message = conversation_history[-1] if conversation_history else None
+        if (image_path and last_message and last_message["role"] == "user"
+                and not isinstance(last_message["content"], str)):
             image_base64 = self.encode_image_to_base64(image_path)
-            last_message = formatted_messages[-1]
-            if isinstance(last_message['content'], str):
-                last_message['content'] = [
-                    {"type": "text", "text": last_message['content']},
+            # Low detail costs a flat 85 tokens and loses nothing on images that fit 512px
+            detail = ImagePolicy.openai_detail(*ImagePolicy.image_size(image_path))
+            last = [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": last_message["content"][0]["text"]},
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
+                            "url": f"data:image/jpeg;base64,{image_base64}",
+                            "detail": detail
                         }
                     }
                 ]
-        
-        return formatted_messages
+            }]
+
+        formatted_messages = [
+            {"role": "system", "content": self.system_prompt}
+        ]
+        return formatted_messages + self.transcript.sync(conversation_history, last)
+
+    @staticmethod
+    def _format_message(message: Dict) -> List[Dict]:
+        """Format one history message"""
+        if message["role"] == "system":  # Skip original system message
+            return []
+        if is_tool_message(message):
+            return [format_openai_tool_message(message)]
+        if isinstance(message["content"], str):
+            return [{
+                "role": message["role"],
+                "content": message["content"]
+            }]
+        # Earlier images stay in context at low detail, a flat 85 tokens each
+        content = []
+        for part in message["content"]:
+            if part.get("type") == "image_url":
+                part = {"type": "image_url", "image_url": dict(part["image_url"], detail="low")}
+            content.append(part)
+        return [{
+            "role": message["role"],
+            "content": content
+        }]
     
     def generate_response(self,
                          messages: List[Dict],
                          model: str,
-                         image_path: Optional[str] = None) -> str:
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """Generate response using ChatGPT"""
-        formatted_messages = self.format_messages(messages, image_path)
-        
-        response = self.client.chat.completions.create(
-            model=model,  # "gpt-4o-mini" or "gpt-4o"
-            messages=formatted_messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        return response.choices[0].message.content
+        try:
+            formatted_messages = self.format_messages(messages, image_path)
+
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+
+            request = {
+                "model": model or self.default_model,  # Chosen per turn by model_router
+                "messages": formatted_messages,
+                "temperature": 0.7,
+                "max_tokens": 1000,
+                "stream": True,  # Lets a cancelled turn close the connection mid-response
+                "stream_options": {"include_usage": True}
+            }
+            if tools:
+                request["tools"] = ToolDefinitions.to_openai(tools)
+
+            started = time.monotonic()
+            stream = self.client.chat.completions.create(**request)
+            
+            response = collect_chat_stream(stream, cancel_token, on_tool_call, on_delta)
+            response.usage.provider = self.get_model_name()
+            response.usage.model = response.usage.model or request["model"]
+            response.usage.image_tokens = count_image_parts(formatted_messages) * estimate_image_tokens(
+                self.get_model_name(), image_path)
+            response.usage.latency = time.monotonic() - started
+            return response
+
+        except TurnCancelledError:
+            raise
+        except Exception as e:
+            raise ProviderError(f"Error generating response from ChatGPT: {e}", "ChatGPT") from e
 
@@ -1,18 +1,29 @@
 # claude.py
 from ai_interface import AIModelInterface
-from anthropic import Anthropic
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import base64
 from pathlib import Path
+from ai_interface import ModelResponse, ToolCall, Usage
 from system_prompts import SystemPrompts
+from cancellation import CancellationToken, TurnCancelledError
+from tools import ToolDefinitions
+from resilience import ProviderError
+from provider_clients import anthropic_client
+from incremental_transcript import IncrementalTranscript
+from image_policy import estimate_image_tokens
+from stream_utils import count_image_parts
+import time
 
 class ClaudeModel(AIModelInterface):
+    supports_tools = True
+
     def __init__(self, service_name: str = "anthropic"):
         """Initialize Claude with API key"""
         super().__init__(service_name)
-        self.client = Anthropic(api_key=self.api_key)
+        self.client = anthropic_client(self.api_key, self.base_url)
         self.model_name = "claude-3-5-sonnet-20241022"
         self.system_prompt = SystemPrompts.get_prompt("Claude")
+        self.transcript = IncrementalTranscript(self._format_message, merge_roles=True)
 
     def get_model_name(self) -> str:
         return "Claude"
@@ -32,78 +43,149 @@ class ClaudeModel(AIModelInterface):
         else:
             system_message = SystemPrompts.get_prompt("Claude")
 
-        # Format conversation messages
-        formatted_messages = []
-        for message in conversation_history[1:]:  # Skip system message
-            if message["role"] in ["user", "assistant"]:
-                if isinstance(message['content'], str):
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": message["content"]
+        # The latest message carries the captured image, if any
+        last = None
+        last_message = conversation_history[-1] if len(conversation_history) > 1 else None
+        if (image_path and last_message and last_message["role"] == "user"
+                and not isinstance(last_message["content"], str)):
+            try:
+                with open(image_path, "rb") as img_file:
+                    image_data = base64.b64encode(img_file.read()).decode('utf-8')
+                last = [{
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": "image/jpeg",
+                                "data": image_data
                             }
-                        ]
-                    })
-                else:  # Handle list type content (for messages with images)
-                    # For image messages, we need special handling
-                    if message["role"] == "user" and image_path and message == conversation_history[-1]:
-                        # This is the latest message with an image
-                        try:
-                            with open(image_path, "rb") as img_file:
-                                image_data = base64.b64encode(img_file.read()).decode('utf-8')
-                                formatted_messages.append({
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "image",
-                                            "source": {
-                                                "type": "base64",
-                                                "media_type": "image/jpeg",
-                                                "data": image_data
-                                            }
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": message["content"][0]["text"]
-                                        }
-                                    ]
-                                })
-                        except Exception as e:
-                            raise Exception(f"Error processing image: {e}")
-                    else:
-                        # Regular message with non-string content
-                        formatted_messages.append({
-                            "role": message["role"],
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": message["content"][0]["text"]
-                                }
-                            ]
-                        })
+                        },
+                        {
+                            "type": "text",
+                            "text": last_message["content"][0]["text"]
+                        }
+                    ]
+                }]
+            except Exception as e:
+                raise Exception(f"Error processing image: {e}")
+
+        # Earlier messages are reused from previous turns. Neighbouring messages with
+        # the same role, e.g. tool results followed by the captured camera image, are
+        # merged since Claude expects alternating turns.
+        return system_message, self.transcript.sync(conversation_history, last)
 
-        return system_message, formatted_messages
+    @staticmethod
+    def _format_message(message: Dict) -> List[Dict]:
+        """Format one history message"""
+        if message["role"] == "tool":
+            return [{
+                "role": "user",
+                "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": message["tool_call_id"],
+                        "content": message["content"]
+                    }
+                ]
+            }]
+        if message.get("tool_calls"):
+            content = []
+            if message.get("content"):
+                content.append({"type": "text", "text": message["content"]})
+            for call in message["tool_calls"]:
+                content.append({
+                    "type": "tool_use",
+                    "id": call["id"],
+                    "name": call["name"],
+                    "input": call["arguments"]
+                })
+            return [{"role": "assistant", "content": content}]
+        if message["role"] not in ["user", "assistant"]:  # Skip system message
+            return []
+        if isinstance(message['content'], str):
+            text = message["content"]
+        else:  # Earlier messages with images are sent as text only
+            text = message["content"][0]["text"]
+        return [{
+            "role": message["role"],
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }]
     
     def generate_response(self,
                          messages: List[Dict],
-                         model: str,  # This parameter is ignored for Claude
-                         image_path: Optional[str] = None) -> str:
+                         model: str,
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """Generate response using Claude"""
         try:
             system_message, formatted_messages = self.format_messages(messages, image_path)
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+
+            request = {
+                "model": model or self.model_name,
+                "max_tokens": 1000,
+                "temperature": 0.7,
+                "system": system_message,
+                "messages": formatted_messages
+            }
+            if tools:
+                request["tools"] = ToolDefinitions.to_anthropic(tools)
             
-            response = self.client.messages.create(
-                model=self.model_name,
-                max_tokens=1000,
-                temperature=0.7,
-                system=system_message,
-                messages=formatted_messages
+            parts = []
+            tool_calls = []
+            started = time.monotonic()
+            with self.client.messages.stream(**request) as stream:
+                unregister = cancel_token.register(stream.close) if cancel_token else None
+                try:
+                    for event in stream:
+                        if cancel_token:
+                            cancel_token.raise_if_cancelled()
+                        if event.type == "text":
+                            parts.append(event.text)
+                            if on_delta:
+                                on_delta(event.text)
+                        elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                            # Surface each tool call as soon as its input has streamed in
+                            block = event.content_block
+                            call = ToolCall(id=block.id, name=block.name, arguments=dict(block.input or {}))
+                            tool_calls.append(call)
+                            if on_tool_call:
+                                on_tool_call(call)
+                finally:
+                    if unregister:
+                        unregister()
+                message = stream.get_final_message()
+
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            # input_tokens excludes cache reads and writes; count them as prompt tokens too
+            cached = message.usage.cache_read_input_tokens or 0
+            usage = Usage(
+                provider=self.get_model_name(),
+                model=message.model or request["model"],
+                prompt_tokens=message.usage.input_tokens + cached + (message.usage.cache_creation_input_tokens or 0),
+                completion_tokens=message.usage.output_tokens,
+                cached_tokens=cached,
+                image_tokens=count_image_parts(formatted_messages, "image") * estimate_image_tokens(
+                    self.get_model_name(), image_path),
+                latency=time.monotonic() - started
             )
+            return ModelResponse(text="".join(parts), tool_calls=tool_calls, usage=usage)
             
-            return response.content[0].text
-            
+        except TurnCancelledError:
+            raise
         except Exception as e:
-            raise Exception(f"Error generating response from Claude: {e}")
-
+            if cancel_token and cancel_token.is_cancelled:
+                raise TurnCancelledError(cancel_token.reason or "cancelled")
+            raise ProviderError(f"Error generating response from Claude: {e}", "Claude") from e
@@ -0,0 +1,121 @@
+# command_parser.py
+import logging
+import re
+from typing import Callable, List, Optional
+from ai_interface import ToolCall
+from tools import ToolDefinitions
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalCommandParser:
+    """
+    Detects JSON text commands ({"camera": "1"}, {"Online search": "..."}) in a
+    streamed reply as soon as they are complete, even when a command is split
+    across chunk boundaries.
+
+    Only the unscanned tail of the reply is searched on each delta, so the cost
+    per chunk stays proportional to the chunk, not to the reply so far.
+    """
+
+    CAMERA_PATTERN = re.compile(r'\{\s*"camera"\s*:\s*"1"\s*\}')
+    SEARCH_PATTERN = re.compile(r'\{\s*"Online search"\s*:\s*"([^"]+)"\s*\}')
+
+    # A "{" further back than this can no longer start a command
+    MAX_COMMAND_LENGTH = 300
+
+    def __init__(self,
+                 camera_available: bool,
+                 on_command: Optional[Callable[[ToolCall], None]] = None):
+        self.camera_available = camera_available
+        self.on_command = on_command
+        self.text = ""
+        self.commands: List[ToolCall] = []
+        self._scan_from = 0
+        self._shown_until = 0
+        self._last_command_end: Optional[int] = None
+        self._queries: List[str] = []
+
+    def feed(self, delta: str) -> None:
+        """Add a streamed chunk and report any commands it completes"""
+        self.text += delta
+
+        while True:
+            camera_match = self.CAMERA_PATTERN.search(self.text, self._scan_from)
+            search_match = self.SEARCH_PATTERN.search(self.text, self._scan_from)
+            matches = [m for m in (camera_match, search_match) if m]
+            if not matches:
+                break
+
+            match = min(matches, key=lambda m: m.start())
+            self._scan_from = match.end()
+            self._last_command_end = match.end()
+            self._add_command(match)
+
+        # Skip ahead to the first "{" that could still open a command
+        position = self.text.find("{", self._scan_from)
+        while position != -1 and len(self.text) - position > self.MAX_COMMAND_LENGTH:
+            position = self.text.find("{", position + 1)
+        self._scan_from = position if position != -1 else len(self.text)
+
+    def _add_command(self, match: 're.Match') -> None:
+        if match.re is self.CAMERA_PATTERN:
+            if not self.camera_available:
+                return
+            if any(call.name == ToolDefinitions.CAMERA for call in self.commands):
+                return
+            logger.debug("Found camera command in stream")
+            call = ToolCall(id="text_camera", name=ToolDefinitions.CAMERA)
+        else:
+            query = match.group(1)
+            if query in self._queries:
+                return
+            logger.debug("Found search request in stream: %s", query)
+            call = ToolCall(
+                id=f"text_search_{len(self._queries)}",
+                name=ToolDefinitions.SEARCH,
+                arguments={"query": query}
+            )
+            self._queries.append(query)
+
+        self.commands.append(call)
+        if self.on_command:
+            self.on_command(call)
+
+    def take_prose(self, final: bool = False) -> str:
+        """
+        Reply text that can be shown since the last call, with commands left out.
+        Text that might still become a command is held back until it is complete,
+        or until final is set at the end of the stream.
+        """
+        end = len(self.text) if final else self._scan_from
+        if end <= self._shown_until:
+            return ""
+        # Commands start after the text already shown, so none is split here
+        prose = self.text[self._shown_until:end]
+        self._shown_until = end
+        return self.SEARCH_PATTERN.sub("", self.CAMERA_PATTERN.sub("", prose))
+
+    def should_stop(self) -> bool:
+        """
+        Whether the rest of the generation can be dropped: a command was found
+        and the model has moved on to prose instead of another command
+        """
+        if self._last_command_end is None:
+            return False
+        trailing = self.text[self._last_command_end:].lstrip()
+        return bool(trailing) and not trailing.startswith("{")
+
+    @property
+    def text_through_commands(self) -> str:
+        """Reply text up to the end of the last command found"""
+        if self._last_command_end is None:
+            return self.text
+        return self.text[:self._last_command_end]
+
+    @classmethod
+    def strip_commands(cls, text: str) -> str:
+        """Remove commands so they are neither displayed nor spoken"""
+        text = cls.CAMERA_PATTERN.sub("", text)
+        text = cls.SEARCH_PATTERN.sub("", text)
+        return text.strip()
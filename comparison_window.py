@@ -0,0 +1,181 @@
+# comparison_window.py
+import threading
+import tkinter as tk
+from tkinter import font, scrolledtext, ttk
+from typing import Dict, Optional
+from cancellation import CancellationToken
+from model_comparison import ComparisonResult, ModelComparison
+from turn_tracer import get_tracer
+from ui_events import ResponseEvent, StatusEvent, TokenEvent, UIEventBus
+
+
+class ComparisonWindow:
+    """
+    "Ask all models" window for curriculum testing.
+
+    One prompt, optionally with one camera capture, goes to every selected
+    provider at once; each answer streams into its own pane with its latency
+    and token counts. Play speaks the chosen answer in that provider's voice;
+    nothing else is spoken. Worker threads only post events; this window's
+    own event bus applies them on the Tk thread.
+    """
+
+    PROVIDERS = ["ChatGPT", "Claude", "Gemini", "Grok", "Perplexity"]
+
+    def __init__(self, master: tk.Misc, manager, colors: Dict[str, str], text_font: font.Font):
+        """
+        Args:
+            master: Main window
+            manager: ConversationManager providing the camera, tracer, ledger and TTS
+            colors: Pane title color per provider
+            text_font: Font for the answers
+        """
+        self.manager = manager
+        self.comparison = ModelComparison(manager)
+        self.results: Dict[str, ComparisonResult] = {}
+        self.cancel_token: Optional[CancellationToken] = None
+        self.turn_id: Optional[str] = None
+
+        self.window = tk.Toplevel(master)
+        self.window.title("Compare Models")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        # Also when the main window goes and takes this one with it
+        self.window.bind("<Destroy>", self._on_destroy)
+
+        # Prompt row
+        prompt_frame = ttk.Frame(self.window)
+        prompt_frame.pack(fill=tk.X, padx=5, pady=5)
+        prompt_frame.grid_columnconfigure(0, weight=1)
+        self.prompt_input = ttk.Entry(prompt_frame, font=text_font)
+        self.prompt_input.grid(row=0, column=0, sticky="ew")
+        self.prompt_input.bind("<Return>", lambda e: self.ask())
+        self.use_camera = tk.BooleanVar(value=manager.camera is not None)
+        ttk.Checkbutton(prompt_frame, text="With camera image", variable=self.use_camera,
+                        state=tk.NORMAL if manager.camera else tk.DISABLED).grid(row=0, column=1, padx=5)
+        ttk.Button(prompt_frame, text="Ask all", command=self.ask).grid(row=0, column=2, padx=5)
+        ttk.Button(prompt_frame, text="Stop", command=self.stop).grid(row=0, column=3)
+
+        # Provider selection
+        selection_frame = ttk.Frame(self.window)
+        selection_frame.pack(fill=tk.X, padx=5)
+        self.selected = {provider: tk.BooleanVar(value=True) for provider in self.PROVIDERS}
+        for provider, variable in self.selected.items():
+            ttk.Checkbutton(selection_frame, text=provider, variable=variable).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self.window, text="")
+        self.status_label.pack(fill=tk.X, padx=5)
+
+        # One pane per provider, side by side
+        panes_frame = ttk.Frame(self.window)
+        panes_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        panes_frame.grid_rowconfigure(0, weight=1)
+        self.panes: Dict[str, scrolledtext.ScrolledText] = {}
+        self.stats: Dict[str, ttk.Label] = {}
+        for column, provider in enumerate(self.PROVIDERS):
+            panes_frame.grid_columnconfigure(column, weight=1, uniform="pane")
+            frame = tk.LabelFrame(panes_frame, text=provider, fg=colors.get(provider, "black"))
+            frame.grid(row=0, column=column, sticky="nsew", padx=2)
+            text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, font=text_font, width=24, height=16)
+            text.pack(fill=tk.BOTH, expand=True)
+            self.panes[provider] = text
+            self.stats[provider] = ttk.Label(frame, text="")
+            self.stats[provider].pack(fill=tk.X)
+            ttk.Button(frame, text="Play this answer",
+                       command=lambda provider=provider: self.play(provider)).pack(fill=tk.X)
+
+        self.events = UIEventBus(self.window)
+        self.events.subscribe(TokenEvent, self.show_tokens)
+        self.events.subscribe(ResponseEvent, self.show_result)
+        self.events.subscribe(StatusEvent, lambda event: self.status_label.config(text=event.message))
+        self.events.start()
+
+    def lift(self) -> None:
+        self.window.deiconify()
+        self.window.lift()
+
+    def ask(self) -> None:
+        prompt = self.prompt_input.get().strip()
+        providers = [provider for provider, variable in self.selected.items() if variable.get()]
+        if not prompt or not providers:
+            return
+        self.stop()
+        self.results.clear()
+        for provider in self.PROVIDERS:
+            self.panes[provider].delete("1.0", tk.END)
+            self.stats[provider].config(text="waiting..." if provider in providers else "")
+
+        self.cancel_token = CancellationToken()
+        self.turn_id = get_tracer().new_turn()
+        self.events.status_callback(f"Asking {len(providers)} models...")
+        threading.Thread(
+            target=self._run,
+            args=(prompt, providers, self.use_camera.get(), self.cancel_token, self.turn_id),
+            daemon=True
+        ).start()
+
+    def _run(self, prompt, providers, with_image, cancel_token, turn_id) -> None:
+        """Worker thread: run the comparison, posting its progress to the event bus"""
+        def on_result(result: ComparisonResult) -> None:
+            self.results[result.provider] = result
+            self.events.post(ResponseEvent(turn_id, result.provider, result.text))
+
+        self.comparison.ask(
+            prompt, providers, with_image,
+            on_delta=lambda provider, delta: self.events.post(TokenEvent(turn_id, provider, delta)),
+            on_result=on_result,
+            cancel_token=cancel_token,
+            turn_id=turn_id
+        )
+        self.events.status_callback("Done. Pick an answer to play.")
+
+    def show_tokens(self, event: TokenEvent) -> None:
+        if event.turn_id == self.turn_id:
+            self.panes[event.speaker].insert(tk.END, event.text)
+
+    def show_result(self, event: ResponseEvent) -> None:
+        result = self.results.get(event.speaker)
+        if event.turn_id != self.turn_id or result is None:
+            return
+        pane = self.panes[event.speaker]
+        if result.error:
+            pane.insert(tk.END, f"\n[{result.error}]")
+        elif not pane.get("1.0", "end-1c"):
+            # Adapters that do not stream deliver the whole answer at the end
+            pane.insert(tk.END, result.text)
+        first_token = f"{result.first_token:.1f}s first, " if result.first_token is not None else ""
+        self.stats[event.speaker].config(
+            text=f"{first_token}{result.total:.1f}s total, "
+                 f"{result.usage.prompt_tokens}+{result.usage.completion_tokens} tokens"
+        )
+
+    def play(self, provider: str) -> None:
+        """Speak one provider's answer; any answer already playing stops"""
+        result = self.results.get(provider)
+        if not result or not result.text:
+            return
+        tts_manager = self.manager.tts_manager
+        language = self.manager.detect_language(result.text)
+        threading.Thread(
+            target=tts_manager.text_to_speech,
+            args=(result.text, language, self.events.status_callback),
+            kwargs={"model_name": provider},
+            daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        if self.cancel_token:
+            self.cancel_token.cancel("comparison stopped")
+            self.cancel_token = None
+        self.manager.tts_manager.stop_playback()
+
+    def close(self) -> None:
+        self.stop()
+        self.window.destroy()
+
+    def _on_destroy(self, event: tk.Event) -> None:
+        # Children's Destroy events reach this binding too
+        if event.widget is self.window:
+            if self.cancel_token:
+                self.cancel_token.cancel("comparison closed")
+            self.events.stop()
+            self.comparison.close()
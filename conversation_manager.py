@@ -1,5 +1,4 @@
 # conversation_manager.py
-from openai import OpenAI
 import opencc
 from typing import List, Dict, Callable, Optional, Union
 import base64
@@ -12,23 +11,115 @@ from pathlib import Path
 from key_manager import KeyManager
 from chatgpt import ChatGPTModel
 from system_prompts import SystemPrompts
+from cancellation import CancellationToken, TurnCancelledError
+import threading
+from ai_interface import AIModelInterface, ModelResponse, ToolCall
+from tools import ToolDefinitions, ToolResult
+from tool_executor import ToolExecutor
+from command_parser import IncrementalCommandParser
+from latency_stats import LatencyStats
+from hedging import HedgedCaller
+from resilience import ResilientModel, RetryPolicy, get_breaker
+from turn_tracer import get_tracer
+from usage_ledger import get_ledger
+from provider_clients import openai_client
+from conversation_store import get_store
+from capture_coordinator import CaptureCoordinator
+from scene_cache import SceneCache, SceneEntry
+from image_policy import ImagePolicy
+from model_router import ModelRouter, TurnClass
+from response_cache import ResponseCache
+from search_cache import get_search_cache
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ConversationManager:
-    def __init__(self, api_key_path: str = "openai_key.txt"):
+    def __init__(self,
+                 api_key_path: str = "openai_key.txt",
+                 tts_manager: Optional[TTSManager] = None,
+                 tool_executor: Optional[ToolExecutor] = None,
+                 play_audio: bool = True,
+                 response_cache: Optional[ResponseCache] = None):
+        """
+        Args:
+            api_key_path: Kept for compatibility; keys come from KeyManager
+            tts_manager: Speech service to use, e.g. one shared by several managers
+            tool_executor: Worker pool for tool calls, e.g. one shared by several managers
+            play_audio: Speak replies through the local speaker; False leaves speech to the caller
+            response_cache: Answers to repeated questions, e.g. one shared by several managers
+        """
         self.converter = opencc.OpenCC('s2t')
         # Initialize OpenAI client for speech services
-        self.client = OpenAI(api_key=KeyManager.load_key("openai"))
-        self.tts_manager = TTSManager(KeyManager.get_key_path("openai"))
+        self.client = openai_client(KeyManager.load_key("openai"), KeyManager.get_base_url("openai"))
+        self.tts_manager = tts_manager or TTSManager(KeyManager.get_key_path("openai"))
+        self.play_audio = play_audio
+
+        # Retries, deadlines and circuit breakers for provider calls
+        self.retry_policy = RetryPolicy()
+
+        # Adapter used while a provider keeps failing or its circuit breaker is open
+        self.fallback_models = {
+            "ChatGPT": "Claude",
+            "Claude": "ChatGPT",
+            "Gemini": "ChatGPT",
+            "Grok": "ChatGPT",
+            "Perplexity": "ChatGPT"
+        }
 
         # Initialize current AI model (default to ChatGPT)
-        self.current_model = ChatGPTModel()
+        self.current_model = self.with_resilience(ChatGPTModel())
 
         # Initialize Perplexity model for searches
         from perplexity import PerplexityModel
-        self.search_model = PerplexityModel()
+        self.search_model = self.with_resilience(PerplexityModel(), fallback=False)
 
         # Initialize camera reference
         self.camera = None
+
+        # Maximum number of tool round trips before the model must answer
+        self.max_tool_rounds = 3
+
+        # Worker pool so camera capture and searches in one reply run concurrently
+        self.tool_executor = tool_executor or ToolExecutor(max_workers=4)
+
+        # Per-turn timing spans written to a local JSONL trace
+        self.tracer = get_tracer()
+
+        # Token usage per provider call, grouped by this session in reports
+        self.usage_ledger = get_ledger()
+        self.session_id = uuid.uuid4().hex[:12]
+
+        # Finished turns are saved so a conversation survives restarts; clear_history starts a new one
+        self.conversation_store = get_store()
+        self.conversation_id = uuid.uuid4().hex[:12]
+        # Prompt and completion tokens of the turns in progress, saved with their messages
+        self._turn_tokens: Dict[str, List[int]] = {}
+
+        # Recent vision answers by perceptual hash, so an unchanged view is not re-analyzed
+        self.scene_cache = SceneCache()
+
+        # Answers to repeated text questions, so a repeat skips the model call
+        self.response_cache = response_cache or ResponseCache()
+        # Recent search results, shared by every conversation in the process
+        self.search_cache = get_search_cache()
+
+        # Per-provider latency histograms and optional hedging to a second provider
+        self.latency_stats = LatencyStats()
+        self.hedged_caller = HedgedCaller(self.latency_stats)
+        self.hedge_model: Optional[AIModelInterface] = None
+
+        # Model per provider and kind of turn, from a configurable table and the latency histograms
+        self.router = ModelRouter.load(self.latency_stats)
+
+        # Cancellation handle for the turn currently in progress
+        self._turn_lock = threading.Lock()
+        self.current_turn_token: Optional[CancellationToken] = None
+        # Turns run one at a time; a turn sent while another runs waits for it
+        self._turn_serial = threading.Lock()
+        self._waiting_turn_tokens: List[CancellationToken] = []
         
         # Initialize conversation history with system prompt
         self.conversation_history = [
@@ -59,44 +150,108 @@ class ConversationManager:
         }
 
     def set_ai_model(self, model_name: str) -> None:
-        """Change the current AI model"""
+        """
+        Change the current AI model
+        Raises:
+            ValueError: If model_name is not a supported model; nothing is changed then
+        """
         try:
-            print(f"[DEBUG] Attempting to switch to {model_name}")
+            logger.debug("Attempting to switch to %s", model_name)
+            adapter = self.create_model(model_name)
+
+            # Abort the in-flight turn; its answer belongs to the old model
+            self.cancel_current_turn("model switched")
             
             # Update system prompt for new model
             if self.conversation_history:
                 self.conversation_history[0]["content"] = SystemPrompts.get_prompt(model_name)
  
-            if model_name == "ChatGPT":
-                self.current_model = ChatGPTModel()
-            elif model_name == "Claude":
-                from claude import ClaudeModel
-                self.current_model = ClaudeModel()
-                self.clear_history()
-            elif model_name == "Gemini":
-                from gemini import GeminiModel
-                self.current_model = GeminiModel()
+            self.current_model = self.with_resilience(adapter)
+            if model_name != "ChatGPT":
                 self.clear_history()
-            elif model_name == "Grok":
-                from grok import GrokModel
-                self.current_model = GrokModel()
-                self.clear_history()
-            elif model_name == "Perplexity":
-                from perplexity import PerplexityModel
-                self.current_model = PerplexityModel()
-                self.clear_history()
-            else:
-                raise ValueError(f"Unsupported model: {model_name}")
             
-            print(f"[DEBUG] Current model after switch: {self.current_model.get_model_name()}")
+            logger.debug("Current model after switch: %s", self.current_model.get_model_name())
+        except ValueError:
+            raise
         except Exception as e:
-            print(f"[DEBUG] Error during model switch: {str(e)}")
+            logger.error("Error during model switch: %s", e)
             raise Exception(f"Error switching to {model_name}: {e}")
 
+    @staticmethod
+    def create_model(model_name: str) -> AIModelInterface:
+        """Create an adapter for the given model name"""
+        if model_name == "ChatGPT":
+            return ChatGPTModel()
+        elif model_name == "Claude":
+            from claude import ClaudeModel
+            return ClaudeModel()
+        elif model_name == "Gemini":
+            from gemini import GeminiModel
+            return GeminiModel()
+        elif model_name == "Grok":
+            from grok import GrokModel
+            return GrokModel()
+        elif model_name == "Perplexity":
+            from perplexity import PerplexityModel
+            return PerplexityModel()
+        raise ValueError(f"Unsupported model: {model_name}")
+
+    def with_resilience(self, adapter: AIModelInterface, fallback: bool = True) -> ResilientModel:
+        """Wrap an adapter with retries, a circuit breaker and its configured fallback"""
+        fallback_name = self.fallback_models.get(adapter.get_model_name()) if fallback else None
+        fallback_factory = (lambda: self.create_model(fallback_name)) if fallback_name else None
+        return ResilientModel(adapter, fallback_factory, self.retry_policy)
+
+    def transcribe_audio(self, audio_path: Union[str, Path]) -> str:
+        """
+        Transcribe an audio file with Whisper, retrying transient failures
+        Returns:
+            str: Transcribed text converted to Traditional Chinese where applicable
+        """
+        def transcribe(token: CancellationToken) -> str:
+            with open(audio_path, "rb") as audio_file:
+                return self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file
+                ).text
+
+        text = self.retry_policy.run(transcribe, breaker=get_breaker("Whisper"), name="Whisper")
+        return self.converter.convert(text)
+
+    def set_hedge_model(self,
+                        model_name: Optional[str],
+                        percentile: float = 0.95,
+                        default_delay: float = 4.0) -> None:
+        """
+        Enable or disable hedged requests
+        Args:
+            model_name: Secondary provider to hedge with, or None to disable hedging
+            percentile: Primary first-token percentile after which the hedge fires
+            default_delay: Hedge delay in seconds until enough latency samples exist
+        Raises:
+            ValueError: If the provider keeps its own session (Gemini), which a lost race
+                        would leave out of step with the history
+        """
+        hedge_model = self.with_resilience(self.create_model(model_name)) if model_name else None
+        if hedge_model and hedge_model.is_stateful:
+            raise ValueError(f"{model_name} keeps its own session and cannot be used for hedging")
+        self.hedge_model = hedge_model
+        self.hedged_caller.percentile = percentile
+        self.hedged_caller.default_delay = default_delay
+        logger.info("Hedging %s", f"enabled with {model_name}" if model_name else "disabled")
+
+    def cancel_current_turn(self, reason: str = "stopped") -> None:
+        """Cancel the turn in progress and any waiting behind it, closing open provider streams"""
+        with self._turn_lock:
+            tokens = self._waiting_turn_tokens + ([self.current_turn_token] if self.current_turn_token else [])
+        for token in tokens:
+            logger.debug("Cancelling turn: %s", reason)
+            token.cancel(reason)
+
     def set_camera(self, camera: 'Picamera2'):
         """Set camera reference from the main app"""
         self.camera = camera
-        print(f"[DEBUG] Camera reference set: {camera is not None}")
+        logger.debug("Camera reference set: %s", camera is not None)
 
     def parse_command(self, text: str) -> tuple[str, Optional[str]]:
         """
@@ -124,6 +279,11 @@ class ConversationManager:
         return 'normal', None
 
     def add_message(self, role: str, content: Union[str, List], image_path: str = None) -> None:
+        self.conversation_history.append(self.history_message(role, content, image_path))
+
+    @staticmethod
+    def history_message(role: str, content: Union[str, List], image_path: str = None) -> Dict:
+        """History entry for a message, with the image inlined if there is one"""
         if image_path:
             try:
                 with open(image_path, "rb") as image_file:
@@ -138,20 +298,47 @@ class ConversationManager:
                         "url": f"data:image/jpeg;base64,{image_base64}"
                     }
                 }
-                self.conversation_history.append({
+                return {
                     "role": role,
                     "content": [content_with_image, image_content]
-                })
+                }
             except Exception as e:
-                print(f"[DEBUG] Error adding message with image: {e}")
+                logger.warning("Error adding message with image: %s", e)
                 # Fall back to text-only message
-                self.conversation_history.append({"role": role, "content": content})
-        else:
-            self.conversation_history.append({"role": role, "content": content})
+        return {"role": role, "content": content}
 
     def clear_history(self) -> None:
         """Clear conversation history but keep system prompt"""
         self.conversation_history = [self.conversation_history[0]]
+        self.conversation_id = uuid.uuid4().hex[:12]
+        self.current_model.reset_session(self.conversation_history)
+
+    def resume_latest(self, limit: int = 40) -> int:
+        """
+        Continue the most recently saved conversation with the model that held it
+        Args:
+            limit: Newest messages to load back into the history
+        Returns:
+            int: Number of messages restored
+        """
+        conversation_id = self.conversation_store.latest_conversation()
+        if not conversation_id:
+            return 0
+        tail = self.conversation_store.load_tail(conversation_id, limit)
+        provider = self.conversation_store.provider(conversation_id)
+        if provider and provider != self.current_model.get_model_name():
+            # Not set_ai_model, which would start a new conversation
+            try:
+                self.current_model = self.with_resilience(self.create_model(provider))
+                self.conversation_history[0]["content"] = SystemPrompts.get_prompt(provider)
+            except Exception as e:
+                logger.warning("Could not resume with %s, keeping %s: %s",
+                               provider, self.current_model.get_model_name(), e)
+        self.conversation_history = [self.conversation_history[0]] + tail
+        self.conversation_id = conversation_id
+        self.current_model.reset_session(self.conversation_history)
+        logger.info("Resumed conversation %s with %d messages", conversation_id, len(tail))
+        return len(tail)
     
     def detect_language(self, text: str) -> str:
         """
@@ -167,185 +354,563 @@ class ConversationManager:
         # Default to English
         return 'en'
 
-    def get_response(self, user_input: str, status_callback: Callable[[str], None] = None) -> str:
+    def get_response(self,
+                     user_input: str,
+                     status_callback: Callable[[str], None] = None,
+                     cancel_token: Optional[CancellationToken] = None,
+                     turn_id: Optional[str] = None,
+                     delta_callback: Optional[Callable[[str], None]] = None,
+                     audio_callback: Optional[Callable[[str], None]] = None) -> str:
         """
-        Generate a response incorporating camera analysis, online searches, and TTS
+        Generate a response incorporating camera analysis, online searches, and TTS.
+        The turn can be aborted with cancel_current_turn() or by cancelling cancel_token;
+        a cancelled turn returns an empty string and leaves no trace in the history.
+        Turns run one at a time: a call made while another turn runs waits for it.
+        turn_id ties timing spans to a turn that started earlier, e.g. at recording stop.
+        delta_callback gets the reply text as it streams (text commands are left out),
+        audio_callback the playback state. All callbacks run on worker threads.
         """
+        cancel_token = cancel_token or CancellationToken()
+        with self._turn_lock:
+            self._waiting_turn_tokens.append(cancel_token)
         try:
-            print(f"[DEBUG] Processing input: {user_input}")
-            command_type, _ = self.parse_command(user_input)
-            print(f"[DEBUG] Parsed command: type={command_type}")
-            image_path = None
-
-            # Handle user's direct camera commands
-            if command_type == 'take_photo' and self.camera:
-                filepath = CameraManager.capture_high_res(self.camera)
-                if filepath:
-                    return f"Photo saved to: {filepath}"
-                return "Error taking photo"
-
-            elif command_type == 'analyze' and self.camera:
-                image_path = CameraManager.capture_and_convert(self.camera)
-                if not image_path:
-                    return "Error: Failed to capture image"
-
-            # Add initial user message to conversation history
-            if image_path:
-                self.add_message("user", user_input, image_path)
-            else:
-                self.add_message("user", user_input)
-
-            # Determine model based on current model type
-            if isinstance(self.current_model, ChatGPTModel):
-                model = "gpt-4o-mini" if image_path else "gpt-4o"
-                print(f"[DEBUG] Using ChatGPT model: {model}")
-            else:
-                model = None
-                print(f"[DEBUG] Using {self.current_model.get_model_name()} with its own model naming")
-
-            # Get initial response from current AI model
-            print(f"[DEBUG] Generating initial response using {self.current_model.get_model_name()}")
-            initial_response = self.current_model.generate_response(
-                self.conversation_history,
-                model,
-                image_path
-            )
-
-            # Check for AI-initiated camera commands
-            camera_pattern = r'{"camera": ?"1"}'
-            if re.search(camera_pattern, initial_response) and self.camera:
-                print("[DEBUG] Found camera command in response")
-                
-                if status_callback:
-                    status_callback("Capturing image...")
-
-                image_path = CameraManager.capture_and_convert(self.camera)
-                if not image_path:
-                    return "Error: Failed to capture image"
-
-                # Add AI's intermediate response and image to conversation
-                self.add_message("assistant", "Let me analyze that image.", None)
-                self.add_message("user", "Please analyze this image.", image_path)
-
-                # Get new response with image analysis
-                print("[DEBUG] Generating response with image analysis")
-                final_response = self.current_model.generate_response(
-                    self.conversation_history,
-                    model,
-                    image_path
-                )
-                
-                # Add final response to history
-                self.add_message("assistant", final_response)
-
-                # Handle TTS
-                language = self.detect_language(final_response)
-                self.tts_manager.text_to_speech(
-                    final_response,
-                    language,
-                    status_callback,
-                    model_name=self.current_model.get_model_name()
-                )
-
-                if status_callback:
-                    status_callback("")
-
-                return final_response
-
-            # Check for search requests
-            search_pattern = r'{"Online search": "([^"]+)"}'
-            search_match = re.search(search_pattern, initial_response)
-            
-            if search_match:
-                search_query = search_match.group(1)
-                print(f"[DEBUG] Found search request: {search_query}")
-                
-                if status_callback:
-                    status_callback(f"Searching for: {search_query}")
-
-                try:
-                    # Perform search using Perplexity
-                    search_messages = [
-                        {
-                            "role": "system",
-                            "content": "You are a helpful search assistant. Provide accurate and concise information."
-                        },
-                        {
-                            "role": "user",
-                            "content": search_query
-                        }
-                    ]
-
-                    search_result = self.search_model.generate_response(
-                        search_messages,
-                        "llama-3.1-sonar-large-128k-online",
-                        None
-                    )
+            with self._turn_serial:
+                with self._turn_lock:
+                    self._waiting_turn_tokens.remove(cancel_token)
+                    self.current_turn_token = cancel_token
+                return self._respond(user_input, status_callback, cancel_token, turn_id,
+                                     delta_callback, audio_callback)
+        finally:
+            with self._turn_lock:
+                if cancel_token in self._waiting_turn_tokens:
+                    self._waiting_turn_tokens.remove(cancel_token)
+
+    def _respond(self,
+                 user_input: str,
+                 status_callback: Optional[Callable[[str], None]],
+                 cancel_token: CancellationToken,
+                 turn_id: Optional[str],
+                 delta_callback: Optional[Callable[[str], None]],
+                 audio_callback: Optional[Callable[[str], None]]) -> str:
+        """Run one turn of get_response; the caller holds the turn lock"""
+        turn_id = turn_id or self.tracer.new_turn()
+
+        # Remember where this turn starts so a cancel can roll it back
+        history = self.conversation_history
+        history_length = len(history)
+
+        # Everything in the turn that needs a camera frame shares one capture,
+        # shaped for the current provider and the kind of question
+        provider = self.current_model.get_model_name()
+        capture = CaptureCoordinator(self.camera, turn_id, self.tracer,
+                                     spec=ImagePolicy.choose(provider, user_input), provider=provider)
 
-                    # Create a new user message with search results
-                    combined_input = f"""Original query: {user_input}
+        try:
+            # Stopped while it waited for the previous turn
+            cancel_token.raise_if_cancelled()
+            with self.tracer.span(turn_id, "turn", provider=self.current_model.get_model_name()):
+                response = self._run_turn(user_input, status_callback, cancel_token, turn_id, capture,
+                                          delta_callback, audio_callback)
+            # Not if a model switch replaced the history while the turn was running
+            if self.conversation_history is history:
+                prompt_tokens, completion_tokens = self._turn_tokens.get(turn_id, (None, None))
+                self.conversation_store.append(self.conversation_id, history[history_length:],
+                                               self.session_id, provider, turn_id,
+                                               prompt_tokens, completion_tokens)
+            return response
+
+        except TurnCancelledError as e:
+            logger.debug("%s", e)
+            # History may have been replaced by clear_history() during a model switch;
+            # turns run one at a time, so everything past history_length is this turn's
+            if self.conversation_history is history:
+                del history[history_length:]
+                # A provider that keeps its own session (Gemini) still holds the rolled-back exchange
+                self.current_model.reset_session(history)
+            if status_callback:
+                status_callback("---")
+            return ""
 
-Search results for "{search_query}":
-{search_result}
+        except Exception as e:
+            logger.error("Error in get_response: %s", e)
+            error_msg = f"Error: {str(e)}"
+            if status_callback:
+                status_callback(error_msg)
+            return error_msg
 
-Please provide a complete response incorporating this information."""
+        finally:
+            capture.close()
+            with self._turn_lock:
+                self._turn_tokens.pop(turn_id, None)
+                if self.current_turn_token is cancel_token:
+                    self.current_turn_token = None
+
+    def _run_turn(self,
+                  user_input: str,
+                  status_callback: Optional[Callable[[str], None]],
+                  cancel_token: CancellationToken,
+                  turn_id: str,
+                  capture: CaptureCoordinator,
+                  delta_callback: Optional[Callable[[str], None]] = None,
+                  audio_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Run a single turn; raises TurnCancelledError if the turn is cancelled"""
+        logger.debug("Processing input: %s", user_input)
+        command_type, _ = self.parse_command(user_input)
+        logger.debug("Parsed command: type=%s", command_type)
+        image_path = None
+
+        # Handle user's direct camera commands
+        if command_type == 'take_photo' and self.camera:
+            with self.tracer.span(turn_id, "camera.high_res"):
+                filepath = CameraManager.capture_high_res(self.camera)
+            if filepath:
+                return f"Photo saved to: {filepath}"
+            return "Error taking photo"
 
-                    # Add search results to conversation
-                    self.add_message("user", combined_input)
+        elif command_type == 'analyze' and self.camera:
+            if status_callback:
+                status_callback("Processing image... Please wait.")
+            image_path = capture.get_image()
+            if not image_path:
+                return "Error: Failed to capture image"
 
-                    # Get final response incorporating search results
-                    final_response = self.current_model.generate_response(
-                        self.conversation_history,
-                        model,
-                        image_path
-                    )
+        message_text = user_input
+        if image_path:
+            scene = self._known_scene(image_path)
+            if scene and self.scene_cache.same_question(scene.question, user_input):
+                # Same view, same question: repeat the answer without calling the model
+                self.tracer.metric(turn_id, "scene_cache", 1, mode="answer")
+                self._add_cached_exchange(user_input, scene.answer)
+                return self._speak(scene.answer, status_callback, cancel_token, turn_id, audio_callback)
+            if scene:
+                # Same view, new question: the earlier description stands in for the image
+                self.tracer.metric(turn_id, "scene_cache", 1, mode="context")
+                message_text = (f"{user_input}\n\n(The camera still shows the same scene as before. "
+                                f"Earlier description: {scene.answer})")
+                image_path = None
+            else:
+                self.tracer.metric(turn_id, "scene_cache", 0, mode="miss")
+
+        # Repeated questions are answered from the cache; camera commands never are
+        cache_key = None
+        if command_type == 'normal' and self.response_cache.cacheable(user_input):
+            cache_key = self.response_cache.key(user_input, self.current_model.get_model_name(),
+                                                self.conversation_history[0]["content"],
+                                                self.conversation_history[1:])
+            cached = self.response_cache.lookup(cache_key)
+            self.tracer.metric(turn_id, "response_cache", 1 if cached else 0,
+                               hit_rate=round(self.response_cache.hit_rate, 3))
+            if cached:
+                self._add_cached_exchange(user_input, cached)
+                return self._speak(cached, status_callback, cancel_token, turn_id, audio_callback)
+
+        cancel_token.raise_if_cancelled()
+
+        # Add initial user message to conversation history
+        if image_path:
+            self.add_message("user", message_text, image_path)
+        else:
+            self.add_message("user", message_text)
+
+        # The turn is classified once; rounds that carry an image are routed as vision rounds
+        turn_class = self.router.classify(user_input, image_path is not None)
+        logger.debug("Turn class: %s", turn_class)
+
+        # Hedging only pairs providers that handle tools the same way, and never a
+        # provider with its own session, which would drift from the history when it loses
+        hedge_model = self.hedge_model
+        if hedge_model and (hedge_model.supports_tools != self.current_model.supports_tools or
+                            hedge_model.get_model_name() == self.current_model.get_model_name() or
+                            hedge_model.is_stateful or self.current_model.is_stateful):
+            hedge_model = None
+
+        native_tools = self.current_model.supports_tools
+        tools = ToolDefinitions.get_tools(self.camera is not None) if native_tools else None
+
+        # Prose from every round is kept, so "let me look..." is not thrown away
+        spoken_parts = []
+        # Rounds whose text was forwarded; later rounds are separated like in the final reply
+        streamed_rounds = set()
+        # Answers that needed the camera or a search are not reused
+        used_tools = False
+        for round_number in range(self.max_tool_rounds + 1):
+            # The last round has to answer without further tools
+            tools_allowed = round_number < self.max_tool_rounds
+
+            # Tools start running as soon as the stream reports them
+            tool_run = self.tool_executor.start(
+                lambda call: self.execute_tool(call, cancel_token, capture, turn_id)
+            )
 
-                    # Add final response to history
-                    self.add_message("assistant", final_response)
+            def on_tool_call(call: ToolCall) -> None:
+                self._announce_tool_call(call, status_callback)
+                tool_run.submit(call)
+
+            # Models without function calling write text commands; watch the stream
+            # for them and stop generating once the model moves past its commands
+            parser = None
+            if not native_tools:
+                parser = IncrementalCommandParser(self.camera is not None,
+                                                  on_command=on_tool_call if tools_allowed else None)
+            generation_token = cancel_token.child()
+
+            def forward(delta: str, round_number: int = round_number) -> None:
+                if not delta_callback or not delta:
+                    return
+                if round_number not in streamed_rounds:
+                    if streamed_rounds:
+                        delta = "\n\n" + delta
+                    streamed_rounds.add(round_number)
+                delta_callback(delta)
+
+            def on_delta(delta: str) -> None:
+                if parser:
+                    parser.feed(delta)
+                    if tools_allowed and parser.should_stop():
+                        generation_token.cancel("tool command detected")
+                        return
+                    # Text that could still be part of a command waits until it is complete
+                    delta = parser.take_prose()
+                forward(delta)
+
+            logger.debug("Generating response (round %s) using %s", round_number + 1, self.current_model.get_model_name())
+            round_tools = tools if tools_allowed else None
+
+            def generate(adapter: AIModelInterface,
+                         token: CancellationToken,
+                         delta_callback: Callable[[str], None],
+                         tool_callback: Callable[[ToolCall], None]) -> ModelResponse:
+                round_class = TurnClass.VISION if image_path else turn_class
+                return self._generate(adapter, round_class, image_path, token,
+                                      round_tools, tool_callback, delta_callback,
+                                      turn_id, round_number)
 
-                    # Handle TTS
-                    language = self.detect_language(final_response)
-                    self.tts_manager.text_to_speech(
-                        final_response,
-                        language,
-                        status_callback,
-                        model_name=self.current_model.get_model_name()
+            try:
+                if hedge_model:
+                    response = self.hedged_caller.call(
+                        self.current_model, hedge_model, generate,
+                        generation_token, on_delta, on_tool_call
                     )
+                else:
+                    response = generate(self.current_model, generation_token, on_delta, on_tool_call)
+            except TurnCancelledError:
+                if cancel_token.is_cancelled or not (parser and tools_allowed and parser.commands):
+                    raise
+                logger.debug("Stopped generation early after text command")
+                response = ModelResponse(text=parser.text_through_commands)
+
+            if native_tools:
+                tool_calls = response.tool_calls if tools_allowed else []
+            else:
+                tool_calls = parser.commands if tools_allowed else []
 
-                    if status_callback:
-                        status_callback("")
-
-                    return final_response
-
-                except Exception as e:
-                    print(f"[DEBUG] Search error: {e}")
-                    error_msg = f"I encountered an error while searching: {str(e)}"
-                    if status_callback:
-                        status_callback(error_msg)
-                    return error_msg
+            text = IncrementalCommandParser.strip_commands(response.text)
+            if text:
+                spoken_parts.append(text)
 
-            # No special commands, handle normal response
-            print("[DEBUG] No special commands found, processing normal response")
-            self.add_message("assistant", initial_response)
-            
-            # Handle TTS
-            language = self.detect_language(initial_response)
+            if not tool_calls:
+                if parser:
+                    forward(parser.take_prose(final=True))
+                # Add final response to history
+                self.add_message("assistant", response.text)
+                break
+            used_tools = True
+
+            # All results go back to the model in a single follow-up call
+            results = tool_run.results(tool_calls, cancel_token)
+            cancel_token.raise_if_cancelled()
+
+            new_image_path = self.record_tool_round(response, results, native_tools, user_input)
+            if new_image_path:
+                image_path = new_image_path
+
+        final_response = "\n\n".join(spoken_parts)
+
+        if cache_key and final_response and not used_tools:
+            self.response_cache.store(cache_key, final_response)
+
+        if image_path and final_response:
+            scene_hash = self._scene_hash(image_path)
+            if scene_hash is not None:
+                self.scene_cache.store(scene_hash, user_input, final_response,
+                                       self.current_model.get_model_name())
+
+        return self._speak(final_response, status_callback, cancel_token, turn_id, audio_callback)
+
+    def _add_cached_exchange(self, user_input: str, answer: str) -> None:
+        """Add an exchange answered from a cache to the history and to the model's own session"""
+        self.add_message("user", user_input)
+        self.add_message("assistant", answer)
+        self.current_model.record_exchange(user_input, answer)
+
+    def _speak(self,
+               final_response: str,
+               status_callback: Optional[Callable[[str], None]],
+               cancel_token: CancellationToken,
+               turn_id: Optional[str],
+               audio_callback: Optional[Callable[[str], None]]) -> str:
+        """Speak the turn's reply and clear the status line"""
+        if self.play_audio:
+            language = self.detect_language(final_response)
             self.tts_manager.text_to_speech(
-                initial_response,
+                final_response,
                 language,
                 status_callback,
-                model_name=self.current_model.get_model_name()
+                model_name=self.current_model.get_model_name(),
+                cancel_token=cancel_token,
+                turn_id=turn_id,
+                audio_callback=audio_callback
             )
 
-            if status_callback:
-                status_callback("")
+        if status_callback:
+            status_callback("")
 
-            return initial_response
+        return final_response
 
-        except Exception as e:
-            print(f"[DEBUG] Error in get_response: {str(e)}")
-            error_msg = f"Error: {str(e)}"
-            if status_callback:
-                status_callback(error_msg)
-            return error_msg
+    @staticmethod
+    def _scene_hash(image_path: str) -> Optional[int]:
+        try:
+            return SceneCache.image_hash(image_path)
+        except (OSError, ValueError) as e:
+            logger.warning("Error hashing %s: %s", image_path, e)
+            return None
+
+    def _known_scene(self, image_path: str) -> Optional[SceneEntry]:
+        """A recent answer from the current model about the scene in image_path, if any"""
+        scene_hash = self._scene_hash(image_path)
+        if scene_hash is None:
+            return None
+        return self.scene_cache.lookup(scene_hash, self.current_model.get_model_name())
+
+    def model_argument(self, adapter: AIModelInterface, turn_class: str) -> Optional[str]:
+        """Model name passed to generate_response for an adapter"""
+        return self.router.choose(adapter.get_model_name(), turn_class)
+
+    def _generate(self,
+                  adapter: AIModelInterface,
+                  turn_class: str,
+                  image_path: Optional[str],
+                  cancel_token: CancellationToken,
+                  tools: Optional[List[Dict]],
+                  on_tool_call: Callable[[ToolCall], None],
+                  on_delta: Callable[[str], None],
+                  turn_id: Optional[str] = None,
+                  round_number: int = 0) -> ModelResponse:
+        """Call one adapter with the routed model and record its latency and outcome"""
+        provider = adapter.get_model_name()
+        model = self.model_argument(adapter, turn_class)
+        model_key = ModelRouter.stats_key(provider, model) if model else None
+        started = time.monotonic()
+        first_output = threading.Event()
+
+        def mark_first_output() -> None:
+            if not first_output.is_set():
+                first_output.set()
+                elapsed = time.monotonic() - started
+                self.latency_stats.record(provider, LatencyStats.FIRST_TOKEN, elapsed)
+                if model_key:
+                    self.latency_stats.record(model_key, LatencyStats.FIRST_TOKEN, elapsed)
+                self.tracer.record(turn_id, "llm.first_token", elapsed, provider=provider, round=round_number)
+
+        def timed_delta(delta: str) -> None:
+            mark_first_output()
+            on_delta(delta)
+
+        def timed_tool_call(call: ToolCall) -> None:
+            mark_first_output()
+            on_tool_call(call)
+
+        with self.tracer.span(turn_id, "llm", provider=provider, model=model, turn_class=turn_class,
+                              round=round_number) as span:
+            try:
+                response = adapter.generate_response(
+                    self.conversation_history,
+                    model,
+                    image_path,
+                    cancel_token=cancel_token,
+                    tools=tools if adapter.supports_tools else None,
+                    on_tool_call=timed_tool_call,
+                    on_delta=timed_delta
+                )
+            except TurnCancelledError:
+                raise
+            except Exception:
+                self.router.record(provider, model, False)
+                raise
+            span["tool_calls"] = len(response.tool_calls)
+            span["prompt_tokens"] = response.usage.prompt_tokens
+            span["completion_tokens"] = response.usage.completion_tokens
+        mark_first_output()
+        self.usage_ledger.record(response.usage, self.session_id, turn_id, round_number)
+        with self._turn_lock:
+            # A hedged round counts both providers' tokens: both were paid for
+            tokens = self._turn_tokens.setdefault(turn_id, [0, 0])
+            tokens[0] += response.usage.prompt_tokens
+            tokens[1] += response.usage.completion_tokens
+        total = time.monotonic() - started
+        self.latency_stats.record(provider, LatencyStats.TOTAL, total)
+        if model_key:
+            self.latency_stats.record(model_key, LatencyStats.TOTAL, total)
+        # An answer from the fallback provider or with nothing in it counts against the model
+        self.router.record(provider, model, response.usage.provider in ("", provider)
+                           and bool(response.text or response.tool_calls))
+        return response
+
+    def _announce_tool_call(self,
+                            call: ToolCall,
+                            status_callback: Optional[Callable[[str], None]]) -> None:
+        """Report a tool call to the UI as soon as the model requests it"""
+        logger.debug("Tool call requested: %s %s", call.name, call.arguments)
+        if not status_callback:
+            return
+        if call.name == ToolDefinitions.CAMERA:
+            status_callback("Capturing image...")
+        elif call.name == ToolDefinitions.SEARCH:
+            status_callback(f"Searching for: {call.arguments.get('query', '')}")
+
+    def execute_tool(self,
+                     call: ToolCall,
+                     cancel_token: CancellationToken,
+                     capture: CaptureCoordinator,
+                     turn_id: Optional[str] = None,
+                     use_scene_cache: bool = True) -> ToolResult:
+        """
+        Run a single tool call; failures are reported back to the model as text
+        Args:
+            call: Tool call from the model
+            cancel_token: Token of the turn the call belongs to
+            capture: The turn's camera capture
+            turn_id: Trace id of the turn
+            use_scene_cache: Replace an unchanged scene with the current model's earlier
+                             description; off when the result is for another model
+        """
+        cancel_token.raise_if_cancelled()
+
+        if call.name == ToolDefinitions.CAMERA:
+            if not self.camera:
+                return ToolResult(call, "No camera is available.")
+            # Reuses the frame if the turn already captured one
+            image_path = capture.get_image()
+            if not image_path:
+                return ToolResult(call, "Failed to capture image.")
+            scene = self._known_scene(image_path) if use_scene_cache else None
+            if scene:
+                # Nothing has changed since the last analysis; skip the upload
+                self.tracer.metric(turn_id, "scene_cache", 1, mode="context")
+                return ToolResult(call, "The camera still shows the same scene as before, so no image is "
+                                        f"attached. Earlier description: {scene.answer}")
+            return ToolResult(call, "Captured an image from the camera; it is attached below.", image_path)
+
+        if call.name == ToolDefinitions.SEARCH:
+            search_query = str(call.arguments.get("query", "")).strip()
+            if not search_query:
+                return ToolResult(call, "Search failed: empty query.")
+            try:
+                with self.tracer.span(turn_id, "search"):
+                    search_result = self.search(search_query, cancel_token, turn_id)
+            except TurnCancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Search error: %s", e)
+                return ToolResult(call, f"Search failed: {str(e)}")
+            return ToolResult(call, f"""Search results for "{search_query}":
+{search_result}""")
+
+        return ToolResult(call, f"Unknown tool: {call.name}")
+
+    def search(self,
+               search_query: str,
+               cancel_token: Optional[CancellationToken] = None,
+               turn_id: Optional[str] = None) -> str:
+        """Perform an online search using Perplexity, reusing recent results for the same search"""
+        cached = self.search_cache.lookup(search_query)
+        self.tracer.metric(turn_id, "search_cache", 1 if cached is not None else 0,
+                           hit_rate=round(self.search_cache.hit_rate, 3))
+        if cached is not None:
+            return cached
+
+        search_messages = [
+            {
+                "role": "system",
+                "content": "You are a helpful search assistant. Provide accurate and concise information."
+            },
+            {
+                "role": "user",
+                "content": search_query
+            }
+        ]
+
+        response = self.search_model.generate_response(
+            search_messages,
+            self.model_argument(self.search_model, TurnClass.SEARCH),
+            None,
+            cancel_token=cancel_token
+        )
+        self.usage_ledger.record(response.usage, self.session_id, turn_id)
+        self.search_cache.store(search_query, response.text)
+        return response.text
+
+    def record_tool_round(self,
+                          response: ModelResponse,
+                          results: List[ToolResult],
+                          native_tools: bool,
+                          user_input: str,
+                          history: Optional[List[Dict]] = None) -> Optional[str]:
+        """
+        Add a tool round to the conversation history, or to another history such as
+        a model comparison's
+        Returns:
+            Optional[str]: Path of the newest captured image, if any
+        """
+        if history is None:
+            history = self.conversation_history
+        image_path = None
+
+        def add(role: str, content: str, image: Optional[str] = None) -> None:
+            history.append(self.history_message(role, content, image))
+
+        if native_tools:
+            history.append({
+                "role": "assistant",
+                "content": response.text,
+                "tool_calls": [
+                    {"id": call.id, "name": call.name, "arguments": call.arguments}
+                    for call in response.tool_calls
+                ]
+            })
+            for result in results:
+                history.append({
+                    "role": "tool",
+                    "tool_call_id": result.call.id,
+                    "name": result.call.name,
+                    "content": result.text
+                })
+            # Tool results are text-only for most providers; images follow as user content
+            for result in results:
+                if result.image_path:
+                    add("user", "Please analyze this image.", result.image_path)
+                    image_path = result.image_path
+            return image_path
+
+        # Text commands: replay results as ordinary user messages
+        add("assistant", response.text or "Let me check that.")
+        search_results = []
+        for result in results:
+            if result.image_path:
+                add("user", "Please analyze this image.", result.image_path)
+                image_path = result.image_path
+            elif result.call.name == ToolDefinitions.SEARCH:
+                search_results.append(result.text)
+            else:
+                add("user", result.text)
 
+        if search_results:
+            # Create a new user message with all search results
+            joined_results = "\n\n".join(search_results)
+            combined_input = f"""Original query: {user_input}
+
+{joined_results}
+
+Please provide a complete response incorporating this information."""
+            add("user", combined_input)
+        return image_path
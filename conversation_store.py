@@ -0,0 +1,294 @@
+# conversation_store.py
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredMessage:
+    """One persisted conversation message"""
+    id: int
+    conversation_id: str
+    created: float
+    role: str
+    text: str
+    provider: Optional[str]
+    turn_id: Optional[str]
+    image_hash: Optional[str]
+
+
+class ConversationStore:
+    """
+    Append-only SQLite store for conversations.
+
+    Messages are written in history order by a background thread, so saving
+    a turn never blocks the conversation. Images are stored once per content
+    hash instead of inline base64 in every message. Reads use the
+    (conversation_id, id) index: a page of the transcript or the tail of a
+    conversation costs the same however long the conversation is. The
+    database runs in WAL mode, so reads never wait for the writer.
+    """
+
+    DEFAULT_PATH = Path("data") / "conversations.sqlite3"
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            session_id TEXT,
+            created REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            conversation_id TEXT NOT NULL,
+            created REAL NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tool_calls TEXT,
+            tool_call_id TEXT,
+            name TEXT,
+            image_hash TEXT,
+            provider TEXT,
+            turn_id TEXT,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, id)",
+        """
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL
+        )
+        """,
+    )
+
+    _MESSAGE_COLUMNS = "id, conversation_id, created, role, content, provider, turn_id, image_hash"
+
+    def __init__(self, path: Optional[Path] = None, enabled: bool = True):
+        self.path = Path(path) if path else self.DEFAULT_PATH
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[List[Tuple[str, Tuple]]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._schema_ready = False
+
+    # ---- Writing ----
+
+    def append(self,
+               conversation_id: str,
+               messages: List[Dict],
+               session_id: Optional[str] = None,
+               provider: Optional[str] = None,
+               turn_id: Optional[str] = None,
+               prompt_tokens: Optional[int] = None,
+               completion_tokens: Optional[int] = None) -> None:
+        """
+        Queue a turn's history messages for saving
+        Args:
+            conversation_id: Conversation the messages belong to
+            messages: ConversationManager history entries, in order
+            session_id: App session, as in the usage ledger
+            provider: Model that answered
+            turn_id: Turn the messages came from
+            prompt_tokens: Prompt tokens of the turn, saved with its last message
+            completion_tokens: Completion tokens of the turn, saved with its last message
+        """
+        if not self.enabled or not messages:
+            return
+        now = time.time()
+        statements = [(
+            "INSERT OR IGNORE INTO conversations (id, session_id, created) VALUES (?, ?, ?)",
+            (conversation_id, session_id, now)
+        )]
+        for position, message in enumerate(messages):
+            text, image = self._split_content(message.get("content"))
+            image_hash = None
+            if image is not None:
+                image_hash = hashlib.sha256(image).hexdigest()
+                statements.append(("INSERT OR IGNORE INTO images (hash, data) VALUES (?, ?)", (image_hash, image)))
+            last = position == len(messages) - 1
+            statements.append((
+                "INSERT INTO messages (conversation_id, created, role, content, tool_calls, tool_call_id, name,"
+                " image_hash, provider, turn_id, prompt_tokens, completion_tokens)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (conversation_id, now, message["role"], text,
+                 json.dumps(message["tool_calls"]) if message.get("tool_calls") else None,
+                 message.get("tool_call_id"), message.get("name"), image_hash, provider, turn_id,
+                 prompt_tokens if last else None, completion_tokens if last else None)
+            ))
+        self._submit(statements)
+
+    @staticmethod
+    def _split_content(content) -> Tuple[str, Optional[bytes]]:
+        """Text and image bytes of a history message's content"""
+        if isinstance(content, str) or content is None:
+            return content or "", None
+        text, image = "", None
+        for part in content:
+            if part.get("type") == "text":
+                text = part["text"]
+            elif part.get("type") == "image_url":
+                url = part["image_url"]["url"]
+                image = base64.b64decode(url.split(",", 1)[1])
+        return text, image
+
+    def _submit(self, statements: List[Tuple[str, Tuple]]) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="conversation-store", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+        self._queue.put(statements)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        if not self._schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._schema_ready = True
+        # WAL keeps commits durable across crashes without a sync per commit
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                statements = self._queue.get()
+                try:
+                    if statements is None:
+                        break
+                    for sql, parameters in statements:
+                        connection.execute(sql, parameters)
+                    # Commit when idle so bursts share one transaction
+                    if self._queue.empty():
+                        connection.commit()
+                except sqlite3.Error as e:
+                    logger.warning("Error saving conversation: %s", e)
+                finally:
+                    self._queue.task_done()
+        finally:
+            connection.commit()
+            connection.close()
+
+    def flush(self) -> None:
+        """Wait until everything queued so far is written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write pending messages and stop the writer thread"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            self._queue.put(None)
+            writer.join(timeout=2.0)
+
+    # ---- Reading ----
+
+    def _read(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        self.flush()
+        if not self.path.exists():
+            return []
+        connection = self._connect()
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def latest_conversation(self) -> Optional[str]:
+        """Id of the conversation with the newest message"""
+        rows = self._read("SELECT conversation_id FROM messages ORDER BY id DESC LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def provider(self, conversation_id: str) -> Optional[str]:
+        """Model that answered the newest saved turn of a conversation"""
+        rows = self._read(
+            "SELECT provider FROM messages WHERE conversation_id = ? AND provider IS NOT NULL"
+            " ORDER BY id DESC LIMIT 1",
+            (conversation_id,)
+        )
+        return rows[0][0] if rows else None
+
+    def page(self,
+             conversation_id: str,
+             before_id: Optional[int] = None,
+             limit: int = 50) -> List[StoredMessage]:
+        """
+        Messages of a conversation for display, oldest first
+        Args:
+            conversation_id: Conversation to read
+            before_id: Only messages older than this id (for paging back); None for the newest
+            limit: Maximum number of messages
+        """
+        rows = self._read(
+            f"SELECT {self._MESSAGE_COLUMNS} FROM messages"
+            " WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (conversation_id, before_id if before_id is not None else 2 ** 63 - 1, limit)
+        )
+        return [StoredMessage(*row) for row in reversed(rows)]
+
+    def load_tail(self, conversation_id: str, limit: int = 40) -> List[Dict]:
+        """
+        The newest messages of a conversation as ConversationManager history entries.
+        The tail starts at a user message, so no tool result is cut off from its call.
+        Images are restored as their text only; image() returns their bytes.
+        """
+        rows = self._read(
+            "SELECT id, role, content, tool_calls, tool_call_id, name FROM messages"
+            " WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+            (conversation_id, limit)
+        )
+        rows.reverse()
+        while rows and rows[0][1] != "user":
+            rows.pop(0)
+        if not rows:
+            return []
+
+        history = []
+        for _, role, content, tool_calls, tool_call_id, name in rows:
+            message = {"role": role, "content": content}
+            if tool_calls:
+                message["tool_calls"] = json.loads(tool_calls)
+            if tool_call_id:
+                message["tool_call_id"] = tool_call_id
+            if name:
+                message["name"] = name
+            history.append(message)
+        return history
+
+    def image(self, image_hash: str) -> Optional[bytes]:
+        rows = self._read("SELECT data FROM images WHERE hash = ?", (image_hash,))
+        return rows[0][0] if rows else None
+
+
+# The writer thread only starts with the first saved turn
+_default_store = ConversationStore()
+
+
+def get_store() -> ConversationStore:
+    """Get the process-wide conversation store"""
+    return _default_store
+
+
+def set_store(store: ConversationStore) -> None:
+    """Replace the process-wide store, e.g. to keep a benchmark run out of the real one"""
+    global _default_store
+    _default_store = store
@@ -1,6 +1,6 @@
 # dual_camera_gpt_app.py
 import tkinter as tk
-from tkinter import ttk, scrolledtext, font
+from tkinter import ttk, font
 from PIL import Image, ImageTk
 import threading
 import queue
@@ -12,9 +12,15 @@ import numpy as np
 from pydub import AudioSegment
 from conversation_manager import ConversationManager
 from camera_utils import CameraManager
+from turn_tracer import get_tracer
+from transcript_view import TranscriptView
+from ui_events import AudioStateEvent, ResponseEvent, StatusEvent, TokenEvent, TranscriptionEvent, UIEventBus
 import time
 from pathlib import Path
 import opencc
+import logging
+
+logger = logging.getLogger(__name__)
 
 class DualCameraGPTApp:
     def __init__(self, master):
@@ -37,6 +43,8 @@ class DualCameraGPTApp:
         # Initialize recording state
         self.is_recording = False
         self.recording_thread = None
+        # Turn id started when recording stops, consumed by the next handle_input
+        self.pending_turn_id = None
         self.audio_data = []
         self.sample_rate = 44100
 
@@ -47,6 +55,8 @@ class DualCameraGPTApp:
         # Set default font size for chat areas
         self.current_font_size = 15
         self.chat_font = font.Font(size=self.current_font_size)
+        # Pending font resize; slider ticks are applied once the slider settles
+        self.font_size_job = None
         
         # Define color schemes for different participants
         self.chat_colors = {
@@ -62,6 +72,13 @@ class DualCameraGPTApp:
 
         # Initialize preview update flags
         self.running = True
+
+        # Worker threads post UI changes here; they are applied on the Tk thread
+        self.ui_events = UIEventBus(master)
+        # Transcript message being streamed for each turn
+        self.streaming_messages = {}
+        # Open "Compare Models" window, if any
+        self.comparison_window = None
         
         ## Initialize cameras
         self.setup_camera()
@@ -83,6 +100,14 @@ class DualCameraGPTApp:
         
         # Now we can setup text tags after chat_display is created
         self.setup_text_tags()
+
+        # Apply worker thread events on the Tk thread
+        self.ui_events.subscribe(StatusEvent, self.apply_status)
+        self.ui_events.subscribe(TokenEvent, self.show_tokens)
+        self.ui_events.subscribe(ResponseEvent, self.show_response)
+        self.ui_events.subscribe(AudioStateEvent, self.apply_audio_state)
+        self.ui_events.subscribe(TranscriptionEvent, self.send_transcription)
+        self.ui_events.start()
         
         # Start the preview loops in separate threads
         self.start_preview_thread()
@@ -90,20 +115,24 @@ class DualCameraGPTApp:
         # Display welcome message
         self.display_welcome_message()
 
+        # Continue where the last session left off
+        self.resume_conversation()
+
     
     def setup_camera(self):
         """Setup single camera"""
-        print("[DEBUG] Attempting to initialize camera")
+        logger.debug("Attempting to initialize camera")
         self.camera = None
         
         try:
-            if CameraManager.detect_camera():
-                self.camera = CameraManager.setup_camera()
-                print("[DEBUG] Camera initialized successfully")
+            backend = CameraManager.camera_backend()
+            if backend:
+                self.camera = CameraManager.setup_camera(backend)
+                logger.debug("Camera initialized successfully")
             else:
-                print("[DEBUG] No camera detected")
+                logger.debug("No camera detected")
         except Exception as e:
-            print(f"[DEBUG] Error setting up camera: {e}")
+            logger.warning("Error setting up camera: %s", e)
 
     
     def create_ui(self):
@@ -166,6 +195,15 @@ class DualCameraGPTApp:
         )
         self.send_button.pack(fill=tk.X, padx=5, pady=5, ipady=10)
 
+        # Ask every model the same question side by side
+        self.compare_button = ttk.Button(
+            self.button_frame,
+            text="Compare Models",
+            command=self.open_comparison,
+            style='Tall.TButton'
+        )
+        self.compare_button.pack(fill=tk.X, padx=5, pady=5, ipady=10)
+
         # Exit button
         self.exit_button = ttk.Button(
             self.button_frame,
@@ -225,12 +263,14 @@ class DualCameraGPTApp:
         # Chat display with reduced height
         # Ensure the chat container has fixed dimensions
         chat_container.grid_propagate(False)
-        self.chat_display = scrolledtext.ScrolledText(
+        # Only the newest messages stay in the widget; older ones page in on scroll
+        self.transcript = TranscriptView(
             chat_container,
-            wrap=tk.WORD,
-            font=self.chat_font,
+            self.chat_font,
+            self.chat_colors,
             height=10  # Shows approximately 10 lines
         )
+        self.chat_display = self.transcript.text
         self.chat_display.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
 
         # Input frame
@@ -267,7 +307,7 @@ class DualCameraGPTApp:
         """Handle input focus event"""
         self.is_input_focused = True
         self.start_focus_timer()
-        print("[DEBUG] Input focused")
+        logger.debug("Input focused")
 
     def on_input_unfocus(self, event=None):
         """Handle input unfocus event"""
@@ -275,7 +315,7 @@ class DualCameraGPTApp:
         if self.input_focus_timer:
             self.master.after_cancel(self.input_focus_timer)
             self.input_focus_timer = None
-        print("[DEBUG] Input unfocused")
+        logger.debug("Input unfocused")
 
     def reset_focus_timer(self, event=None):
         """Reset the focus timer when user types or clicks buttons"""
@@ -287,14 +327,14 @@ class DualCameraGPTApp:
         if self.input_focus_timer:
             self.master.after_cancel(self.input_focus_timer)
         self.input_focus_timer = self.master.after(3000, self.auto_unfocus)
-        print("[DEBUG] Focus timer started/reset")
+        logger.debug("Focus timer started/reset")
 
     def auto_unfocus(self):
         """Automatically unfocus the input after timer expires"""
         self.is_input_focused = False
         self.input_focus_timer = None
         self.master.focus_set()  # Move focus to main window
-        print("[DEBUG] Auto unfocused due to timer")
+        logger.debug("Auto unfocused due to timer")
 
     def handle_backtick(self, event):
         """Handle backtick key press"""
@@ -318,13 +358,13 @@ class DualCameraGPTApp:
     def on_model_change(self):
         """Handle AI model selection change"""
         selected_model = self.model_var.get()
-        print(f"[DEBUG] Model selection changed in UI to: {selected_model}")
+        logger.info("Model selection changed in UI to: %s", selected_model)
         try:
             self.conversation_manager.set_ai_model(selected_model)
             self.update_status(f"Switched to {selected_model}")
-            print(f"[DEBUG] Successfully switched conversation manager to {selected_model}")
+            logger.debug("Successfully switched conversation manager to %s", selected_model)
         except Exception as e:
-            print(f"[DEBUG] Error switching model in UI: {str(e)}")
+            logger.warning("Error switching model in UI: %s", e)
             self.update_status(f"Error switching to {selected_model}: {str(e)}")
 
     def create_font_control(self):
@@ -360,17 +400,22 @@ class DualCameraGPTApp:
 
     def update_font_size(self, *args):
         new_size = self.font_size_var.get()
-        self.current_font_size = new_size
-        self.chat_font.configure(size=new_size)
         self.font_size_label.configure(text=str(new_size))
-        
-        # Update text tags with new font size
-        self.setup_text_tags()
-        
-        # Update font for both chat display and input area
-        self.chat_display.configure(font=self.chat_font)
-        self.chat_input.configure(font=self.chat_font)
-        
+
+        # The slider fires on every tick; resize once it settles
+        if self.font_size_job:
+            self.master.after_cancel(self.font_size_job)
+        self.font_size_job = self.master.after(100, self.apply_font_size)
+
+    def apply_font_size(self):
+        self.font_size_job = None
+        new_size = self.font_size_var.get()
+        if new_size == self.current_font_size:
+            return
+        self.current_font_size = new_size
+
+        # Named fonts: the chat display, its tags and the input area follow by themselves
+        self.transcript.set_font_size(new_size)
         
         # Adjust chat display height - maintain about 10 lines of text
         # As font gets bigger, reduce number of lines to maintain reasonable height
@@ -392,9 +437,6 @@ class DualCameraGPTApp:
         #self.chat_display.configure(height=adjusted_height)
         self.chat_display.configure(height=display_height)
 
-        # Force update of the display
-        self.master.update_idletasks()
-
 
     def handle_up_key(self, event):
         if len(self.command_history) > 0:
@@ -430,10 +472,28 @@ Esc - Stop AI's talking
 
 How can I help you today?
 """
-        self.chat_display.insert(tk.END, welcome_message)
-        self.chat_display.see(tk.END)
+        self.transcript.add_message(None, "", welcome_message)
 
     
+    def resume_conversation(self):
+        """Restore the last saved conversation and show its newest messages"""
+        manager = self.conversation_manager
+        if not manager.resume_latest():
+            return
+        # The conversation continues with the model that held it
+        self.model_var.set(manager.current_model.get_model_name())
+        messages = manager.conversation_store.page(manager.conversation_id, limit=50)
+        # Show what was said: each turn's question and its final answer, not the tool traffic
+        shown_turns = set()
+        for index, message in enumerate(messages):
+            if message.role == "user" and message.turn_id not in shown_turns:
+                shown_turns.add(message.turn_id)
+                self.insert_colored_message("human", message.text)
+            elif message.role == "assistant" and message.text:
+                next_message = messages[index + 1] if index + 1 < len(messages) else None
+                if next_message is None or next_message.turn_id != message.turn_id:
+                    self.insert_colored_message(message.provider or "ChatGPT", message.text)
+
     def start_preview_thread(self):
         """Start preview thread for the camera"""
         if self.camera:
@@ -459,10 +519,10 @@ How can I help you today?
                     photo = ImageTk.PhotoImage(image=image)
                     preview_queue.put(photo)
                 else:
-                    print("[DEBUG] Empty frame from camera")
+                    logger.debug("Empty frame from camera")
                 
             except Exception as e:
-                print(f"[DEBUG] Error capturing preview: {e}")
+                logger.warning("Error capturing preview: %s", e)
                 time.sleep(0.1)
         
             time.sleep(0.033)  # ~30 FPS
@@ -478,7 +538,7 @@ How can I help you today?
                     self.preview_canvas.image = photo
                     
         except Exception as e:
-            print(f"[DEBUG] Error updating preview canvas: {e}")
+            logger.warning("Error updating preview canvas: %s", e)
     
         if self.running:
             self.master.after(33, self.update_preview_canvas)
@@ -486,6 +546,11 @@ How can I help you today?
 
 
     def update_status(self, message):
+        """Show a status message; safe to call from any thread"""
+        self.ui_events.status_callback(message)
+
+    def apply_status(self, event: StatusEvent):
+        message = event.message
         self.status_label.config(text=message)
         if message in ("---",
                        "Switched to ChatGPT", 
@@ -497,7 +562,14 @@ How can I help you today?
             self.record_button.configure(state=tk.NORMAL)#DISABLED)
         else:
             self.record_button.configure(state=tk.DISABLED)#NORMAL) # This enables the button
-        self.master.update_idletasks()
+
+    def apply_audio_state(self, event: AudioStateEvent):
+        if event.state == AudioStateEvent.RECORDING_STOPPED:
+            self.record_button.configure(bg='light gray', activebackground='gray')
+        elif event.state == AudioStateEvent.PLAYING:
+            self.record_button.configure(state=tk.DISABLED)
+        elif event.state == AudioStateEvent.STOPPED:
+            self.record_button.configure(state=tk.NORMAL)
 
     def handle_input(self):
         user_input = self.chat_input.get().strip()
@@ -525,56 +597,85 @@ How can I help you today?
         # Get current model name
         current_model = self.conversation_manager.current_model.get_model_name()
         
-        image_path = None
-        if ("camera" in user_input.lower() or
-            "what is this" in user_input.lower() or
-            "what is that" in user_input.lower()) and self.camera:
-            self.update_status("Processing image... Please wait.")
-            image_path = CameraManager.capture_and_convert(self.camera)
-            if not image_path:
-                self.insert_colored_message("system", "Error capturing image.")
-                return
-
-
-        # Get response from GPT
+        # Camera frames are captured once per turn by ConversationManager
+
+        # Voice turns were started when recording stopped; typed turns start now
+        turn_id = self.pending_turn_id or get_tracer().new_turn()
+        self.pending_turn_id = None
+
+        # Get response from GPT on a worker thread so Stop can cancel the turn
+        threading.Thread(
+            target=self.run_turn,
+            args=(user_input, current_model, turn_id),
+            daemon=True
+        ).start()
+
+    def run_turn(self, user_input: str, current_model: str, turn_id: str = None):
+        """Run a conversation turn in the background and display the result"""
+        turn_id = turn_id or get_tracer().new_turn()
         response = self.conversation_manager.get_response(
             user_input,
-            status_callback=self.update_status
+            status_callback=self.ui_events.status_callback,
+            turn_id=turn_id,
+            delta_callback=lambda delta: self.ui_events.post(TokenEvent(turn_id, current_model, delta)),
+            audio_callback=self.ui_events.audio_callback
         )
-        
-        # Display AI response with appropriate color
-        self.insert_colored_message(current_model, response)
-
-        
-        # Clear status
+        self.ui_events.post(ResponseEvent(turn_id, current_model, response))
+
+    def show_tokens(self, event: TokenEvent):
+        """Stream reply text into the transcript as it arrives"""
+        message_id = self.streaming_messages.get(event.turn_id)
+        if message_id is None:
+            tag, label = self.message_style(event.speaker)
+            message_id = self.transcript.begin_message(tag, label)
+            self.streaming_messages[event.turn_id] = message_id
+        self.transcript.append_text(message_id, event.text)
+
+    def show_response(self, event: ResponseEvent):
+        """Display a finished response"""
+        message_id = self.streaming_messages.pop(event.turn_id, None)
+        if message_id is not None:
+            self.transcript.finish_message(message_id)
+            # The streamed text is the reply; only a failure still needs showing
+            if event.text.startswith("Error"):
+                self.insert_colored_message(event.speaker, event.text)
+        elif event.text:  # Cancelled turns come back empty
+            # Display AI response with appropriate color
+            self.insert_colored_message(event.speaker, event.text)
+
+        logger.debug("UI events so far: %s posted, applied in %s batches",
+                     self.ui_events.posted, self.ui_events.batches)
+
+        # Clear status (queued, so it lands after statuses posted before the reply)
         self.update_status("")
 
    
     def cleanup(self):
         """Safely cleanup resources"""
-        print("[DEBUG] Starting cleanup...")
+        logger.debug("Starting cleanup...")
         self.running = False
+        self.ui_events.stop()
     
         if self.camera:
             try:
-                print("[DEBUG] Stopping camera...")
+                logger.debug("Stopping camera...")
                 self.camera.stop()
                 self.camera.close()
-                print("[DEBUG] Camera stopped")
+                logger.debug("Camera stopped")
             except Exception as e:
-                print(f"[DEBUG] Error stopping camera: {e}")
+                logger.warning("Error stopping camera: %s", e)
     
-        print("[DEBUG] Cleanup completed")
+        logger.debug("Cleanup completed")
 
 
 
     def exit_program(self):
         """Safely exit the program"""
-        print("[DEBUG] Exiting program...")
+        logger.debug("Exiting program...")
         try:
             self.cleanup()
         except Exception as e:
-            print(f"[DEBUG] Error during cleanup: {e}")
+            logger.warning("Error during cleanup: %s", e)
         finally:
             self.master.quit()
             self.master.destroy()
@@ -594,9 +695,31 @@ How can I help you today?
             self.is_recording = False
             self.record_button.configure(bg='light gray', activebackground='gray')
             self.update_status("Processing audio...")
+            # Waiting for the recorder and transcribing would freeze the UI
+            threading.Thread(
+                target=self.finish_recording,
+                args=(get_tracer().new_turn(),),
+                daemon=True
+            ).start()
+
+    def finish_recording(self, turn_id: str):
+        """Stop the recorder and transcribe on a worker thread"""
+        tracer = get_tracer()
+        with tracer.span(turn_id, "record_stop"):
             if self.recording_thread:
                 self.recording_thread.join()
-            self.save_and_transcribe_audio()
+        with tracer.span(turn_id, "transcribe"):
+            transcribed_text = self.save_and_transcribe_audio()
+        if transcribed_text:
+            self.ui_events.post(TranscriptionEvent(turn_id, transcribed_text))
+
+    def send_transcription(self, event: TranscriptionEvent):
+        """Put the transcription in the input field and send it"""
+        # Voice turns keep the turn id started when recording stopped
+        self.pending_turn_id = event.turn_id
+        self.chat_input.insert(0, event.text)
+        # Automatically trigger send after a short delay (to ensure UI is updated)
+        self.master.after(100, self.handle_input) #delay 100ms to trigger the Send button
 
     def record_audio(self):
         """Record audio in chunks while is_recording is True."""
@@ -606,20 +729,20 @@ How can I help you today?
                     audio_chunk, _ = stream.read(self.sample_rate)
                     self.audio_data.append(audio_chunk)
         except Exception as e:
-            print(f"Error recording audio: {e}")
+            logger.warning("Error recording audio: %s", e)
             self.update_status(f"Error recording audio: {e}")
             self.is_recording = False
-            self.master.after(0, lambda: self.record_button.configure(
-                bg='light gray', 
-                activebackground='gray'
-            ))
+            self.ui_events.audio_callback(AudioStateEvent.RECORDING_STOPPED)
 
     def save_and_transcribe_audio(self):
-        """Save recorded audio to MP3 and transcribe it."""
+        """
+        Save recorded audio to MP3 and transcribe it.
+        Returns the transcription (already converted to traditional Chinese), or None.
+        """
         try:
             if not self.audio_data:
                 self.update_status("No audio recorded")
-                return
+                return None
 
             # Combine all audio chunks
             combined_audio = np.concatenate(self.audio_data)
@@ -638,79 +761,65 @@ How can I help you today?
             
             # Transcribe audio
             self.update_status("Transcribing audio...")
-            with open(output_path, "rb") as audio_file:
-                transcription = self.conversation_manager.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
+            transcribed_text = self.conversation_manager.transcribe_audio(output_path)
             
-            # Convert to traditional Chinese if needed and display
-            transcribed_text = self.converter.convert(transcription.text)
-            self.chat_input.insert(0, transcribed_text)
             self.update_status("")
             
             # Clean up
             if output_path.exists():
                 os.remove(output_path)
 
-            # Automatically trigger send after a short delay (to ensure UI is updated)
-            self.master.after(100, self.handle_input) #delay 100ms to trigger the Send button
-
+            return transcribed_text
             
         except Exception as e:
-            print(f"Error processing audio: {e}")
+            logger.warning("Error processing audio: %s", e)
             self.update_status(f"Error processing audio: {e}")
+            return None
 
 
     def stop_audio(self, event=None):
         """
-        Stop audio playback when Escape is pressed.
+        Cancel the turn in progress and stop audio playback when Escape is pressed.
         """
         try:
+            self.conversation_manager.cancel_current_turn()
             self.conversation_manager.tts_manager.stop_playback()
             self.update_status("")
         except Exception as e:
-            print(f"Error stopping audio: {e}")
+            logger.warning("Error stopping audio: %s", e)
             self.update_status("Error stopping audio")
-    
-        # Ensure the UI remains responsive
-        self.master.update()
+
+    def open_comparison(self):
+        """Open the "Compare Models" window, or bring it to the front"""
+        from comparison_window import ComparisonWindow
+        if self.comparison_window and self.comparison_window.window.winfo_exists():
+            self.comparison_window.lift()
+            return
+        self.comparison_window = ComparisonWindow(
+            self.master, self.conversation_manager, self.chat_colors, self.chat_font
+        )
 
     def setup_text_tags(self):
-        """Configure text tags for color coding messages"""
-        for participant, color in self.chat_colors.items():
-            self.chat_display.tag_configure(
-                participant,
-                foreground=color,
-                font=(self.chat_font.actual('family'),
-                      self.chat_font.actual('size'),
-                      'bold')  # Make speaker names bold
-            )
-            # Add a tag for the message text itself (not bold)
-            self.chat_display.tag_configure(
-                f"{participant}_text",
-                foreground=color,
-                font=(self.chat_font.actual('family'),
-                      self.chat_font.actual('size'))
-            )
+        """Configure text tags for color coding messages (bold speaker names, plain text)"""
+        self.transcript.configure_speakers(self.chat_colors)
 
-    def insert_colored_message(self, speaker: str, message: str):
-        """Insert a color-coded message into the chat display"""
+    def message_style(self, speaker: str):
+        """Color tag and label for a speaker's messages"""
         # Get the appropriate color tag
         tag = speaker if speaker in self.chat_colors else 'human'
 
-        # Insert speaker label with bold colored font
+        # Speaker label in bold colored font
         if speaker == "human":
             speaker_text = "You: "
         else:
             speaker_text = f"{speaker}: "
+        return tag, speaker_text
 
-        self.chat_display.insert(tk.END, f"\n{speaker_text}", tag)
-
-        # Insert message with colored but not bold font
-        self.chat_display.insert(tk.END, f"{message}\n", f"{tag}_text")
+    def insert_colored_message(self, speaker: str, message: str):
+        """Insert a color-coded message into the chat display"""
+        tag, speaker_text = self.message_style(speaker)
 
-        # Ensure the latest message is visible
-        self.chat_display.see(tk.END)
+        # Batched into the next frame; the view scrolls to it if it is following
+        self.transcript.add_message(tag, speaker_text, message)
 
 
@@ -0,0 +1,209 @@
+# fake_camera.py
+import copy
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class FakePicamera2:
+    """
+    Stand-in for picamera2.Picamera2 that replays still images from disk.
+
+    The source is a single image (repeated forever) or a directory whose images
+    are played in name order at the configured frame rate. Without a source a
+    generated test pattern is used. capture_array() paces itself to the frame
+    rate like the real camera, which blocks until the next frame is ready.
+
+    Only the parts of the Picamera2 API the app uses are provided.
+    """
+
+    PREVIEW_SIZE = (640, 480)
+    STILL_SIZE = (4608, 2592)  # Camera Module 3 full resolution
+
+    def __init__(self,
+                 camera_num: int = 0,
+                 source: Optional[Union[str, Path]] = None,
+                 fps: float = 30.0,
+                 loop: bool = True):
+        """
+        Args:
+            camera_num: Ignored; kept for signature compatibility
+            source: Image file or directory of images to replay
+            fps: Frame rate of the replay
+            loop: Restart the sequence after the last frame instead of holding it
+        """
+        self.camera_num = camera_num
+        self.fps = fps
+        self.loop = loop
+        self.started = False
+        self.controls: Dict = {}
+        self.camera_properties = {"Model": "fake", "PixelArraySize": self.STILL_SIZE}
+        self.camera_config = self.create_preview_configuration()
+
+        self._sources = self._find_images(Path(source)) if source else []
+        self._lock = threading.Lock()
+        self._pacing_lock = threading.Lock()
+        # Decoded frames per output size, so each file is decoded and scaled once
+        self._frames: Dict[Tuple[int, int], List[np.ndarray]] = {}
+        self._started_at = 0.0
+        self._last_index = -1
+        self._closed = False
+
+    @staticmethod
+    def _find_images(source: Path) -> List[Path]:
+        if source.is_dir():
+            images = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        else:
+            images = [source] if source.exists() else []
+        if not images:
+            raise FileNotFoundError(f"No images found at {source}")
+        return images
+
+    # ---- Configuration ----
+
+    @staticmethod
+    def _configuration(use_case: str, main: Optional[Dict], default_size: Tuple[int, int],
+                       default_format: str, **kwargs) -> Dict:
+        stream = {"format": default_format, "size": default_size}
+        stream.update(main or {})
+        config = {"use_case": use_case, "main": stream, "buffer_count": 4, "controls": {}}
+        config.update(kwargs)
+        return config
+
+    def create_preview_configuration(self, main: Optional[Dict] = None, **kwargs) -> Dict:
+        return self._configuration("preview", main, self.PREVIEW_SIZE, "XBGR8888", **kwargs)
+
+    def create_still_configuration(self, main: Optional[Dict] = None, **kwargs) -> Dict:
+        return self._configuration("still", main, self.STILL_SIZE, "BGR888", **kwargs)
+
+    def create_video_configuration(self, main: Optional[Dict] = None, **kwargs) -> Dict:
+        return self._configuration("video", main, (1280, 720), "XBGR8888", **kwargs)
+
+    def configure(self, camera_config: Optional[Dict] = None) -> None:
+        if self.started:
+            raise RuntimeError("Camera must be stopped before configuring")
+        self.camera_config = copy.deepcopy(camera_config) if camera_config else self.create_preview_configuration()
+        self.controls.update(self.camera_config.get("controls", {}))
+
+    def camera_configuration(self) -> Dict:
+        return copy.deepcopy(self.camera_config)
+
+    def switch_mode(self, camera_config: Dict) -> Dict:
+        """Reconfigure a running camera, returning the previous configuration"""
+        previous = self.camera_configuration()
+        was_started = self.started
+        self.stop()
+        self.configure(camera_config)
+        if was_started:
+            self.start()
+        return previous
+
+    def set_controls(self, controls: Dict) -> None:
+        self.controls.update(controls)
+
+    # ---- Lifecycle ----
+
+    def start(self, config: Optional[Dict] = None, show_preview: bool = False) -> None:
+        if self._closed:
+            raise RuntimeError("Camera has been closed")
+        if config:
+            self.configure(config)
+        if not self.started:
+            self.started = True
+            self._started_at = time.monotonic()
+            self._last_index = -1
+
+    def stop(self) -> None:
+        self.started = False
+
+    def close(self) -> None:
+        self.stop()
+        self._closed = True
+        self._frames.clear()
+
+    # ---- Capture ----
+
+    def _frames_for(self, size: Tuple[int, int]) -> List[np.ndarray]:
+        with self._lock:
+            frames = self._frames.get(size)
+            if frames is None:
+                if self._sources:
+                    frames = [self._load(path, size) for path in self._sources]
+                else:
+                    frames = [self._test_pattern(size)]
+                self._frames[size] = frames
+                logger.debug("Fake camera prepared %s frames at %s", len(frames), size)
+            return frames
+
+    @staticmethod
+    def _load(path: Path, size: Tuple[int, int]) -> np.ndarray:
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGB").resize(size, Image.Resampling.BILINEAR))
+
+    @staticmethod
+    def _test_pattern(size: Tuple[int, int]) -> np.ndarray:
+        width, height = size
+        x = np.linspace(0, 255, width, dtype=np.uint8)
+        y = np.linspace(0, 255, height, dtype=np.uint8)
+        red = np.tile(x, (height, 1))
+        green = np.tile(y[:, None], (1, width))
+        blue = np.full((height, width), 128, dtype=np.uint8)
+        return np.dstack([red, green, blue])
+
+    def _next_frame_index(self, frame_count: int) -> int:
+        """Wait for the next frame slot and return the frame to show in it"""
+        if not self.started:
+            raise RuntimeError("Camera is not started")
+        interval = 1.0 / self.fps
+        with self._pacing_lock:
+            slot = int((time.monotonic() - self._started_at) / interval)
+            if slot <= self._last_index:
+                # Like the real camera, block until a new frame arrives
+                slot = self._last_index + 1
+                time.sleep(max(0.0, self._started_at + slot * interval - time.monotonic()))
+            self._last_index = slot
+        return slot % frame_count if self.loop else min(slot, frame_count - 1)
+
+    def _capture_rgb(self, name: str) -> Tuple[np.ndarray, str]:
+        stream = self.camera_config.get(name) or self.camera_config["main"]
+        frames = self._frames_for(tuple(stream["size"]))
+        return frames[self._next_frame_index(len(frames))], stream.get("format", "XBGR8888")
+
+    def capture_array(self, name: str = "main") -> np.ndarray:
+        """
+        Capture the current frame
+        Returns:
+            np.ndarray: HxWx4 (R, G, B, 255) for XBGR8888/XRGB8888 streams,
+                        HxWx3 in the stream's channel order otherwise
+        """
+        frame, pixel_format = self._capture_rgb(name)
+        if pixel_format in ("XBGR8888", "XRGB8888"):
+            alpha = np.full(frame.shape[:2] + (1,), 255, dtype=np.uint8)
+            rgb = frame if pixel_format == "XBGR8888" else frame[..., ::-1]
+            return np.concatenate([rgb, alpha], axis=2)
+        if pixel_format == "RGB888":
+            return frame[..., ::-1].copy()
+        return frame.copy()
+
+    def capture_image(self, name: str = "main") -> Image.Image:
+        return Image.fromarray(self._capture_rgb(name)[0])
+
+    def capture_file(self, file_output: Union[str, Path], name: str = "main", format: Optional[str] = None) -> Dict:
+        """Save the current frame; returns metadata like the real camera"""
+        self.capture_image(name).save(file_output, format=format or "JPEG", quality=95)
+        return self.capture_metadata()
+
+    def capture_metadata(self) -> Dict:
+        return {
+            "SensorTimestamp": int(time.monotonic() * 1e9),
+            "FrameDuration": int(1e6 / self.fps),
+            **self.controls,
+        }
@@ -1,110 +1,322 @@
 # gemini.py
-from ai_interface import AIModelInterface
+from ai_interface import AIModelInterface, ModelResponse, ToolCall, Usage
 import google.generativeai as genai
-from typing import List, Dict, Optional, Union
-import PIL.Image
+from typing import Callable, List, Dict, Optional, Union
 from system_prompts import SystemPrompts
+from cancellation import CancellationToken, TurnCancelledError
+from resilience import ProviderError, STREAM_DEADLINE
+import logging
+import time
+from log_utils import summarize_message
+
+logger = logging.getLogger(__name__)
 
 class GeminiModel(AIModelInterface):
+    supports_tools = True
+    # The chat session keeps the turns it was sent
+    is_stateful = True
+
+    # Session history is trimmed to roughly this many prompt tokens after each turn
+    HISTORY_TOKEN_BUDGET = 6000
+    # Images kept in the session history; older ones are replaced by a placeholder
+    MAX_HISTORY_IMAGES = 1
+    # Gemini bills every image as a fixed number of tokens
+    IMAGE_TOKENS = 258
+
     def __init__(self, service_name: str = "google"):
         """Initialize Gemini with API key"""
         super().__init__(service_name)
-        print("[DEBUG] Initializing Gemini model")
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
-        self.chat = None
+        logger.debug("Initializing Gemini model")
+        if self.base_url:
+            # Stand-in servers such as mock_provider_server.py only speak REST
+            genai.configure(
+                api_key=self.api_key,
+                transport="rest",
+                client_options={"api_endpoint": self.base_url}
+            )
+        else:
+            genai.configure(api_key=self.api_key)
         self.system_context = SystemPrompts.get_prompt("Gemini")
-        print("[DEBUG] Gemini model initialized successfully")
+        self.model_name = "gemini-1.5-flash"
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        # One session for text, image and tool turns, so image turns keep the context
+        self.chat = None
+        # Model the session currently talks to
+        self.chat_model_name: Optional[str] = None
+        logger.debug("Gemini model initialized successfully")
         
     def get_model_name(self) -> str:
         return "Gemini"
+
+    def _generative_model(self, model_name: str) -> 'genai.GenerativeModel':
+        """Model handle for a Gemini model name, created once"""
+        model = self._models.get(model_name)
+        if model is None:
+            # The system instruction travels once per request instead of with every message
+            model = genai.GenerativeModel(model_name, system_instruction=self.system_context)
+            self._models[model_name] = model
+        return model
     
     def format_messages(self, 
                        conversation_history: List[Dict],
-                       image_path: Optional[str] = None) -> Union[List[str], List[Union[str, PIL.Image.Image]]]:
+                       image_path: Optional[str] = None) -> List[Union[str, Dict, 'genai.protos.Part']]:
         """
-        Format messages for Gemini API
+        Format messages for Gemini API.
+        The chat session keeps earlier turns, so only messages added since the
+        model's last reply are sent: tool results become function responses,
+        and the image goes along as raw JPEG bytes.
         """
-        print(f"[DEBUG] Gemini format_messages: Image path = {image_path}")
-        
-        # Extract the last message
-        last_message = conversation_history[-1]
-        print(f"[DEBUG] Gemini last message: {last_message}")
-        
-        # Extract the text content
-        if isinstance(last_message["content"], list):
-            text_content = last_message["content"][0]["text"]
-        else:
-            text_content = last_message["content"]
-            
-        print(f"[DEBUG] Gemini text content: {text_content}")
-        
-        # If there's an image, handle it with context
-        if image_path:
-            try:
-                print(f"[DEBUG] Gemini opening image: {image_path}")
-                image = PIL.Image.open(image_path)
-                print(f"[DEBUG] Gemini image loaded successfully: size={image.size}, mode={image.mode}")
-                
-                # Determine which camera is being used
-                #camera_context = "front camera (Camera 1)" if "camera1" in image_path else "front camera (Camera 1)"
-                camera_context = "camera (Camera 1)" if "camera" in image_path else "camera (Camera 1)"
-                # Create a contextual prompt
-                prompt = f"{self.system_context}\n\nAnalyzing image from {camera_context}. {text_content}"
-                return [prompt, image]
-                
-            except Exception as e:
-                print(f"[DEBUG] Gemini image loading error: {e}")
-                raise Exception(f"Error loading image in Gemini: {e}")
-        else:
-            # For text-only messages, include system context
-            return [f"{self.system_context}\n\n{text_content}"]
-    
+        logger.debug("Gemini format_messages: Image path = %s", image_path)
+        logger.debug("Gemini last message: %s", summarize_message(conversation_history[-1]))
+
+        # Collect everything added after the model's last reply
+        new_messages = []
+        for message in reversed(conversation_history):
+            if message["role"] in ("assistant", "system"):
+                break
+            new_messages.insert(0, message)
+
+        formatted_content = []
+        for message in new_messages:
+            if message["role"] == "tool":
+                formatted_content.append(genai.protos.Part(
+                    function_response=genai.protos.FunctionResponse(
+                        name=message["name"],
+                        response={"result": message["content"]}
+                    )
+                ))
+                continue
+
+            # Extract the text content
+            if isinstance(message["content"], list):
+                text_content = message["content"][0]["text"]
+            else:
+                text_content = message["content"]
+            logger.debug("Gemini text content: %s", text_content)
+
+            # If there's an image on the latest message, handle it with context
+            if image_path and message is conversation_history[-1]:
+                try:
+                    # The API takes the JPEG as is; no need to decode and re-encode it
+                    with open(image_path, "rb") as image_file:
+                        image_part = {"mime_type": "image/jpeg", "data": image_file.read()}
+                    logger.debug("Gemini image loaded: %s bytes", len(image_part["data"]))
+                    formatted_content.extend([f"Analyzing image from camera (Camera 1). {text_content}", image_part])
+                    
+                except Exception as e:
+                    logger.warning("Gemini image loading error: %s", e)
+                    raise Exception(f"Error loading image in Gemini: {e}")
+            else:
+                formatted_content.append(text_content)
+
+        return formatted_content
+
+    @staticmethod
+    def _to_schema(parameters: Dict) -> 'genai.protos.Schema':
+        """Convert a JSON schema (string properties only) to a Gemini Schema"""
+        return genai.protos.Schema(
+            type=genai.protos.Type.OBJECT,
+            properties={
+                name: genai.protos.Schema(
+                    type=genai.protos.Type.STRING,
+                    description=prop.get("description", "")
+                )
+                for name, prop in parameters.get("properties", {}).items()
+            },
+            required=parameters.get("required", [])
+        )
+
+    def format_tools(self, tools: List[Dict]) -> List['genai.protos.Tool']:
+        """Convert provider-neutral tool specs to Gemini function declarations"""
+        declarations = []
+        for tool in tools:
+            declaration = genai.protos.FunctionDeclaration(
+                name=tool["name"],
+                description=tool["description"]
+            )
+            # Gemini rejects OBJECT schemas without properties
+            if tool["parameters"].get("properties"):
+                declaration.parameters = self._to_schema(tool["parameters"])
+            declarations.append(declaration)
+        return [genai.protos.Tool(function_declarations=declarations)]
+
+    def _collect_stream(self,
+                        response,
+                        cancel_token: Optional[CancellationToken],
+                        on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                        on_delta: Optional[Callable[[str], None]] = None,
+                        model_name: Optional[str] = None) -> ModelResponse:
+        """Read a streamed Gemini response, stopping early if the turn is cancelled"""
+        parts = []
+        tool_calls = []
+        usage = Usage(provider=self.get_model_name(), model=model_name or self.model_name)
+        for chunk in response:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            metadata = chunk.usage_metadata
+            if metadata.total_token_count:
+                # Cumulative; the last chunk has the totals
+                usage.prompt_tokens = metadata.prompt_token_count
+                usage.completion_tokens = metadata.candidates_token_count
+                usage.cached_tokens = metadata.cached_content_token_count
+            if not chunk.candidates:
+                continue
+            for part in chunk.parts:
+                if "function_call" in part:
+                    # Gemini has no call ids; name plus position is unique per reply
+                    function_call = part.function_call
+                    call = ToolCall(
+                        id=f"{function_call.name}_{len(tool_calls)}",
+                        name=function_call.name,
+                        arguments=dict(function_call.args)
+                    )
+                    tool_calls.append(call)
+                    if on_tool_call:
+                        on_tool_call(call)
+                elif part.text:
+                    parts.append(part.text)
+                    if on_delta:
+                        on_delta(part.text)
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        return ModelResponse(text="".join(parts), tool_calls=tool_calls, usage=usage)
+
+    @staticmethod
+    def _is_turn_start(content: 'genai.protos.Content') -> bool:
+        """Whether a history entry is a user message (not a function response)"""
+        return content.role == "user" and not any("function_response" in part for part in content.parts)
+
+    def record_exchange(self, user_text: str, answer: str) -> None:
+        """Add an exchange answered from a cache to the session, so later turns see it"""
+        if self.chat is None:
+            self.chat = self._generative_model(self.model_name).start_chat(history=[])
+            self.chat_model_name = self.model_name
+        self.chat.history = list(self.chat.history) + [
+            genai.protos.Content(role="user", parts=[genai.protos.Part(text=user_text)]),
+            genai.protos.Content(role="model", parts=[genai.protos.Part(text=answer)]),
+        ]
+        self._trim_history()
+
+    def reset_session(self, conversation_history: List[Dict]) -> None:
+        """Start a new session seeded with the text of the user and assistant messages"""
+        history = []
+        for message in conversation_history:
+            # Tool traffic is left out; the answer that followed it is kept
+            if message["role"] not in ("user", "assistant") or message.get("tool_calls"):
+                continue
+            content = message["content"]
+            text = content if isinstance(content, str) else content[0]["text"]
+            if text:
+                role = "user" if message["role"] == "user" else "model"
+                history.append(genai.protos.Content(role=role, parts=[genai.protos.Part(text=text)]))
+        self.chat = self._generative_model(self.model_name).start_chat(history=history)
+        self.chat_model_name = self.model_name
+        self._trim_history()
+
+    def _estimate_tokens(self, content: 'genai.protos.Content') -> int:
+        tokens = 0
+        for part in content.parts:
+            if "inline_data" in part:
+                tokens += self.IMAGE_TOKENS
+            elif "text" in part:
+                tokens += len(part.text) // 4 + 1
+            else:
+                tokens += len(str(part)) // 4 + 1
+        return tokens
+
+    def _trim_history(self) -> None:
+        """
+        Keep the session under HISTORY_TOKEN_BUDGET: older images become a text
+        placeholder, then the oldest whole exchanges are dropped
+        """
+        history = list(self.chat.history)
+
+        images_seen = 0
+        for index in range(len(history) - 1, -1, -1):
+            content = history[index]
+            if not any("inline_data" in part for part in content.parts):
+                continue
+            if images_seen >= self.MAX_HISTORY_IMAGES:
+                history[index] = genai.protos.Content(role=content.role, parts=[
+                    genai.protos.Part(text="(earlier camera image)") if "inline_data" in part else part
+                    for part in content.parts
+                ])
+            images_seen += 1
+
+        sizes = [self._estimate_tokens(content) for content in history]
+        total = sum(sizes)
+        start = 0
+        while total > self.HISTORY_TOKEN_BUDGET:
+            # Drop a whole exchange so function calls keep their responses
+            end = start + 1
+            while end < len(history) and not self._is_turn_start(history[end]):
+                end += 1
+            if end >= len(history):
+                break  # Never drop the latest exchange
+            total -= sum(sizes[start:end])
+            start = end
+
+        if start:
+            logger.debug("Gemini history trimmed by %s entries to ~%s tokens", start, total)
+        self.chat.history = history[start:]
+
     def generate_response(self,
                          messages: List[Dict],
-                         model: str,  # This parameter is ignored for Gemini
-                         image_path: Optional[str] = None) -> str:
+                         model: str,
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """Generate response using Gemini"""
         try:
-            print(f"[DEBUG] Gemini generate_response starting: image_path={image_path}")
+            logger.debug("Gemini generate_response starting: image_path=%s", image_path)
             formatted_content = self.format_messages(messages, image_path)
-            print(f"[DEBUG] Gemini formatted_content length: {len(formatted_content)}")
-            
-            if image_path:
-                print("[DEBUG] Gemini generating response with image")
+            logger.debug("Gemini formatted_content length: %s", len(formatted_content))
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+
+            model_name = model or self.model_name
+            if self.chat is None or self.chat_model_name != model_name:
+                # A different model continues the same session history
+                history = self.chat.history if self.chat else []
+                self.chat = self._generative_model(model_name).start_chat(history=history)
+                self.chat_model_name = model_name
+            logger.debug("Gemini generating chat response (%s history entries)", len(self.chat.history))
+            started = time.monotonic()
+            response = self.chat.send_message(
+                formatted_content,
+                generation_config={
+                    "temperature": 0.7,
+                    "max_output_tokens": 1000,
+                    "candidate_count": 1
+                },
+                tools=self.format_tools(tools) if tools else None,
+                stream=True,
+                request_options={"timeout": STREAM_DEADLINE}  # gRPC deadline covers the whole stream
+            )
+            try:
+                result = self._collect_stream(response, cancel_token, on_tool_call, on_delta, model_name)
+            except Exception:
+                # Drop the unfinished exchange so the session stays usable and a retry starts clean
                 try:
-                    response = self.model.generate_content(
-                        formatted_content,
-                        generation_config={
-                            "temperature": 0.7,
-                            "max_output_tokens": 1000,
-                            "candidate_count": 1
-                        }
-                    )
-                    print("[DEBUG] Gemini image response generated successfully")
-                    return response.text
-                except Exception as e:
-                    print(f"[DEBUG] Gemini image generation error: {e}")
-                    raise Exception(f"Error generating image response in Gemini: {e}")
-            else:
-                print("[DEBUG] Gemini generating text-only response")
-                if self.chat is None:
-                    # Initialize chat with system context
-                    self.chat = self.model.start_chat(history=[
-                        {"role": "user", "parts": self.system_context},
-                        {"role": "model", "parts": "I understand I'm an assistant with access to two cameras and will help analyze images and answer questions accordingly."}
-                    ])
-                response = self.chat.send_message(
-                    formatted_content[0],
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 1000,
-                        "candidate_count": 1
-                    }
-                )
-                return response.text
+                    self.chat.rewind()
+                except Exception:
+                    self.chat = None
+                raise
+
+            result.usage.latency = time.monotonic() - started
+            # Every image still in the session was part of this request
+            result.usage.image_tokens = self.IMAGE_TOKENS * sum(
+                "inline_data" in part for content in self.chat.history for part in content.parts
+            )
+            self._trim_history()
+            return result
             
+        except TurnCancelledError:
+            raise
         except Exception as e:
-            print(f"[DEBUG] Gemini generate_response error: {e}")
-            raise Exception(f"Error in Gemini generate_response: {e}")
-
+            logger.error("Gemini generate_response error: %s", e)
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f"Error in Gemini generate_response: {e}", "Gemini") from e
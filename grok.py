@@ -1,20 +1,32 @@
 # grok.py
 from ai_interface import AIModelInterface
-from openai import OpenAI
-from typing import List, Dict, Optional, Union
+from provider_clients import openai_client
+from typing import Callable, List, Dict, Optional, Union
 import base64
+from ai_interface import ModelResponse, ToolCall
+from cancellation import CancellationToken, TurnCancelledError
+from resilience import ProviderError
+from image_policy import ImagePolicy, estimate_image_tokens
+from stream_utils import collect_chat_stream, count_image_parts, format_openai_tool_message, is_tool_message
+from tools import ToolDefinitions
 from system_prompts import SystemPrompts
+from incremental_transcript import IncrementalTranscript
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class GrokModel(AIModelInterface):
+    supports_tools = True
+
     def __init__(self, service_name: str = "x"):
         """Initialize Grok with API key"""
         super().__init__(service_name)
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.x.ai/v1"
-        )
+        self.client = openai_client(self.api_key, self.base_url or "https://api.x.ai/v1")
+        self.model_name = "grok-beta"
         self.system_prompt = SystemPrompts.get_prompt("Grok")
-        print("[DEBUG] Initialized Grok AI model")
+        self.transcript = IncrementalTranscript(self._format_message)
+        logger.debug("Initialized Grok AI model")
         
     def get_model_name(self) -> str:
         return "Grok"
@@ -33,83 +45,101 @@ class GrokModel(AIModelInterface):
         """
         Format messages for Grok API with image support
         """
-        #formatted_messages = []
-        # Start with system prompt
-        formatted_messages = [
-            {"role": "system", "content": self.system_prompt}
-        ]
-        
-        # Add system message if present
+        # One system message: the history's (set for the current provider), else Grok's own
+        system_prompt = self.system_prompt
         if conversation_history and conversation_history[0]["role"] == "system":
-            formatted_messages.append({
-                "role": "system",
-                "content": conversation_history[0]["content"]
-            })
-        
-        # Process conversation messages
-        for message in conversation_history[1:]:  # Skip system message
-            if isinstance(message['content'], str):
-                formatted_messages.append({
-                    "role": message["role"],
-                    "content": message["content"]
-                })
-            else:  # Handle messages with images
-                if image_path and message == conversation_history[-1]:
-                    # Include image in the latest message
-                    try:
-                        base64_image = self.encode_image_to_base64(image_path)
-                        text_content = message["content"][0]["text"]
-                        formatted_messages.append({
-                            "role": message["role"],
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": text_content
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        })
-                    except Exception as e:
-                        print(f"[DEBUG] Error formatting image message: {e}")
-                        # Fallback to text-only message
-                        formatted_messages.append({
-                            "role": message["role"],
-                            "content": message["content"][0]["text"]
-                        })
-                else:
-                    # For non-image messages or previous messages with images
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": message["content"][0]["text"]
-                    })
-        
-        return formatted_messages
+            system_prompt = conversation_history[0]["content"]
+        formatted_messages = [{"role": "system", "content": system_prompt}]
+
+        # The latest message carries the captured image, if any
+        last = None
+        last_message = conversation_history[-1] if len(conversation_history) > 1 else None
+        if image_path and last_message and not isinstance(last_message["content"], str):
+            try:
+                base64_image = self.encode_image_to_base64(image_path)
+                detail = ImagePolicy.openai_detail(*ImagePolicy.image_size(image_path))
+                text_content = last_message["content"][0]["text"]
+                last = [{
+                    "role": last_message["role"],
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": text_content
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64_image}",
+                                "detail": detail
+                            }
+                        }
+                    ]
+                }]
+            except Exception as e:
+                logger.warning("Error formatting image message: %s", e)
+                # Fallback to text-only message (the cached formatting)
+
+        # Earlier messages are reused from previous turns
+        return formatted_messages + self.transcript.sync(conversation_history, last)
+
+    @staticmethod
+    def _format_message(message: Dict) -> List[Dict]:
+        """Format one history message"""
+        if message["role"] == "system":  # Added separately on every call
+            return []
+        if is_tool_message(message):
+            return [format_openai_tool_message(message)]
+        if isinstance(message['content'], str):
+            return [{
+                "role": message["role"],
+                "content": message["content"]
+            }]
+        # Previous messages with images are sent as text only
+        return [{
+            "role": message["role"],
+            "content": message["content"][0]["text"]
+        }]
     
     def generate_response(self,
                          messages: List[Dict],
-                         model: str,  # This parameter is ignored for Grok
-                         image_path: Optional[str] = None) -> str:
+                         model: str,
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """Generate response using Grok"""
         try:
             formatted_messages = self.format_messages(messages, image_path)
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             
-            # Using grok-beta for both text and image analysis
-            response = self.client.chat.completions.create(
-                model="grok-beta",
-                messages=formatted_messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
+            request = {
+                "model": model or self.model_name,
+                "messages": formatted_messages,
+                "temperature": 0.7,
+                "max_tokens": 1000,
+                "stream": True,
+                "stream_options": {"include_usage": True}
+            }
+            if tools:
+                request["tools"] = ToolDefinitions.to_openai(tools)
+
+            started = time.monotonic()
+            stream = self.client.chat.completions.create(**request)
             
-            return response.choices[0].message.content
+            response = collect_chat_stream(stream, cancel_token, on_tool_call, on_delta)
+            response.usage.provider = self.get_model_name()
+            response.usage.model = response.usage.model or request["model"]
+            response.usage.image_tokens = count_image_parts(formatted_messages) * estimate_image_tokens(
+                self.get_model_name(), image_path)
+            response.usage.latency = time.monotonic() - started
+            return response
             
+        except TurnCancelledError:
+            raise
         except Exception as e:
             error_msg = f"Error generating response from Grok: {str(e)}"
-            print(f"[DEBUG] {error_msg}")
-            raise Exception(error_msg)
+            logger.error("%s", error_msg)
+            raise ProviderError(error_msg, "Grok") from e
 
@@ -0,0 +1,163 @@
+# hedging.py
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+from ai_interface import AIModelInterface, ModelResponse, ToolCall
+from cancellation import CancellationToken, TurnCancelledError
+from latency_stats import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# Runs one model: (model, cancel_token, on_delta, on_tool_call) -> ModelResponse
+GenerateFn = Callable[
+    [AIModelInterface, CancellationToken, Callable[[str], None], Callable[[ToolCall], None]],
+    ModelResponse
+]
+
+
+class _Racer:
+    """One in-flight request taking part in a hedged call"""
+
+    def __init__(self, model: AIModelInterface, parent_token: CancellationToken):
+        self.model = model
+        self.token = parent_token.child()
+        self.result: Optional[ModelResponse] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class HedgedCaller:
+    """
+    Hedges a request across two providers to cut tail latency.
+
+    The primary request starts right away. If it has not produced a first token
+    within the primary provider's recent first-token percentile, the same request
+    is sent to the secondary provider. Whichever produces output first wins and
+    the other request is cancelled.
+
+    Stateful adapters (is_stateful, Gemini's chat session) are never paired,
+    since they only see the turns they answered themselves; ConversationManager
+    refuses them as hedge models and skips hedging while one is current.
+    """
+
+    def __init__(self,
+                 latency_stats: LatencyStats,
+                 percentile: float = 0.95,
+                 min_samples: int = 10,
+                 default_delay: float = 4.0,
+                 min_delay: float = 0.5):
+        """
+        Args:
+            latency_stats: Per-provider latency histograms driving the threshold
+            percentile: First-token percentile after which the hedge fires
+            min_samples: Samples needed before the histogram is trusted
+            default_delay: Hedge delay in seconds while samples are missing
+            min_delay: Lower bound so fast providers are not hedged constantly
+        """
+        self.latency_stats = latency_stats
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for the primary's first token before hedging"""
+        if self.latency_stats.count(provider, LatencyStats.FIRST_TOKEN) < self.min_samples:
+            return self.default_delay
+        threshold = self.latency_stats.percentile(provider, LatencyStats.FIRST_TOKEN, self.percentile)
+        return max(self.min_delay, threshold)
+
+    def call(self,
+             primary: AIModelInterface,
+             secondary: AIModelInterface,
+             generate: GenerateFn,
+             cancel_token: CancellationToken,
+             on_delta: Optional[Callable[[str], None]] = None,
+             on_tool_call: Optional[Callable[[ToolCall], None]] = None) -> ModelResponse:
+        """
+        Run a hedged request
+        Returns:
+            ModelResponse: Response from whichever provider answered first
+        Raises:
+            TurnCancelledError: If cancel_token is cancelled
+            Exception: The primary's error if both providers fail
+        """
+        condition = threading.Condition()  # Re-entrant, so launch() may run under it
+        racers: List[_Racer] = []
+        winner: List[_Racer] = []
+
+        def claim(racer: _Racer) -> bool:
+            # The first racer to produce output wins; everyone else is cancelled
+            with condition:
+                if not winner:
+                    winner.append(racer)
+                    logger.debug("Hedged request won by %s", racer.model.get_model_name())
+                    for other in racers:
+                        if other is not racer:
+                            other.token.cancel("lost hedged request")
+                    condition.notify_all()
+                return winner[0] is racer
+
+        def run(racer: _Racer) -> None:
+            def racer_delta(delta: str) -> None:
+                if claim(racer) and on_delta:
+                    on_delta(delta)
+
+            def racer_tool_call(call: ToolCall) -> None:
+                if claim(racer) and on_tool_call:
+                    on_tool_call(call)
+
+            try:
+                result = generate(racer.model, racer.token, racer_delta, racer_tool_call)
+                claim(racer)
+                racer.result = result
+            except BaseException as e:
+                racer.error = e
+            finally:
+                with condition:
+                    racer.done = True
+                    condition.notify_all()
+
+        def launch(model: AIModelInterface) -> None:
+            racer = _Racer(model, cancel_token)
+            with condition:
+                racers.append(racer)
+            threading.Thread(target=run, args=(racer,), daemon=True).start()
+
+        delay = self.hedge_delay(primary.get_model_name())
+        hedge_at = time.monotonic() + delay
+        launch(primary)
+
+        with condition:
+            while not cancel_token.is_cancelled:
+                if winner and winner[0].done:
+                    break
+                if all(racer.done for racer in racers) and (len(racers) == 2 or winner):
+                    break
+
+                primary_racer = racers[0]
+                failed_early = primary_racer.done and primary_racer.error is not None
+                if len(racers) == 1 and not winner and (failed_early or time.monotonic() >= hedge_at):
+                    reason = "failed" if failed_early else f"no first token after {delay:.2f}s"
+                    logger.debug("Hedging %s (%s) with %s", primary.get_model_name(), reason, secondary.get_model_name())
+                    launch(secondary)
+                    continue
+
+                # Wake up at the hedge deadline, and regularly to notice cancellation
+                timeout = 0.1
+                if len(racers) == 1 and not winner:
+                    timeout = min(timeout, max(0.01, hedge_at - time.monotonic()))
+                condition.wait(timeout)
+
+        cancel_token.raise_if_cancelled()
+
+        if winner and winner[0].error is None:
+            return winner[0].result
+        if winner:
+            raise winner[0].error
+        # Nobody produced output: prefer the primary's error
+        for racer in racers:
+            if not isinstance(racer.error, TurnCancelledError):
+                raise racer.error
+        raise racers[0].error
@@ -0,0 +1,200 @@
+# image_policy.py
+import io
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+try:
+    import simplejpeg
+except ImportError:
+    # Optional: libjpeg-turbo with fast DCT; Pillow is used without it
+    simplejpeg = None
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    """How to shape a camera frame before it is sent to a model"""
+    size: int = 512        # Side of the square for "center", long side for "full"
+    crop: str = "center"   # "center": square center crop; "full": whole frame
+    quality: int = 95      # JPEG quality
+
+
+@dataclass
+class ShapedImage:
+    """A frame shaped for a provider, with what it costs to send"""
+    path: str
+    width: int
+    height: int
+    bytes: int
+    tokens: int
+    encode_ms: float
+
+
+class ImagePolicy:
+    """
+    Picks resolution, crop and JPEG quality for a camera image from the
+    provider's image pricing and the kind of question.
+
+    Naming an animal or a toy works from a small center crop; reading a sign
+    or a book page needs the whole frame at a higher resolution, and "look
+    around" needs the whole frame but not fine detail. Providers bill images
+    differently: OpenAI by 512px tile (or a flat 85 tokens at low detail),
+    Claude by pixel area, Gemini a flat 258 tokens, so the sizes per provider
+    are chosen to stay just under the next price step.
+    """
+
+    IDENTIFY = "identify"
+    READ = "read"
+    SCENE = "scene"
+
+    _READ_PATTERN = re.compile(
+        r"\b(read|reading|say|says|said|written|writing|word|words|letter|letters|spell|text|sign|page|book)\b"
+        r"|読|書いて|字|读|念|写",
+        re.IGNORECASE
+    )
+    _SCENE_PATTERN = re.compile(
+        r"\b(around|room|everything|everyone|all the|surroundings)\b|what do you see|周り|周围|四周",
+        re.IGNORECASE
+    )
+
+    PROFILES: Dict[str, Dict[str, ImageSpec]] = {
+        # 512x512 fits OpenAI's low detail (85 tokens); 1024x768 is four high-detail tiles
+        "ChatGPT": {
+            IDENTIFY: ImageSpec(512, "center", 85),
+            SCENE: ImageSpec(512, "full", 85),
+            READ: ImageSpec(1024, "full", 90),
+        },
+        # Claude bills width * height / 750 tokens
+        "Claude": {
+            IDENTIFY: ImageSpec(512, "center", 85),
+            SCENE: ImageSpec(768, "full", 85),
+            READ: ImageSpec(1092, "full", 90),
+        },
+        # Flat price per image, so only upload size limits the resolution
+        "Gemini": {
+            IDENTIFY: ImageSpec(768, "center", 85),
+            SCENE: ImageSpec(768, "full", 85),
+            READ: ImageSpec(1024, "full", 90),
+        },
+        "Grok": {
+            IDENTIFY: ImageSpec(448, "center", 85),
+            SCENE: ImageSpec(896, "full", 85),
+            READ: ImageSpec(1024, "full", 90),
+        },
+    }
+    DEFAULT_SPEC = ImageSpec(512, "center", 85)
+
+    # OpenAI low detail sends the image as a single 512px thumbnail
+    OPENAI_LOW_DETAIL_SIZE = 512
+
+    @classmethod
+    def classify(cls, question: str) -> str:
+        """Kind of question asked about an image: IDENTIFY, READ or SCENE"""
+        if cls._READ_PATTERN.search(question):
+            return cls.READ
+        if cls._SCENE_PATTERN.search(question):
+            return cls.SCENE
+        return cls.IDENTIFY
+
+    @classmethod
+    def choose(cls, provider: str, question: str) -> ImageSpec:
+        """Spec for an image sent to provider with question"""
+        return cls.PROFILES.get(provider, {}).get(cls.classify(question), cls.DEFAULT_SPEC)
+
+    @classmethod
+    def openai_detail(cls, width: int, height: int) -> str:
+        """OpenAI detail flag: low when the image fits the low-detail thumbnail anyway"""
+        return "low" if max(width, height) <= cls.OPENAI_LOW_DETAIL_SIZE else "high"
+
+    @classmethod
+    def estimate_tokens(cls, provider: str, width: int, height: int) -> int:
+        """Estimated prompt tokens for one width x height image sent to provider"""
+        if provider == "ChatGPT":
+            if cls.openai_detail(width, height) == "low":
+                return 85
+            # Fit in 2048x2048, then shortest side down to 768, then 170 per 512px tile
+            scale = min(1.0, 2048 / max(width, height))
+            scale *= min(1.0, 768 / (min(width, height) * scale))
+            tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+            return 85 + 170 * tiles
+        if provider == "Claude":
+            scale = min(1.0, 1568 / max(width, height))
+            return int(width * scale * height * scale / 750)
+        if provider == "Gemini":
+            return 258
+        if provider == "Grok":
+            # 256 tokens per 448px tile plus one
+            return 256 * (math.ceil(width / 448) * math.ceil(height / 448) + 1)
+        return int(width * height / 750)
+
+    @staticmethod
+    def shape(frame: np.ndarray, spec: ImageSpec) -> Image.Image:
+        """Resize and crop an RGB frame; frames are never scaled up"""
+        image = Image.fromarray(frame).convert("RGB")
+        width, height = image.size
+        if spec.crop == "center":
+            side = min(width, height)
+            left, top = (width - side) // 2, (height - side) // 2
+            # Crop first so only the needed pixels are resampled
+            image = image.crop((left, top, left + side, top + side))
+            target = (min(spec.size, side),) * 2
+        else:
+            scale = min(1.0, spec.size / max(width, height))
+            target = (round(width * scale), round(height * scale))
+        if target != image.size:
+            # reducing_gap does most of the downscale with a fast box reduction
+            image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return image
+
+    @staticmethod
+    def encode_jpeg(image: Image.Image, quality: int) -> bytes:
+        if simplejpeg is not None:
+            return simplejpeg.encode_jpeg(np.ascontiguousarray(np.asarray(image)), quality=quality,
+                                          colorspace="RGB", colorsubsampling="420", fastdct=True)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality)
+        return buffer.getvalue()
+
+    @classmethod
+    def write(cls, frame: np.ndarray, spec: ImageSpec, output_path: str, provider: str = "") -> ShapedImage:
+        """Shape and encode a frame to output_path, logging its byte and token cost"""
+        start = time.perf_counter()
+        image = cls.shape(frame, spec)
+        data = cls.encode_jpeg(image, spec.quality)
+        with open(output_path, "wb") as output_file:
+            output_file.write(data)
+        shaped = ShapedImage(
+            path=output_path,
+            width=image.width,
+            height=image.height,
+            bytes=len(data),
+            tokens=cls.estimate_tokens(provider, image.width, image.height),
+            encode_ms=(time.perf_counter() - start) * 1000
+        )
+        logger.info("Image for %s: %s crop %dx%d q%d, %d bytes, ~%d tokens, %.1f ms",
+                    provider or "default", spec.crop, shaped.width, shaped.height, spec.quality,
+                    shaped.bytes, shaped.tokens, shaped.encode_ms)
+        return shaped
+
+    @staticmethod
+    def image_size(image_path: str) -> Tuple[int, int]:
+        """Width and height of an image file, read from its header"""
+        with Image.open(image_path) as image:
+            return image.size
+
+
+def estimate_image_tokens(provider: str, image_path: Optional[str]) -> int:
+    """Estimated prompt tokens for the image at image_path, 0 if there is none"""
+    if not image_path:
+        return 0
+    try:
+        return ImagePolicy.estimate_tokens(provider, *ImagePolicy.image_size(image_path))
+    except OSError:
+        return 0
@@ -0,0 +1,95 @@
+# incremental_transcript.py
+from typing import Callable, Dict, List, Optional
+
+
+class IncrementalTranscript:
+    """
+    Provider-shaped copy of the conversation history that is updated
+    incrementally instead of being rebuilt on every turn.
+
+    The history only grows by appends and shrinks by truncation (a cancelled
+    turn is rolled back) or replacement (clear_history), so messages are
+    matched by identity: formatting a turn costs the new messages only, and
+    no history message is ever compared by value.
+
+    Formatted entries are shared between calls; callers must not mutate them.
+    """
+
+    def __init__(self,
+                 format_message: Callable[[Dict], List[Dict]],
+                 merge_roles: bool = False):
+        """
+        Args:
+            format_message: Converts one history message into zero or more provider messages
+            merge_roles: Merge neighbouring messages with the same role (content lists are joined)
+        """
+        self.format_message = format_message
+        self.merge_roles = merge_roles
+        self._history: Optional[List[Dict]] = None
+        self._sources: List[Dict] = []            # History messages formatted so far
+        self._formatted: List[Dict] = []          # Provider messages for _sources
+        self._ends: List[int] = []                # len(_formatted) after each source message
+        self._tails: List[Optional[Dict]] = []    # _formatted[-1] after each source message
+
+    def sync(self, history: List[Dict], last: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Format the history, reusing the work of earlier calls
+        Args:
+            history: Conversation history
+            last: Provider messages to use for the final history message instead of
+                  its cached formatting, e.g. with the current image attached
+        Returns:
+            List[Dict]: Provider messages (a new list on every call)
+        """
+        cached_count = len(history) - 1 if last is not None else len(history)
+        matched = min(self._matching_prefix(history), cached_count)
+        self._truncate(matched)
+
+        for message in history[matched:cached_count]:
+            self._append(self._formatted, self.format_message(message))
+            self._sources.append(message)
+            self._ends.append(len(self._formatted))
+            self._tails.append(self._formatted[-1] if self._formatted else None)
+        self._history = history
+
+        result = list(self._formatted)
+        if last is not None:
+            self._append(result, last)
+        return result
+
+    def _matching_prefix(self, history: List[Dict]) -> int:
+        """Number of leading history messages that are already formatted"""
+        count = min(len(self._sources), len(history))
+        if count == 0:
+            return 0
+        # Same list and the newest shared message is unchanged: only appends or a rollback happened
+        if history is self._history and history[count - 1] is self._sources[count - 1]:
+            return count
+        matched = 0
+        while matched < count and history[matched] is self._sources[matched]:
+            matched += 1
+        return matched
+
+    def _truncate(self, count: int) -> None:
+        if count == len(self._sources):
+            return
+        del self._sources[count:]
+        del self._ends[count:]
+        del self._tails[count:]
+        if count == 0 or self._ends[-1] == 0:
+            self._formatted = []
+        else:
+            del self._formatted[self._ends[-1]:]
+            # Undo merges made by the removed messages
+            self._formatted[-1] = self._tails[-1]
+
+    def _append(self, formatted: List[Dict], entries: List[Dict]) -> None:
+        for entry in entries:
+            if self.merge_roles and formatted and formatted[-1]["role"] == entry["role"]:
+                # Replace rather than mutate, so cached entries stay valid
+                formatted[-1] = {
+                    "role": entry["role"],
+                    "content": formatted[-1]["content"] + entry["content"]
+                }
+            else:
+                formatted.append(entry)
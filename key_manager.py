@@ -1,6 +1,7 @@
 # key_manager.py
+import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 class KeyManager:
     """Manages API keys for different services"""
@@ -12,6 +13,15 @@ class KeyManager:
         "x": "x_key.txt",
         "perplexity": "perplexity_key.txt"
     }
+
+    # Environment overrides, e.g. CHATBOT4KIDS_OPENAI_KEY and CHATBOT4KIDS_OPENAI_BASE_URL.
+    # Used to point the app at mock_provider_server.py for benchmarks.
+    ENV_PREFIX = "CHATBOT4KIDS"
+
+    @staticmethod
+    def env_var(service: str, suffix: str) -> str:
+        """Name of the environment variable overriding a setting, e.g. ('x', 'KEY')"""
+        return f"{KeyManager.ENV_PREFIX}_{service.upper()}_{suffix}"
     
     @staticmethod
     def load_key(service: str) -> str:
@@ -27,6 +37,10 @@ class KeyManager:
         """
         if service not in KeyManager.DEFAULT_KEYS:
             raise ValueError(f"Unknown service: {service}")
+
+        override = os.environ.get(KeyManager.env_var(service, "KEY"))
+        if override:
+            return override.strip()
             
         key_file = KeyManager.DEFAULT_KEYS[service]
         try:
@@ -45,3 +59,13 @@ class KeyManager:
             raise ValueError(f"Unknown service: {service}")
         return KeyManager.DEFAULT_KEYS[service]
 
+    @staticmethod
+    def get_base_url(service: str) -> Optional[str]:
+        """
+        Get the API base URL override for a service
+        Returns:
+            Optional[str]: Base URL, or None to use the provider's default endpoint
+        """
+        if service not in KeyManager.DEFAULT_KEYS:
+            raise ValueError(f"Unknown service: {service}")
+        return os.environ.get(KeyManager.env_var(service, "BASE_URL")) or None
@@ -0,0 +1,62 @@
+# latency_stats.py
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class LatencyHistogram:
+    """Rolling window of latency samples (seconds) with percentile queries"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a percentile of the recorded samples
+        Args:
+            fraction: Percentile as a fraction, e.g. 0.95 for p95
+        Returns:
+            Optional[float]: Latency in seconds, or None if there are no samples
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+class LatencyStats:
+    """Thread-safe latency histograms per provider and metric"""
+
+    # Metric names
+    FIRST_TOKEN = "first_token"
+    TOTAL = "total"
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+    def record(self, provider: str, metric: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((provider, metric))
+            if histogram is None:
+                histogram = LatencyHistogram(self.window)
+                self._histograms[(provider, metric)] = histogram
+            histogram.record(seconds)
+
+    def percentile(self, provider: str, metric: str, fraction: float) -> Optional[float]:
+        with self._lock:
+            histogram = self._histograms.get((provider, metric))
+            return histogram.percentile(fraction) if histogram else None
+
+    def count(self, provider: str, metric: str) -> int:
+        with self._lock:
+            histogram = self._histograms.get((provider, metric))
+            return len(histogram) if histogram else 0
@@ -0,0 +1,101 @@
+# log_utils.py
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+from typing import Dict, Optional
+
+# Environment variable overriding the default log level, e.g. DEBUG
+LOG_LEVEL_ENV = "CHATBOT4KIDS_LOG_LEVEL"
+DEFAULT_LEVEL = "INFO"
+
+# Longest log message written as-is; the rest is cut off
+MAX_MESSAGE_LENGTH = 2000
+
+_DATA_URL_PATTERN = re.compile(r"data:([\w/+.-]+);base64,[A-Za-z0-9+/=]+")
+# Long unbroken base64 runs, e.g. raw image or audio payloads
+_BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/]{200,}={0,2}")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(text: str, max_length: int = MAX_MESSAGE_LENGTH) -> str:
+    """
+    Replace base64 payloads with their size and truncate long text
+    Args:
+        text: Log message
+        max_length: Characters kept before truncating
+    Returns:
+        str: Text that is safe and cheap to write to the console
+    """
+    if "base64," in text:
+        text = _DATA_URL_PATTERN.sub(
+            lambda m: f"data:{m.group(1)};base64,<{len(m.group(0))} chars redacted>", text
+        )
+    if len(text) >= 200:
+        text = _BASE64_PATTERN.sub(lambda m: f"<{len(m.group(0))} base64 chars redacted>", text)
+    if len(text) > max_length:
+        text = f"{text[:max_length]}... <{len(text) - max_length} more chars>"
+    return text
+
+
+def summarize_message(message: Dict) -> str:
+    """Describe a history message by its shape instead of its content"""
+    content = message.get("content")
+    if isinstance(content, list):
+        text_chars = sum(len(item.get("text", "")) for item in content if item.get("type") == "text")
+        images = sum(1 for item in content if item.get("type") == "image_url")
+        return f"role={message.get('role')} text={text_chars} chars images={images}"
+    return f"role={message.get('role')} text={len(content or '')} chars"
+
+
+class _RedactingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that redacts the message before it leaves the calling thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.msg = redact(record.msg)
+        return record
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """
+    Route all logging through a queue so console I/O happens on a background thread.
+    Safe to call more than once; later calls only change the level.
+    Args:
+        level: Level name; defaults to $CHATBOT4KIDS_LOG_LEVEL, then INFO
+    """
+    global _listener
+
+    level_name = (level or os.environ.get(LOG_LEVEL_ENV) or DEFAULT_LEVEL).upper()
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level_name, logging.INFO))
+
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S"
+    ))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    root.handlers = [_RedactingQueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    # Client libraries log every request at INFO
+    for noisy in ("httpx", "httpcore", "openai", "anthropic", "urllib3", "PIL"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
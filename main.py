@@ -1,8 +1,10 @@
 # main.py
 from dual_camera_gpt_app import DualCameraGPTApp
 import tkinter as tk
+from log_utils import setup_logging
 
 def main():
+    setup_logging()
     root = tk.Tk()
     app = DualCameraGPTApp(root)
     root.protocol("WM_DELETE_WINDOW", app.exit_program)
@@ -0,0 +1,472 @@
+# mock_provider_server.py
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+from key_manager import KeyManager
+from tools import ToolDefinitions
+
+logger = logging.getLogger(__name__)
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, ~26 ms); decoders play zeros as silence
+_SILENT_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+_MP3_FRAME_SECONDS = 1152 / 44100
+
+
+@dataclass
+class MockBehavior:
+    """Timing and content of the stand-in providers"""
+    first_token_latency: float = 0.3       # Seconds before the first chunk
+    # First-token latency of particular model names, e.g. {"gpt-4o-mini": 0.15}; others use first_token_latency
+    model_latency: Dict[str, float] = field(default_factory=dict)
+    tokens_per_second: float = 50.0        # Generation speed after the first chunk
+    tokens_per_chunk: int = 1              # Words per streamed chunk
+    stream: bool = True                    # False sends the whole reply at once, like a non-streaming upstream
+    failure_rate: float = 0.0              # Fraction of requests answered with 503
+    reply_text: str = (
+        "Octopuses have three hearts and blue blood. They can change color in a "
+        "fraction of a second and squeeze through any gap larger than their beak. "
+        "Isn't that amazing?"
+    )
+    # Keywords in the user's message that make the model call a tool when tools are offered
+    tool_keywords: Dict[str, str] = field(default_factory=lambda: {
+        "search": ToolDefinitions.SEARCH,
+        "news": ToolDefinitions.SEARCH,
+        "camera": ToolDefinitions.CAMERA,
+        "look": ToolDefinitions.CAMERA,
+    })
+    transcription_text: str = "Tell me a fun fact about octopuses"
+    transcription_latency: float = 0.4
+    speech_latency: float = 0.2            # Seconds before the first audio bytes
+    speech_seconds: float = 0.3            # Length of the returned silent MP3
+
+
+@dataclass
+class _Turn:
+    """What the mock model decided to do with a request"""
+    text: str = ""
+    tool_name: Optional[str] = None
+    tool_arguments: Dict = field(default_factory=dict)
+    prompt_tokens: int = 0
+
+    @property
+    def completion_tokens(self) -> int:
+        return len(self.text.split()) + (10 if self.tool_name else 0)
+
+
+class MockProviderServer:
+    """
+    Local stand-in for the OpenAI (chat, transcription, speech), Anthropic
+    messages and Gemini REST APIs, with configurable latency and token rate.
+
+    Point the app at it with the environment variables from environment(),
+    which KeyManager reads in place of the key files.
+    """
+
+    def __init__(self, behavior: Optional[MockBehavior] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            behavior: Timing and content; defaults to MockBehavior()
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+        """
+        self.behavior = behavior or MockBehavior()
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.behavior = self.behavior
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables that route every provider to this server"""
+        base_urls = {
+            "openai": f"{self.url}/v1",
+            "anthropic": self.url,
+            "google": self.url,
+            "x": f"{self.url}/v1",
+            "perplexity": self.url,
+        }
+        env = {}
+        for service, base_url in base_urls.items():
+            env[KeyManager.env_var(service, "KEY")] = "mock-key"
+            env[KeyManager.env_var(service, "BASE_URL")] = base_url
+        return env
+
+    def start(self) -> "MockProviderServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def __enter__(self) -> "MockProviderServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def behavior(self) -> MockBehavior:
+        return self.server.behavior
+
+    def first_token_latency(self, model: Optional[str]) -> float:
+        return self.behavior.model_latency.get(model or "", self.behavior.first_token_latency)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # ---- Routing ----
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+        if self.behavior.failure_rate and random.random() < self.behavior.failure_rate:
+            self._send_json({"error": {"message": "mock overloaded", "type": "overloaded_error"}}, status=503)
+            return
+
+        if path.endswith("/audio/transcriptions"):
+            self._transcription()
+        elif path.endswith("/audio/speech"):
+            self._speech()
+        elif path.endswith("/chat/completions"):
+            self._openai_chat(json.loads(body or b"{}"), len(body))
+        elif path.endswith("/messages"):
+            self._anthropic_messages(json.loads(body or b"{}"), len(body))
+        elif ":streamGenerateContent" in path or ":generateContent" in path:
+            self._gemini(path, json.loads(body or b"{}"), len(body))
+        else:
+            self._send_json({"error": {"message": f"unknown endpoint {path}"}}, status=404)
+
+    # ---- Response plumbing ----
+
+    def _send_json(self, payload: Dict, status: int = 200) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_sse(self, payload: Dict, event: Optional[str] = None) -> None:
+        prefix = f"event: {event}\n" if event else ""
+        self._write_chunk(f"{prefix}data: {json.dumps(payload)}\n\n".encode())
+
+    def _paced_text(self, text: str, model: Optional[str] = None) -> Iterator[str]:
+        """Yield the reply in chunks at the model's first-token latency and the configured token rate"""
+        behavior = self.behavior
+        words = text.split(" ")
+        time.sleep(self.first_token_latency(model))
+        if not behavior.stream:
+            time.sleep(len(words) / behavior.tokens_per_second)
+            yield text
+            return
+        step = max(1, behavior.tokens_per_chunk)
+        for start in range(0, len(words), step):
+            if start:
+                time.sleep(step / behavior.tokens_per_second)
+            chunk = " ".join(words[start:start + step])
+            yield chunk if start == 0 else " " + chunk
+
+    def _plan(self, last_text: str, tools_offered: bool, answering_tool: bool, request_size: int,
+              has_image: bool = False, model: Optional[str] = None) -> _Turn:
+        """Decide between a tool call and a text reply, like a model would"""
+        turn = _Turn(prompt_tokens=max(1, request_size // 4))
+        if tools_offered and not answering_tool:
+            # Only the user's own words count, not context paragraphs an adapter puts first
+            lowered = last_text.rsplit("\n\n", 1)[-1].lower()
+            for keyword, tool_name in self.behavior.tool_keywords.items():
+                if tool_name == ToolDefinitions.CAMERA and has_image:
+                    continue  # The picture is already attached
+                if keyword in lowered:
+                    turn.tool_name = tool_name
+                    if tool_name == ToolDefinitions.SEARCH:
+                        turn.tool_arguments = {"query": last_text}
+                    time.sleep(self.first_token_latency(model))
+                    return turn
+        turn.text = self.behavior.reply_text
+        return turn
+
+    # ---- Speech ----
+
+    def _transcription(self) -> None:
+        time.sleep(self.behavior.transcription_latency)
+        self._send_json({"text": self.behavior.transcription_text})
+
+    def _speech(self) -> None:
+        frames = max(1, int(self.behavior.speech_seconds / _MP3_FRAME_SECONDS))
+        time.sleep(self.behavior.speech_latency)
+        self._start_chunked("audio/mpeg")
+        # Stream in a few pieces so clients see chunked audio like the real endpoint
+        per_chunk = max(1, frames // 4)
+        for start in range(0, frames, per_chunk):
+            self._write_chunk(_SILENT_MP3_FRAME * min(per_chunk, frames - start))
+        self._end_chunked()
+
+    # ---- OpenAI-compatible chat (ChatGPT, Grok, Perplexity) ----
+
+    @staticmethod
+    def _openai_text(content) -> str:
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return content or ""
+
+    def _openai_chat(self, request: Dict, request_size: int) -> None:
+        messages = request.get("messages", [])
+        last = messages[-1] if messages else {}
+        model = request.get("model", "mock")
+        turn = self._plan(
+            self._openai_text(last.get("content")),
+            tools_offered=bool(request.get("tools")),
+            answering_tool=last.get("role") == "tool",
+            request_size=request_size,
+            has_image=isinstance(last.get("content"), list)
+            and any(part.get("type") == "image_url" for part in last["content"]),
+            model=model
+        )
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": turn.prompt_tokens,
+            "completion_tokens": turn.completion_tokens,
+            "total_tokens": turn.prompt_tokens + turn.completion_tokens,
+        }
+
+        if not request.get("stream"):
+            text = "".join(self._paced_text(turn.text, model)) if turn.text else None
+            message = {"role": "assistant", "content": text}
+            if turn.tool_name:
+                message["tool_calls"] = [self._openai_tool_call(turn)]
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if turn.tool_name else "stop"}],
+                "usage": usage,
+            })
+            return
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+            return {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        self._start_chunked("text/event-stream")
+        if turn.tool_name:
+            call = self._openai_tool_call(turn)
+            arguments = call["function"]["arguments"]
+            call["function"]["arguments"] = ""
+            self._write_sse(chunk({"role": "assistant", "content": None, "tool_calls": [dict(call, index=0)]}))
+            self._write_sse(chunk({"tool_calls": [{"index": 0, "function": {"arguments": arguments}}]}))
+            self._write_sse(chunk({}, "tool_calls"))
+        else:
+            self._write_sse(chunk({"role": "assistant", "content": ""}))
+            for piece in self._paced_text(turn.text, model):
+                self._write_sse(chunk({"content": piece}))
+            self._write_sse(chunk({}, "stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_sse(dict(chunk({}), choices=[], usage=usage))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+    @staticmethod
+    def _openai_tool_call(turn: _Turn) -> Dict:
+        return {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": turn.tool_name, "arguments": json.dumps(turn.tool_arguments)},
+        }
+
+    # ---- Anthropic messages (Claude) ----
+
+    def _anthropic_messages(self, request: Dict, request_size: int) -> None:
+        messages = request.get("messages", [])
+        content = messages[-1].get("content", "") if messages else ""
+        blocks = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        model = request.get("model")
+        turn = self._plan(
+            " ".join(block.get("text", "") for block in blocks if block.get("type") == "text"),
+            tools_offered=bool(request.get("tools")),
+            answering_tool=any(block.get("type") == "tool_result" for block in blocks),
+            request_size=request_size,
+            has_image=any(block.get("type") == "image" for block in blocks),
+            model=model
+        )
+        message_id = f"msg_{uuid.uuid4().hex[:12]}"
+        stop_reason = "tool_use" if turn.tool_name else "end_turn"
+        usage = {"input_tokens": turn.prompt_tokens, "output_tokens": turn.completion_tokens}
+
+        if not request.get("stream"):
+            if turn.tool_name:
+                content_blocks = [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:12]}",
+                                   "name": turn.tool_name, "input": turn.tool_arguments}]
+            else:
+                content_blocks = [{"type": "text", "text": "".join(self._paced_text(turn.text, model))}]
+            self._send_json({
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": content_blocks, "stop_reason": stop_reason, "stop_sequence": None, "usage": usage,
+            })
+            return
+
+        self._start_chunked("text/event-stream")
+        self._write_sse({
+            "type": "message_start",
+            "message": {"id": message_id, "type": "message", "role": "assistant", "model": model,
+                        "content": [], "stop_reason": None, "stop_sequence": None,
+                        "usage": {"input_tokens": turn.prompt_tokens, "output_tokens": 1}},
+        }, "message_start")
+        if turn.tool_name:
+            self._write_sse({
+                "type": "content_block_start", "index": 0,
+                "content_block": {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:12]}",
+                                  "name": turn.tool_name, "input": {}},
+            }, "content_block_start")
+            self._write_sse({
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "input_json_delta", "partial_json": json.dumps(turn.tool_arguments)},
+            }, "content_block_delta")
+        else:
+            self._write_sse({"type": "content_block_start", "index": 0,
+                             "content_block": {"type": "text", "text": ""}}, "content_block_start")
+            for piece in self._paced_text(turn.text, model):
+                self._write_sse({"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": piece}}, "content_block_delta")
+        self._write_sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        self._write_sse({"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                         "usage": {"output_tokens": turn.completion_tokens}}, "message_delta")
+        self._write_sse({"type": "message_stop"}, "message_stop")
+        self._end_chunked()
+
+    # ---- Gemini REST (generateContent / streamGenerateContent) ----
+
+    def _gemini(self, path: str, request: Dict, request_size: int) -> None:
+        contents = request.get("contents", [])
+        parts = contents[-1].get("parts", []) if contents else []
+        # .../models/gemini-1.5-flash:streamGenerateContent
+        model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+        turn = self._plan(
+            " ".join(part.get("text", "") for part in parts if "text" in part),
+            tools_offered=bool(request.get("tools")),
+            answering_tool=any("functionResponse" in part or "function_response" in part for part in parts),
+            request_size=request_size,
+            has_image=any("inlineData" in part or "inline_data" in part for part in parts),
+            model=model
+        )
+        usage = {"promptTokenCount": turn.prompt_tokens, "candidatesTokenCount": turn.completion_tokens,
+                 "totalTokenCount": turn.prompt_tokens + turn.completion_tokens}
+
+        def candidate(part: Dict, finished: bool) -> Dict:
+            payload = {"candidates": [{"content": {"parts": [part], "role": "model"}, "index": 0}]}
+            if finished:
+                payload["candidates"][0]["finishReason"] = "STOP"
+                payload["usageMetadata"] = usage
+            return payload
+
+        if turn.tool_name:
+            chunks = iter([candidate({"functionCall": {"name": turn.tool_name, "args": turn.tool_arguments}}, True)])
+        else:
+            chunks = self._gemini_text_chunks(turn.text, candidate, model)
+
+        if ":generateContent" in path:
+            if turn.tool_name:
+                self._send_json(next(chunks))
+            else:
+                self._send_json(candidate({"text": "".join(self._paced_text(turn.text, model))}, True))
+            return
+
+        # The SDK's REST transport reads a streamed JSON array; raw clients ask for SSE with alt=sse
+        sse = parse_qs(urlparse(self.path).query).get("alt", [""])[0] == "sse"
+        self._start_chunked("text/event-stream" if sse else "application/json")
+        first = True
+        for payload in chunks:
+            if sse:
+                self._write_sse(payload)
+            else:
+                self._write_chunk((("[" if first else ",\r\n") + json.dumps(payload)).encode())
+            first = False
+        if not sse:
+            self._write_chunk(b"]")
+        self._end_chunked()
+
+    def _gemini_text_chunks(self, text: str, candidate, model: Optional[str] = None) -> Iterator[Dict]:
+        pieces = self._paced_text(text, model)
+        previous = next(pieces, "")
+        for piece in pieces:
+            yield candidate({"text": previous}, False)
+            previous = piece
+        yield candidate({"text": previous}, True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the chat, speech and vision provider APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens-per-chunk", type=int, default=1)
+    parser.add_argument("--no-stream", action="store_true", help="Send each reply in a single chunk")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    behavior = MockBehavior(
+        first_token_latency=args.first_token_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        tokens_per_chunk=args.tokens_per_chunk,
+        stream=not args.no_stream,
+        failure_rate=args.failure_rate,
+    )
+    server = MockProviderServer(behavior, args.host, args.port)
+    print(f"Mock providers listening on {server.url}; point the app at them with:")
+    for name, value in server.environment().items():
+        print(f"export {name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# model_comparison.py
+import concurrent.futures
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from ai_interface import AIModelInterface, ModelResponse, Usage
+from cancellation import CancellationToken, TurnCancelledError
+from capture_coordinator import CaptureCoordinator
+from command_parser import IncrementalCommandParser
+from model_router import TurnClass
+from system_prompts import SystemPrompts
+from tools import ToolDefinitions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ComparisonResult:
+    """One provider's answer in a comparison"""
+    provider: str
+    text: str = ""
+    usage: Usage = field(default_factory=Usage)
+    first_token: Optional[float] = None  # Seconds until the first streamed text
+    total: float = 0.0                   # Seconds until the answer was complete
+    error: Optional[str] = None
+
+
+class ModelComparison:
+    """
+    Asks several providers the same question at once.
+
+    Every provider gets a fresh conversation with its own system prompt and
+    the same captured image, so answers differ only by model. Tools work as in
+    a conversation: native tool calls and text commands (Perplexity) run the
+    manager's camera and search. Answers stream through on_delta as they
+    arrive; the comparison takes as long as the slowest provider instead of
+    the sum of all of them. Nothing is spoken: the caller plays the answer it
+    picks. close() shuts down the worker pool.
+    """
+
+    def __init__(self, manager):
+        """
+        Args:
+            manager: ConversationManager whose camera, tracer and usage ledger are used
+        """
+        self.manager = manager
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="compare")
+
+    def ask(self,
+            prompt: str,
+            providers: List[str],
+            with_image: bool = False,
+            on_delta: Optional[Callable[[str, str], None]] = None,
+            on_result: Optional[Callable[[ComparisonResult], None]] = None,
+            cancel_token: Optional[CancellationToken] = None,
+            turn_id: Optional[str] = None) -> Dict[str, ComparisonResult]:
+        """
+        Send one prompt to every provider concurrently
+        Args:
+            prompt: Question to ask
+            providers: Model names, as for ConversationManager.set_ai_model
+            with_image: Attach one camera capture, the same for every provider
+            on_delta: Gets (provider, text) for streamed text, from worker threads
+            on_result: Gets each provider's result as soon as it is complete
+            cancel_token: Cancels every provider's request
+            turn_id: Trace id for the comparison
+        Returns:
+            Dict[str, ComparisonResult]: Results by provider
+        """
+        cancel_token = cancel_token or CancellationToken()
+        turn_id = turn_id or self.manager.tracer.new_turn()
+        capture = CaptureCoordinator(self.manager.camera, turn_id, self.manager.tracer)
+        try:
+            image_path = capture.get_image() if with_image else None
+            futures = [
+                self._pool.submit(self._ask_one, provider, prompt, image_path,
+                                  on_delta, cancel_token, turn_id, capture)
+                for provider in providers
+            ]
+            results = {}
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[result.provider] = result
+                if on_result:
+                    on_result(result)
+            return results
+        finally:
+            capture.close()
+
+    def close(self) -> None:
+        """Stop the worker pool; comparisons still running are left to finish"""
+        self._pool.shutdown(wait=False)
+
+    def _ask_one(self,
+                 provider: str,
+                 prompt: str,
+                 image_path: Optional[str],
+                 on_delta: Optional[Callable[[str, str], None]],
+                 cancel_token: CancellationToken,
+                 turn_id: str,
+                 capture: CaptureCoordinator) -> ComparisonResult:
+        manager = self.manager
+        result = ComparisonResult(provider, usage=Usage(provider=provider))
+        started = time.monotonic()
+        first_output = threading.Event()
+
+        def timed_delta(delta: str) -> None:
+            if not first_output.is_set():
+                first_output.set()
+                result.first_token = time.monotonic() - started
+            if on_delta:
+                on_delta(provider, delta)
+
+        try:
+            # New adapters every time, so no provider carries context from an earlier comparison
+            adapter = manager.with_resilience(manager.create_model(provider), fallback=False)
+            history = [
+                {"role": "system", "content": SystemPrompts.get_prompt(provider)},
+                manager.history_message("user", prompt, image_path),
+            ]
+            turn_class = manager.router.classify(prompt, image_path is not None)
+            native_tools = adapter.supports_tools
+            tools = ToolDefinitions.get_tools(manager.camera is not None) if native_tools else None
+            text_parts = []
+            for round_number in range(manager.max_tool_rounds + 1):
+                # The last round has to answer without further tools
+                tools_allowed = round_number < manager.max_tool_rounds
+                model = manager.model_argument(adapter, TurnClass.VISION if image_path else turn_class)
+                with manager.tracer.span(turn_id, "llm", provider=provider, model=model,
+                                         comparison=True, round=round_number):
+                    response = self._ask_round(adapter, model, history, image_path,
+                                               tools if tools_allowed else None, tools_allowed,
+                                               timed_delta, "\n\n" if text_parts else "", cancel_token)
+                result.usage.model = response.usage.model or result.usage.model
+                result.usage.prompt_tokens += response.usage.prompt_tokens
+                result.usage.completion_tokens += response.usage.completion_tokens
+                result.usage.cached_tokens += response.usage.cached_tokens
+                result.usage.image_tokens += response.usage.image_tokens
+                manager.usage_ledger.record(response.usage, manager.session_id, turn_id)
+
+                text = IncrementalCommandParser.strip_commands(response.text)
+                if text:
+                    text_parts.append(text)
+                if not response.tool_calls:
+                    break
+                # Same tools and history bookkeeping as a conversation turn, with the calls
+                # running concurrently; the scene cache holds the current model's answers
+                tool_run = manager.tool_executor.start(
+                    lambda call: manager.execute_tool(call, cancel_token, capture, turn_id,
+                                                      use_scene_cache=False)
+                )
+                results = tool_run.results(response.tool_calls, cancel_token)
+                cancel_token.raise_if_cancelled()
+                new_image_path = manager.record_tool_round(response, results, native_tools, prompt, history)
+                if new_image_path:
+                    image_path = new_image_path
+            result.text = "\n\n".join(text_parts)
+        except TurnCancelledError:
+            result.error = "cancelled"
+        except Exception as e:
+            logger.warning("Comparison with %s failed: %s", provider, e)
+            result.error = str(e)
+        result.total = time.monotonic() - started
+        if result.first_token is None and not result.error:
+            result.first_token = result.total
+        return result
+
+    def _ask_round(self,
+                   adapter: AIModelInterface,
+                   model: Optional[str],
+                   history: List[Dict],
+                   image_path: Optional[str],
+                   tools: Optional[List[Dict]],
+                   tools_allowed: bool,
+                   on_delta: Callable[[str], None],
+                   separator: str,
+                   cancel_token: CancellationToken) -> ModelResponse:
+        """
+        One model call of a comparison. Text commands are parsed from the stream
+        as in a conversation turn and returned as the response's tool calls.
+        Args:
+            tools: Tools offered to an adapter with native tool support
+            tools_allowed: Whether tool calls and text commands are acted on
+            separator: Put before the first streamed text, to set this round off from the last
+        """
+        parser = None
+        if not adapter.supports_tools:
+            parser = IncrementalCommandParser(self.manager.camera is not None)
+        generation_token = cancel_token.child()
+        pending = [separator]
+
+        def forward(delta: str) -> None:
+            if delta:
+                on_delta(pending[0] + delta)
+                pending[0] = ""
+
+        def parsed_delta(delta: str) -> None:
+            if parser:
+                parser.feed(delta)
+                if tools_allowed and parser.should_stop():
+                    generation_token.cancel("tool command detected")
+                    return
+                # Text that could still be part of a command waits until it is complete
+                delta = parser.take_prose()
+            forward(delta)
+
+        try:
+            response = adapter.generate_response(
+                history,
+                model,
+                image_path,
+                cancel_token=generation_token,
+                tools=tools,
+                on_delta=parsed_delta
+            )
+        except TurnCancelledError:
+            if cancel_token.is_cancelled or not (parser and tools_allowed and parser.commands):
+                raise
+            response = ModelResponse(text=parser.text_through_commands)
+
+        if parser:
+            response.tool_calls = list(parser.commands) if tools_allowed else []
+            if not response.tool_calls:
+                forward(parser.take_prose(final=True))
+        elif not tools_allowed:
+            response.tool_calls = []
+        return response
@@ -0,0 +1,218 @@
+# model_router.py
+import copy
+import json
+import logging
+import re
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple, Union
+from latency_stats import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class TurnClass:
+    """Kinds of turns the router tells apart"""
+    CHAT = "chat"          # Short small talk
+    MATH = "math"          # Homework: arithmetic, equations, word problems
+    VISION = "vision"      # The model gets a camera image
+    SEARCH = "search"      # Needs current information from a search
+    GENERAL = "general"    # Longer questions and explanations
+
+
+# Candidate models per provider and turn class, in order of preference
+DEFAULT_ROUTES: Dict[str, Dict[str, List[str]]] = {
+    "ChatGPT": {
+        TurnClass.CHAT: ["gpt-4o-mini", "gpt-4o"],
+        TurnClass.MATH: ["gpt-4o"],
+        TurnClass.VISION: ["gpt-4o", "gpt-4o-mini"],
+        TurnClass.SEARCH: ["gpt-4o-mini", "gpt-4o"],
+        TurnClass.GENERAL: ["gpt-4o", "gpt-4o-mini"],
+    },
+    "Claude": {
+        TurnClass.CHAT: ["claude-3-5-haiku-20241022", "claude-3-5-sonnet-20241022"],
+        TurnClass.MATH: ["claude-3-5-sonnet-20241022"],
+        TurnClass.VISION: ["claude-3-5-sonnet-20241022"],
+        TurnClass.SEARCH: ["claude-3-5-haiku-20241022", "claude-3-5-sonnet-20241022"],
+        TurnClass.GENERAL: ["claude-3-5-sonnet-20241022", "claude-3-5-haiku-20241022"],
+    },
+    "Gemini": {
+        TurnClass.CHAT: ["gemini-1.5-flash-8b", "gemini-1.5-flash"],
+        TurnClass.MATH: ["gemini-1.5-pro", "gemini-1.5-flash"],
+        TurnClass.VISION: ["gemini-1.5-flash", "gemini-1.5-pro"],
+        TurnClass.SEARCH: ["gemini-1.5-flash"],
+        TurnClass.GENERAL: ["gemini-1.5-flash"],
+    },
+    "Grok": {
+        TurnClass.CHAT: ["grok-beta"],
+        TurnClass.MATH: ["grok-beta"],
+        TurnClass.VISION: ["grok-vision-beta"],
+        TurnClass.SEARCH: ["grok-beta"],
+        TurnClass.GENERAL: ["grok-beta"],
+    },
+    "Perplexity": {
+        TurnClass.CHAT: ["llama-3.1-sonar-small-128k-online", "llama-3.1-sonar-large-128k-online"],
+        TurnClass.MATH: ["llama-3.1-sonar-large-128k-online"],
+        TurnClass.VISION: ["llama-3.1-sonar-large-128k-online"],
+        TurnClass.SEARCH: ["llama-3.1-sonar-large-128k-online"],
+        TurnClass.GENERAL: ["llama-3.1-sonar-large-128k-online"],
+    },
+}
+
+# Seconds to first token a turn class tolerates before a faster candidate is preferred
+DEFAULT_LATENCY_BUDGETS: Dict[str, float] = {
+    TurnClass.CHAT: 1.0,
+    TurnClass.SEARCH: 1.5,
+    TurnClass.GENERAL: 2.0,
+    TurnClass.VISION: 2.5,
+    TurnClass.MATH: 3.0,
+}
+
+
+class ModelRouter:
+    """
+    Picks the model a provider uses for each turn.
+
+    The provider stays the one the user selected, since it is also the voice
+    and persona; the router chooses among that provider's models. A turn is
+    classified from its text and whether it carries an image, and the first
+    candidate for its class is used unless it keeps failing or its recent p50
+    first-token latency is over the class's budget, in which case the next
+    candidate is tried. Models without enough samples count as within budget,
+    so new table entries get measured.
+    """
+
+    SEARCH_PATTERN = re.compile(
+        r"\b(search|look up|google|news|latest|today|tonight|this week|weather|forecast|score|who won|price)\b"
+        r"|最新|新聞|天氣|今天|搜尋|查一下"          # Traditional Chinese
+        r"|ニュース|天気|今日|検索|調べて",          # Japanese
+        re.IGNORECASE
+    )
+    MATH_PATTERN = re.compile(
+        r"\d\s*[-+*/×÷x=^]\s*\d"
+        r"|\b(solve|equation|calculate|fraction|multiply|divided|times|plus|minus|percent|homework|math"
+        r"|algebra|geometry|perimeter|area of)\b"
+        r"|計算|方程|分數|乘以|除以|數學|作業"        # Traditional Chinese
+        r"|数学|宿題|分数|割り算|掛け算",            # Japanese
+        re.IGNORECASE
+    )
+    # Up to this many words (two CJK characters count as one) is small talk
+    CHAT_MAX_WORDS = 12
+
+    def __init__(self,
+                 latency_stats: LatencyStats,
+                 routes: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 latency_budgets: Optional[Dict[str, float]] = None,
+                 min_samples: int = 5,
+                 max_failure_rate: float = 0.3,
+                 window: int = 50):
+        """
+        Args:
+            latency_stats: Histograms that ConversationManager records per stats_key()
+            routes: Candidate models per provider and turn class, in order of preference
+            latency_budgets: First-token seconds per turn class before a faster candidate is preferred
+            min_samples: Samples needed before a model's latency or failure rate is trusted
+            max_failure_rate: Recent share of failed or empty answers that takes a model out of rotation
+            window: Outcomes remembered per model
+        """
+        self.latency_stats = latency_stats
+        self.routes = routes if routes is not None else copy.deepcopy(DEFAULT_ROUTES)
+        self.latency_budgets = dict(DEFAULT_LATENCY_BUDGETS, **(latency_budgets or {}))
+        self.min_samples = min_samples
+        self.max_failure_rate = max_failure_rate
+        self.window = window
+        self._lock = threading.Lock()
+        self._outcomes: Dict[Tuple[str, str], Deque[bool]] = {}
+
+    @classmethod
+    def load(cls, latency_stats: LatencyStats, path: Union[str, Path] = "model_routes.json") -> "ModelRouter":
+        """
+        Router with the defaults, overridden by a JSON file if it exists:
+        {"routes": {"ChatGPT": {"chat": ["gpt-4o-mini"]}}, "latency_budgets": {"chat": 0.8}}
+        """
+        router = cls(latency_stats)
+        path = Path(path)
+        if not path.exists():
+            return router
+        try:
+            config = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring model routes in %s: %s", path, e)
+            return router
+        for provider, classes in config.get("routes", {}).items():
+            router.routes.setdefault(provider, {}).update(classes)
+        router.latency_budgets.update(config.get("latency_budgets", {}))
+        logger.info("Model routes loaded from %s", path)
+        return router
+
+    @staticmethod
+    def stats_key(provider: str, model: str) -> str:
+        """Key the latency of one provider's model is recorded under in LatencyStats"""
+        return f"{provider}/{model}"
+
+    def classify(self, text: str, has_image: bool = False) -> str:
+        """
+        Classify a turn
+        Args:
+            text: The user's message
+            has_image: Whether the model gets a camera image with it
+        Returns:
+            str: A TurnClass value
+        """
+        if has_image:
+            return TurnClass.VISION
+        if self.SEARCH_PATTERN.search(text):
+            return TurnClass.SEARCH
+        if self.MATH_PATTERN.search(text):
+            return TurnClass.MATH
+        words = (len(re.findall(r"[A-Za-z0-9']+", text))
+                 + len(re.findall(r"[\u3040-\u30ff\u3400-\u9fff]", text)) / 2)
+        return TurnClass.CHAT if words <= self.CHAT_MAX_WORDS else TurnClass.GENERAL
+
+    def choose(self, provider: str, turn_class: str) -> Optional[str]:
+        """
+        Model for a provider and turn class
+        Returns:
+            Optional[str]: Model name, or None to use the adapter's default
+        """
+        provider_routes = self.routes.get(provider, {})
+        candidates = provider_routes.get(turn_class) or provider_routes.get(TurnClass.GENERAL)
+        if not candidates:
+            return None
+        healthy = [model for model in candidates
+                   if self.failure_rate(provider, model) <= self.max_failure_rate] or candidates
+
+        budget = self.latency_budgets.get(turn_class)
+        measured: Dict[str, float] = {}
+        for model in healthy:
+            key = self.stats_key(provider, model)
+            if budget is None or self.latency_stats.count(key, LatencyStats.FIRST_TOKEN) < self.min_samples:
+                return model
+            p50 = self.latency_stats.percentile(key, LatencyStats.FIRST_TOKEN, 0.5)
+            if p50 <= budget:
+                return model
+            measured[model] = p50
+
+        # Everything is over budget: take the fastest
+        fastest = min(measured, key=measured.get)
+        logger.debug("All %s models over the %s budget; using %s", provider, turn_class, fastest)
+        return fastest
+
+    def record(self, provider: str, model: Optional[str], ok: bool) -> None:
+        """Record whether a model answered usefully (no error, not empty, no fallback)"""
+        if not model:
+            return
+        with self._lock:
+            outcomes = self._outcomes.get((provider, model))
+            if outcomes is None:
+                outcomes = self._outcomes[(provider, model)] = deque(maxlen=self.window)
+            outcomes.append(ok)
+
+    def failure_rate(self, provider: str, model: str) -> float:
+        """Recent share of failed answers; 0.0 until min_samples outcomes exist"""
+        with self._lock:
+            outcomes = self._outcomes.get((provider, model))
+            if not outcomes or len(outcomes) < self.min_samples:
+                return 0.0
+            return 1.0 - sum(outcomes) / len(outcomes)
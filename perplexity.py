@@ -1,18 +1,26 @@
 # perplexity.py
 from ai_interface import AIModelInterface
-from openai import OpenAI
-from typing import List, Dict, Optional
+from provider_clients import openai_client
+from typing import Callable, List, Dict, Optional
 import base64
+from ai_interface import ModelResponse, ToolCall
+from cancellation import CancellationToken, TurnCancelledError
+from resilience import ProviderError
+from stream_utils import collect_chat_stream, is_tool_message, tool_message_as_text
+from incremental_transcript import IncrementalTranscript
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class PerplexityModel(AIModelInterface):
     def __init__(self, service_name: str = "perplexity"):
         """Initialize Perplexity with API key"""
         super().__init__(service_name)
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.perplexity.ai"
-        )
-        print("[DEBUG] Initialized Perplexity AI model")
+        self.client = openai_client(self.api_key, self.base_url or "https://api.perplexity.ai")
+        self.model_name = "llama-3.1-sonar-large-128k-online"
+        self.transcript = IncrementalTranscript(self._format_message)
+        logger.debug("Initialized Perplexity AI model")
         
     def get_model_name(self) -> str:
         return "Perplexity"
@@ -41,53 +49,77 @@ class PerplexityModel(AIModelInterface):
                 "content": conversation_history[0]["content"]
             })
         
-        # Process conversation messages
-        for message in conversation_history[1:]:  # Skip system message if present
-            if isinstance(message['content'], str):
-                formatted_messages.append({
-                    "role": message["role"],
-                    "content": message["content"]
-                })
-            else:  # Handle messages with images
-                if image_path and message == conversation_history[-1]:
-                    # This is a temporary implementation - update when image support is confirmed
-                    text_content = message["content"][0]["text"]
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": f"{text_content} [Note: Image analysis capabilities subject to API support]"
-                    })
-                else:
-                    # For non-image messages or previous messages
-                    formatted_messages.append({
-                        "role": message["role"],
-                        "content": message["content"][0]["text"]
-                    })
-        
-        return formatted_messages
+        # Only the latest message can carry the captured image
+        last = None
+        last_message = conversation_history[-1] if len(conversation_history) > 1 else None
+        if (image_path and last_message and not is_tool_message(last_message)
+                and not isinstance(last_message["content"], str)):
+            # This is a temporary implementation - update when image support is confirmed
+            text_content = last_message["content"][0]["text"]
+            last = [{
+                "role": last_message["role"],
+                "content": f"{text_content} [Note: Image analysis capabilities subject to API support]"
+            }]
+
+        # Earlier messages are reused from previous turns
+        return formatted_messages + self.transcript.sync(conversation_history, last)
+
+    @staticmethod
+    def _format_message(message: Dict) -> List[Dict]:
+        """Format one history message"""
+        if message["role"] == "system":  # Added separately on every call
+            return []
+        if is_tool_message(message):
+            # No native tool support: replay tool traffic as plain text
+            return [tool_message_as_text(message)]
+        if isinstance(message['content'], str):
+            return [{
+                "role": message["role"],
+                "content": message["content"]
+            }]
+        # For non-image messages or previous messages
+        return [{
+            "role": message["role"],
+            "content": message["content"][0]["text"]
+        }]
     
     def generate_response(self,
                          messages: List[Dict],
-                         model: str,  # This parameter is ignored for Perplexity
-                         image_path: Optional[str] = None) -> str:
+                         model: str,
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,  # Not supported by Perplexity
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
         """Generate response using Perplexity"""
         try:
             formatted_messages = self.format_messages(messages, image_path)
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             
             # If there's an image but image support isn't confirmed
             if image_path:
-                print("[DEBUG] Image analysis capabilities subject to Perplexity API support")
+                logger.debug("Image analysis capabilities subject to Perplexity API support")
             
-            response = self.client.chat.completions.create(
-                model="llama-3.1-sonar-large-128k-online",  # Default model
+            started = time.monotonic()
+            stream = self.client.chat.completions.create(
+                model=model or self.model_name,
                 messages=formatted_messages,
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                stream=True  # Perplexity reports usage in the stream without stream_options
             )
             
-            return response.choices[0].message.content
+            response = collect_chat_stream(stream, cancel_token, on_delta=on_delta)
+            response.usage.provider = self.get_model_name()
+            response.usage.model = response.usage.model or model or self.model_name
+            response.usage.latency = time.monotonic() - started
+            return response
             
+        except TurnCancelledError:
+            raise
         except Exception as e:
             error_msg = f"Error generating response from Perplexity: {str(e)}"
-            print(f"[DEBUG] {error_msg}")
-            raise Exception(error_msg)
+            logger.error("%s", error_msg)
+            raise ProviderError(error_msg, "Perplexity") from e
 
@@ -0,0 +1,43 @@
+# provider_clients.py
+import threading
+from typing import Dict, Optional, Tuple
+from openai import OpenAI
+from resilience import REQUEST_TIMEOUT
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, str, Optional[str]], object] = {}
+
+
+def _shared(kind: str, api_key: str, base_url: Optional[str], factory):
+    key = (kind, api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory()
+        return client
+
+
+def openai_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    OpenAI SDK client shared by every adapter and session using the same key and
+    endpoint (OpenAI itself, Grok, Perplexity, Whisper, TTS), so they share one
+    connection pool instead of each opening its own. SDK clients are thread-safe.
+    Retries are handled by resilience.ResilientModel, not the SDK.
+    """
+    return _shared("openai", api_key, base_url, lambda: OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0
+    ))
+
+
+def anthropic_client(api_key: str, base_url: Optional[str] = None):
+    """Anthropic SDK client shared like openai_client"""
+    from anthropic import Anthropic
+    return _shared("anthropic", api_key, base_url, lambda: Anthropic(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0
+    ))
@@ -0,0 +1,381 @@
+# resilience.py
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+from ai_interface import AIModelInterface, ModelResponse, ToolCall
+from cancellation import CancellationToken, TurnCancelledError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Client-side socket timeout (connect/read/write) for provider HTTP clients, seconds.
+# Streaming reads reset it per chunk, so it catches hung sockets, not long answers.
+REQUEST_TIMEOUT = 20.0
+
+# Upper bound for a whole provider call, seconds: every chunk, every retry and the fallback
+STREAM_DEADLINE = 60.0
+
+
+class ProviderError(Exception):
+    """Error raised by a provider adapter or speech service"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, retryable: Optional[bool] = None):
+        """
+        Args:
+            message: Error description
+            provider: Name of the failing provider
+            retryable: Whether retrying may help; None derives it from the cause
+        """
+        super().__init__(message)
+        self.provider = provider
+        self.retryable = retryable
+
+
+class ProviderTimeoutError(ProviderError):
+    """A provider call exceeded its deadline"""
+
+    def __init__(self, message: str, provider: Optional[str] = None):
+        super().__init__(message, provider, retryable=True)
+
+
+# Exception class names (openai, anthropic, google-api-core, httpx) worth retrying
+_RETRYABLE_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "ServiceUnavailable", "DeadlineExceeded", "ResourceExhausted", "TooManyRequests",
+    "TimeoutException", "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",
+    "TimeoutError", "ConnectionError",
+}
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient, following wrapped causes"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, TurnCancelledError):
+            return False
+        if isinstance(error, ProviderError) and error.retryable is not None:
+            return error.retryable
+        if type(error).__name__ in _RETRYABLE_NAMES:
+            return True
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int) and status in _RETRYABLE_STATUS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+    After failure_threshold consecutive failures the breaker opens and calls are
+    refused for reset_timeout seconds; then a single trial call is let through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the provider right now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker for %s closed", self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit breaker for %s opened after %s failures", self.name, self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """End a trial call that neither succeeded nor recorded a failure; it counts as one"""
+        with self._lock:
+            if not self._trial_in_flight:
+                return
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN:
+                logger.warning("Trial call for %s did not succeed; circuit breaker stays open", self.name)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the shared circuit breaker for a provider or service"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class RetryPolicy:
+    """
+    Retries with full-jitter exponential backoff, bounded by one deadline for
+    the whole operation: a retry only gets the time the earlier attempts left.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 deadline: float = STREAM_DEADLINE,
+                 base_delay: float = 0.5,
+                 max_delay: float = 4.0):
+        """
+        Args:
+            max_attempts: Total attempts including the first
+            deadline: Time limit for all attempts together, in seconds
+            base_delay: Backoff before the first retry (upper bound of the jitter)
+            max_delay: Cap on the backoff between attempts
+        """
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def run(self,
+            call: Callable[[CancellationToken], T],
+            cancel_token: Optional[CancellationToken] = None,
+            breaker: Optional[CircuitBreaker] = None,
+            can_retry: Callable[[], bool] = lambda: True,
+            name: str = "provider",
+            deadline_at: Optional[float] = None) -> T:
+        """
+        Run call(token) with retries
+        Args:
+            call: Operation; must honour the token it is given
+            cancel_token: Turn token; cancelling it stops retries immediately
+            breaker: Circuit breaker to report outcomes to
+            can_retry: Returns False once a retry would no longer be idempotent,
+                       e.g. after streamed text has been shown to the user
+            name: Name used in errors and logs
+            deadline_at: time.monotonic() by which all attempts must be done, to share
+                         one deadline between calls; defaults to deadline seconds from now
+        Raises:
+            TurnCancelledError: If cancel_token was cancelled
+            ProviderTimeoutError: If the deadline passed
+        """
+        cancel_token = cancel_token or CancellationToken()
+        if deadline_at is None:
+            deadline_at = time.monotonic() + self.deadline
+        try:
+            return self._run_attempts(call, cancel_token, breaker, can_retry, name, deadline_at)
+        finally:
+            # Cancellations and permanent errors record nothing; a half-open trial
+            # still has to end, or the breaker would never let another call through
+            if breaker:
+                breaker.release_trial()
+
+    def _run_attempts(self,
+                      call: Callable[[CancellationToken], T],
+                      cancel_token: CancellationToken,
+                      breaker: Optional[CircuitBreaker],
+                      can_retry: Callable[[], bool],
+                      name: str,
+                      deadline_at: float) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise ProviderTimeoutError(f"{name} had no time left to answer", name)
+            attempt_token = cancel_token.child()
+            timer = threading.Timer(remaining, attempt_token.cancel, args=("deadline exceeded",))
+            timer.daemon = True
+            timer.start()
+            try:
+                result = call(attempt_token)
+                if breaker:
+                    breaker.record_success()
+                return result
+            except TurnCancelledError:
+                if cancel_token.is_cancelled:
+                    raise
+                error: BaseException = ProviderTimeoutError(
+                    f"{name} did not finish within {remaining:.1f}s", name
+                )
+            except Exception as e:
+                error = e
+            finally:
+                timer.cancel()
+
+            # Only transient failures say something about the provider's health
+            if breaker and is_retryable(error):
+                breaker.record_failure()
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+            if (attempt >= self.max_attempts or not is_retryable(error) or not can_retry()
+                    or time.monotonic() + delay >= deadline_at):
+                raise error
+
+            logger.warning("%s attempt %s failed (%s); retrying in %.2fs", name, attempt, error, delay)
+            if cancel_token.wait(delay):
+                raise TurnCancelledError(cancel_token.reason or "cancelled")
+
+
+class ResilientModel(AIModelInterface):
+    """
+    Wraps an adapter with retries, deadlines and a circuit breaker, and routes
+    to a fallback adapter while the provider is failing or its breaker is open.
+
+    One deadline (the retry policy's) covers a whole call: the primary's
+    attempts and the fallback's. When there is a fallback, the primary may
+    use all but fallback_reserve of it, so the fallback still has time to answer.
+    """
+
+    def __init__(self,
+                 primary: AIModelInterface,
+                 fallback_factory: Optional[Callable[[], AIModelInterface]] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 fallback_reserve: float = 0.4):
+        """
+        Args:
+            primary: Adapter to call
+            fallback_factory: Creates the adapter used while the primary fails
+            retry_policy: Retries and deadline for the whole call
+            fallback_reserve: Share of the deadline kept for the fallback
+        """
+        # No API key of its own; the wrapped adapters hold theirs
+        self.primary = primary
+        self.fallback_factory = fallback_factory
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.fallback_reserve = fallback_reserve
+        self.breaker = get_breaker(primary.get_model_name())
+        self._fallback: Optional[AIModelInterface] = None
+
+    @property
+    def supports_tools(self) -> bool:
+        return self.primary.supports_tools
+
+    @property
+    def is_stateful(self) -> bool:
+        return self.primary.is_stateful
+
+    def get_model_name(self) -> str:
+        return self.primary.get_model_name()
+
+    def format_messages(self, conversation_history: List[Dict], image_path: Optional[str] = None):
+        return self.primary.format_messages(conversation_history, image_path)
+
+    def record_exchange(self, user_text: str, answer: str) -> None:
+        self.primary.record_exchange(user_text, answer)
+
+    def reset_session(self, conversation_history: List[Dict]) -> None:
+        self.primary.reset_session(conversation_history)
+
+    def _get_fallback(self) -> Optional[AIModelInterface]:
+        if self._fallback is None and self.fallback_factory:
+            try:
+                self._fallback = self.fallback_factory()
+            except Exception as e:
+                logger.warning("Fallback for %s unavailable: %s", self.get_model_name(), e)
+                self.fallback_factory = None
+        return self._fallback
+
+    def generate_response(self,
+                         messages: List[Dict],
+                         model: str,
+                         image_path: Optional[str] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         tools: Optional[List[Dict]] = None,
+                         on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                         on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
+        """Generate a response, retrying or falling back when the provider fails"""
+        cancel_token = cancel_token or CancellationToken()
+        emitted = threading.Event()
+        deadline_at = time.monotonic() + self.retry_policy.deadline
+        primary_deadline_at = deadline_at
+        if self.fallback_factory or self._fallback:
+            primary_deadline_at -= self.retry_policy.deadline * self.fallback_reserve
+
+        def tracked_delta(delta: str) -> None:
+            emitted.set()
+            if on_delta:
+                on_delta(delta)
+
+        def tracked_tool_call(call: ToolCall) -> None:
+            emitted.set()
+            if on_tool_call:
+                on_tool_call(call)
+
+        def attempt(model_adapter: AIModelInterface, model_name: Optional[str]):
+            return lambda token: model_adapter.generate_response(
+                messages, model_name, image_path,
+                cancel_token=token,
+                tools=tools if model_adapter.supports_tools else None,
+                on_tool_call=tracked_tool_call,
+                on_delta=tracked_delta
+            )
+
+        if self.breaker.allow_request():
+            try:
+                return self.retry_policy.run(
+                    attempt(self.primary, model),
+                    cancel_token,
+                    breaker=self.breaker,
+                    can_retry=lambda: not emitted.is_set(),
+                    name=self.get_model_name(),
+                    deadline_at=primary_deadline_at
+                )
+            except TurnCancelledError:
+                raise
+            except Exception as e:
+                # Output already reached the user; switching providers would duplicate it
+                if emitted.is_set() or self._get_fallback() is None:
+                    raise
+                logger.warning("%s failed (%s); using fallback", self.get_model_name(), e)
+        else:
+            logger.info("Circuit breaker for %s is open; using fallback", self.get_model_name())
+
+        fallback = self._get_fallback()
+        if fallback is None:
+            raise ProviderError(f"{self.get_model_name()} is temporarily unavailable",
+                                self.get_model_name(), retryable=False)
+        logger.info("Answering with fallback model %s", fallback.get_model_name())
+        return self.retry_policy.run(
+            attempt(fallback, None),
+            cancel_token,
+            breaker=get_breaker(fallback.get_model_name()),
+            can_retry=lambda: not emitted.is_set(),
+            name=fallback.get_model_name(),
+            deadline_at=deadline_at
+        )
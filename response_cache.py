@@ -0,0 +1,155 @@
+# response_cache.py
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import opencc
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    """An answer and when it was given"""
+    text: str
+    created: float
+    hits: int = 0
+
+
+class ResponseCache:
+    """
+    Answers to repeated questions, so "what is 7 times 8?" asked again is
+    answered without another model call.
+
+    Questions are keyed by their normalized text (Simplified Chinese turned
+    into Traditional, Unicode-compatibility folded, case-folded, punctuation
+    and extra spaces removed) together with the provider and a hash of its
+    system prompt, so editing a prompt retires the old answers. Follow-up
+    questions ("why?", "tell me more about it") also key on the reply they
+    follow. Entries expire after ttl and the least recently used are evicted
+    beyond max_entries.
+
+    Questions whose answer changes over time or should vary ("what's the
+    weather today?", "tell me a joke") are never cached; the caller also
+    skips camera turns and turns that used tools.
+    """
+
+    # Answers that depend on when they are asked
+    TIME_SENSITIVE_PATTERN = re.compile(
+        r"\b(today|tonight|tomorrow|yesterday|now|time|date|weather|forecast|news|latest|current|score|this week)\b"
+        r"|今天|明天|昨天|現在|幾點|時間|日期|天氣|新聞|最新"     # Traditional Chinese
+        r"|今日|明日|昨日|今|何時|天気|ニュース",                 # Japanese
+        re.IGNORECASE
+    )
+    # Requests where a repeat should get something new
+    VARIETY_PATTERN = re.compile(
+        r"\b(joke|story|another|again|random|riddle|poem|song|game)\b"
+        r"|笑話|故事|再一個|謎語|唱歌|遊戲"                         # Traditional Chinese
+        r"|冗談|お話|もう一つ|なぞなぞ|歌|ゲーム",                 # Japanese
+        re.IGNORECASE
+    )
+    # Questions that only make sense with the reply before them
+    FOLLOW_UP_PATTERN = re.compile(
+        r"\b(it|its|that|this|those|these|they|them|he|she|him|her|why|more|what about|how about)\b"
+        r"|它|那個|這個|他們|為什麼|還有|然後"                       # Traditional Chinese
+        r"|それ|これ|あれ|なんで|どうして|もっと",                 # Japanese
+        re.IGNORECASE
+    )
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 ttl: float = 6 * 3600.0,
+                 context_messages: int = 1):
+        """
+        Args:
+            max_entries: Answers kept; the least recently used go first
+            ttl: Seconds an answer stays usable
+            context_messages: Messages before a follow-up question that are part of its key
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.context_messages = context_messages
+        self._converter = opencc.OpenCC('s2t')
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def normalize(self, text: str) -> str:
+        """Text with script, width, case, punctuation and spacing differences removed"""
+        with self._lock:
+            text = self._converter.convert(text)
+        text = unicodedata.normalize("NFKC", text).casefold()
+        # "what's" and "whats" are the same question
+        text = re.sub(r"['’]", "", text)
+        text = re.sub(r"[^\w\s]|_", " ", text)
+        return " ".join(text.split())
+
+    def cacheable(self, question: str) -> bool:
+        """Whether a question's answer may be reused"""
+        return bool(question.strip()) and not (self.TIME_SENSITIVE_PATTERN.search(question)
+                                               or self.VARIETY_PATTERN.search(question))
+
+    @staticmethod
+    def prompt_version(system_prompt: str) -> str:
+        return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+    def key(self, question: str, provider: str, system_prompt: str, history: List[Dict]) -> str:
+        """
+        Cache key of a question
+        Args:
+            question: The user's message
+            provider: Model name answering it
+            system_prompt: System prompt the answer was given under
+            history: Conversation before the question; only used for follow-ups
+        """
+        parts = [provider, self.prompt_version(system_prompt), self.normalize(question)]
+        if self.context_messages and self.FOLLOW_UP_PATTERN.search(question):
+            for message in history[-self.context_messages:]:
+                content = message.get("content")
+                if isinstance(content, list):
+                    content = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+                parts.append(f"{message.get('role')}:{self.normalize(content or '')}")
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Cached answer for a key, if one is still fresh"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry.created > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry.text
+
+    def store(self, key: str, answer: str) -> None:
+        with self._lock:
+            self._entries[key] = CachedResponse(answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hit_rate}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,101 @@
+# scene_cache.py
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional, Set
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SceneEntry:
+    """A vision answer and the perceptual hash of the image it was about"""
+    image_hash: int
+    question: str
+    answer: str
+    provider: str
+    created: float
+
+
+class SceneCache:
+    """
+    Recent vision answers keyed by a perceptual hash of the analysis image.
+
+    Kids ask "what is this?" again and again about the same thing. A 64-bit
+    dHash of the 512x512 capture tells whether the camera still shows the
+    same scene; if it does, the earlier answer can be repeated (same
+    question) or given to the model as text instead of uploading the image
+    again (different question).
+    """
+
+    def __init__(self,
+                 max_entries: int = 32,
+                 max_distance: int = 5,
+                 ttl: float = 300.0,
+                 question_similarity: float = 0.7):
+        """
+        Args:
+            max_entries: Answers kept
+            max_distance: Largest Hamming distance (of 64 bits) still counted as the same scene
+            ttl: Seconds an answer stays usable
+            question_similarity: Bigram overlap from which two questions count as the same
+        """
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.question_similarity = question_similarity
+        self._entries: Deque[SceneEntry] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_hash(image_path: str) -> int:
+        """
+        64-bit difference hash: each bit says whether a pixel of a 9x8
+        grayscale thumbnail is brighter than its right neighbour
+        """
+        with Image.open(image_path) as image:
+            # Lets the JPEG decoder skip most of the full-size decode
+            image.draft("L", (64, 64))
+            pixels = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    @staticmethod
+    def distance(first: int, second: int) -> int:
+        return bin(first ^ second).count("1")
+
+    @staticmethod
+    def _bigrams(text: str) -> Set[str]:
+        # Character bigrams work for English as well as Japanese and Chinese
+        normalized = re.sub(r"[\W_]+", "", text.lower())
+        return {normalized[i:i + 2] for i in range(max(1, len(normalized) - 1))}
+
+    def same_question(self, first: str, second: str) -> bool:
+        first_bigrams, second_bigrams = self._bigrams(first), self._bigrams(second)
+        overlap = len(first_bigrams & second_bigrams) / len(first_bigrams | second_bigrams)
+        return overlap >= self.question_similarity
+
+    def lookup(self, image_hash: int, provider: str) -> Optional[SceneEntry]:
+        """Newest unexpired answer from provider about the same scene, if any"""
+        now = time.time()
+        with self._lock:
+            for entry in reversed(self._entries):
+                if now - entry.created > self.ttl:
+                    break  # Entries are in time order; the rest are older still
+                if (entry.provider == provider
+                        and self.distance(entry.image_hash, image_hash) <= self.max_distance):
+                    return entry
+        return None
+
+    def store(self, image_hash: int, question: str, answer: str, provider: str) -> None:
+        with self._lock:
+            self._entries.append(SceneEntry(image_hash, question, answer, provider, time.time()))
+        logger.debug("Stored scene answer %016x from %s", image_hash, provider)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
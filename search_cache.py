@@ -0,0 +1,253 @@
+# search_cache.py
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import FrozenSet, Optional, Union
+import opencc
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Path of an SQLite file that several app processes share search results through
+SEARCH_CACHE_ENV = "CHATBOT4KIDS_SEARCH_CACHE"
+
+
+@dataclass
+class SearchEntry:
+    """A search result and when it stops being usable"""
+    terms: FrozenSet[str]
+    result: str
+    created: float
+    expires: float
+
+
+class SearchCache:
+    """
+    Recent online search results, so a topic searched minutes ago, in this
+    conversation or another, is not paid for again.
+
+    Queries are reduced to their content words (Simplified Chinese turned
+    into Traditional, case and width folded, filler words dropped, Chinese
+    and Japanese as character bigrams), so "Mars rover news" and "search
+    the news about the Mars rover" are the same search. Queries whose terms
+    overlap by at least similarity count as the same search too. Results
+    about current events expire after news_ttl, others after ttl, and a
+    question about current events ("latest Mars rover news") only gets a
+    result from the last news_ttl, however it was asked before; the least
+    recently used are evicted beyond max_entries.
+
+    With a path, results are also written to an SQLite file, so app
+    processes on the same machine or a network share reuse each other's
+    searches.
+    """
+
+    # Words that do not change what is being searched for; freshness is checked in lookup()
+    FILLER_WORDS = frozenset(
+        "a an the of about on in at for to and or is are was what whats who how me my please can could you "
+        "tell search find look up online information info some any latest recent current today".split()
+    )
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS search_results (
+            terms TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            created REAL NOT NULL,
+            expires REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS search_results_expires ON search_results (expires)",
+    )
+
+    def __init__(self,
+                 path: Optional[Union[str, Path]] = None,
+                 max_entries: int = 256,
+                 ttl: float = 6 * 3600.0,
+                 news_ttl: float = 15 * 60.0,
+                 similarity: float = 0.75):
+        """
+        Args:
+            path: Shared SQLite file; None keeps results in memory only
+            max_entries: Results kept in memory, and a tenfold bound for the file
+            ttl: Seconds a result stays usable
+            news_ttl: Seconds a result about current events stays usable
+            similarity: Share of common terms from which two queries count as the same search
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.news_ttl = news_ttl
+        self.similarity = similarity
+        self._converter = opencc.OpenCC('s2t')
+        self._entries: "OrderedDict[FrozenSet[str], SearchEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One connection to the shared file, used under its own lock
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def terms(self, query: str) -> FrozenSet[str]:
+        """Content words of a query, with Chinese and Japanese text as character bigrams"""
+        with self._lock:
+            query = self._converter.convert(query)
+        query = unicodedata.normalize("NFKC", query).casefold()
+        terms = set()
+        for word in re.findall(r"[a-z0-9]+(?:'[a-z]+)?", query):
+            word = word.replace("'", "")
+            if word not in self.FILLER_WORDS:
+                terms.add(word)
+        for run in re.findall(r"[\u3040-\u30ff\u3400-\u9fff]+", query):
+            terms.update(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+        return frozenset(terms)
+
+    def _similar(self, first: FrozenSet[str], second: FrozenSet[str]) -> bool:
+        return len(first & second) / len(first | second) >= self.similarity
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Result of the same or a near-identical search, if one is still fresh"""
+        terms = self.terms(query)
+        if not terms:
+            return None
+        now = time.time()
+        # Current events need a recent result even if the same words were searched earlier
+        oldest = now - self.news_ttl if ResponseCache.TIME_SENSITIVE_PATTERN.search(query) else 0.0
+
+        def usable(candidate: SearchEntry) -> bool:
+            return candidate.expires > now and candidate.created >= oldest
+
+        with self._lock:
+            entry = self._entries.get(terms)
+            if entry is not None and entry.expires <= now:
+                del self._entries[terms]
+                entry = None
+            if entry is None or not usable(entry):
+                entry = next((candidate for candidate in reversed(self._entries.values())
+                              if usable(candidate) and self._similar(terms, candidate.terms)), None)
+            if entry is not None:
+                self._entries.move_to_end(entry.terms)
+
+        if entry is None and self.path:
+            entry = self._load(terms, now, oldest)
+            if entry is not None:
+                self._remember(entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        logger.debug("Search cache hit for %r", query)
+        return entry.result
+
+    def store(self, query: str, result: str) -> None:
+        terms = self.terms(query)
+        if not terms or not result.strip():
+            return
+        now = time.time()
+        time_sensitive = ResponseCache.TIME_SENSITIVE_PATTERN.search(query)
+        entry = SearchEntry(terms, result, now, now + (self.news_ttl if time_sensitive else self.ttl))
+        self._remember(entry)
+        if self.path:
+            self._save(entry)
+
+    def _remember(self, entry: SearchEntry) -> None:
+        with self._lock:
+            self._entries[entry.terms] = entry
+            self._entries.move_to_end(entry.terms)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Forget the results held in memory; the shared file is left alone"""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        """Close the shared file; it is opened again if needed"""
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    # ---- Shared file ----
+
+    def _connect(self) -> sqlite3.Connection:
+        """The shared file's connection, opened on first use; call with _db_lock held"""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Other processes may be writing; wait for their lock instead of failing.
+            # Tool worker threads share the connection under _db_lock.
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _load(self, terms: FrozenSet[str], now: float, oldest: float) -> Optional[SearchEntry]:
+        """Fresh result from the shared file: the same terms by primary key, else a similar search"""
+        key = " ".join(sorted(terms))
+        try:
+            with self._db_lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT terms, result, created, expires FROM search_results"
+                    " WHERE terms = ? AND expires > ? AND created >= ?",
+                    (key, now, oldest)
+                ).fetchone()
+                rows = [row] if row else connection.execute(
+                    "SELECT terms, result, created, expires FROM search_results"
+                    " WHERE expires > ? AND created >= ? ORDER BY created DESC LIMIT ?",
+                    (now, oldest, self.max_entries)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Error reading search cache %s: %s", self.path, e)
+            return None
+        for stored_terms, result, created, expires in rows:
+            candidate = SearchEntry(frozenset(stored_terms.split(" ")), result, created, expires)
+            if candidate.terms == terms or self._similar(terms, candidate.terms):
+                return candidate
+        return None
+
+    def _save(self, entry: SearchEntry) -> None:
+        try:
+            with self._db_lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO search_results (terms, result, created, expires) VALUES (?, ?, ?, ?)",
+                    (" ".join(sorted(entry.terms)), entry.result, entry.created, entry.expires)
+                )
+                connection.execute("DELETE FROM search_results WHERE expires <= ?", (entry.created,))
+                connection.execute(
+                    "DELETE FROM search_results WHERE terms NOT IN"
+                    " (SELECT terms FROM search_results ORDER BY created DESC LIMIT ?)",
+                    (self.max_entries * 10,)
+                )
+                connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("Error writing search cache %s: %s", self.path, e)
+
+_default_cache = SearchCache(os.environ.get(SEARCH_CACHE_ENV) or None)
+
+
+def get_search_cache() -> SearchCache:
+    """Get the process-wide search cache, shared by every conversation in the process"""
+    return _default_cache
+
+
+def set_search_cache(cache: SearchCache) -> None:
+    """Replace the process-wide search cache, e.g. to give a benchmark a fresh one"""
+    global _default_cache
+    _default_cache = cache
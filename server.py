@@ -0,0 +1,410 @@
+# server.py
+"""
+Headless server: several kid stations share one ConversationManager host.
+
+Each session has its own conversation, camera frames and turn lock; provider
+clients, speech synthesis, the tool worker pool and answers to repeated
+questions are shared. Requires aiohttp (pip install aiohttp).
+
+    python server.py --host 0.0.0.0 --port 8765
+
+HTTP:
+    POST   /sessions                {"model": "ChatGPT"} -> {"session_id": ...}
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/image     JPEG body: the station's current camera frame
+    POST   /sessions/{id}/messages  {"text": ..., "speak": false} -> {"text": ..., "audio": base64 MP3}
+    GET    /sessions/{id}/ws        WebSocket, see ConversationServer.websocket
+    GET    /health
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import functools
+import io
+import json
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+import numpy as np
+from aiohttp import WSMsgType, web
+from PIL import Image
+from cancellation import CancellationToken, TurnCancelledError
+from conversation_manager import ConversationManager
+from key_manager import KeyManager
+from log_utils import setup_logging
+from response_cache import ResponseCache
+from tool_executor import ToolExecutor
+from tts_manager import TTSManager
+from turn_tracer import get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteCamera:
+    """
+    Camera stand-in fed with frames uploaded by a station.
+
+    Provides the parts of Picamera2 a turn uses: capture_array() for the
+    model's image, and capture_file() with the configuration calls around it
+    for "take photo". The station decides the resolution, so configuration
+    is accepted and ignored. Frames older than max_age count as no frame, so
+    a station that stopped uploading does not get answers about a stale view.
+    """
+
+    def __init__(self, max_age: float = 30.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._jpeg: Optional[bytes] = None
+        self._updated = 0.0
+
+    def update(self, jpeg: bytes) -> None:
+        """Decode an uploaded JPEG as the current frame"""
+        with Image.open(io.BytesIO(jpeg)) as image:
+            frame = np.asarray(image.convert("RGB"))
+        with self._lock:
+            self._frame = frame
+            self._jpeg = jpeg
+            self._updated = time.monotonic()
+
+    def _fresh(self) -> bool:
+        return self._frame is not None and time.monotonic() - self._updated <= self.max_age
+
+    def capture_array(self) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._frame if self._fresh() else None
+
+    def capture_file(self, path: str) -> None:
+        """Save the uploaded JPEG as it came, without decoding and re-encoding it"""
+        with self._lock:
+            if not self._fresh():
+                raise RuntimeError("No recent frame from the station")
+            jpeg = self._jpeg
+        with open(path, "wb") as image_file:
+            image_file.write(jpeg)
+
+    def camera_configuration(self) -> Dict:
+        return {}
+
+    def create_still_configuration(self, main: Optional[Dict] = None, **kwargs) -> Dict:
+        return {"main": main or {}}
+
+    def configure(self, camera_config: Optional[Dict] = None) -> None:
+        pass
+
+    def set_controls(self, controls: Dict) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Forget the last frame"""
+        with self._lock:
+            self._frame = None
+            self._jpeg = None
+
+
+@dataclass
+class Session:
+    """One station's conversation"""
+    id: str
+    manager: ConversationManager
+    camera: RemoteCamera
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # One turn at a time
+    last_active: float = field(default_factory=time.monotonic)
+    connections: int = 0  # Open WebSockets; a connected station is never idle
+    speech_token: Optional[CancellationToken] = None
+
+
+class ConversationServer:
+    """
+    Hosts isolated conversation sessions over HTTP and WebSocket.
+
+    ConversationManager is synchronous, so turns, speech and image decoding
+    run on a thread pool; the event loop only moves messages. Deltas and
+    audio reach the loop through call_soon_threadsafe.
+    """
+
+    def __init__(self,
+                 max_sessions: int = 64,
+                 workers: int = 32,
+                 idle_timeout: float = 1800.0):
+        """
+        Args:
+            max_sessions: Sessions open at once; more are refused with 503
+            workers: Threads for turns, and separately for tool calls
+            idle_timeout: Seconds after which an unused session is closed
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self.tool_executor = ToolExecutor(max_workers=workers)
+        self.tts_manager = TTSManager(KeyManager.get_key_path("openai"))
+        # Stations asking the same questions share the answers
+        self.response_cache = ResponseCache()
+        self.sessions: Dict[str, Session] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=8 * 1024 * 1024)
+        app.add_routes([
+            web.get("/health", self.health),
+            web.post("/sessions", self.create_session),
+            web.delete("/sessions/{id}", self.close_session),
+            web.post("/sessions/{id}/image", self.upload_image),
+            web.post("/sessions/{id}/messages", self.post_message),
+            web.get("/sessions/{id}/ws", self.websocket),
+        ])
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        """Run blocking work on the pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, functools.partial(function, *args, **kwargs)
+        )
+
+    # ---- Lifecycle ----
+
+    async def _start(self, app: web.Application) -> None:
+        self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _stop(self, app: web.Application) -> None:
+        if self._reaper:
+            self._reaper.cancel()
+        for session in list(self.sessions.values()):
+            self._close(session, "server stopping")
+        self.tool_executor.shutdown()
+        self.pool.shutdown(wait=False)
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(60)
+            self._close_idle()
+
+    def _close_idle(self) -> None:
+        """Close sessions without a request or an open WebSocket for idle_timeout"""
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            # A turn still running this long after the last request is stuck
+            if session.connections == 0 and now - session.last_active > self.idle_timeout:
+                logger.info("Closing idle session %s", session.id)
+                self._close(session, "session idle")
+
+    def _close(self, session: Session, reason: str) -> None:
+        """
+        Remove a session, stopping its turn and speech. A cancelled turn
+        deletes its capture file on the way out.
+        """
+        self.sessions.pop(session.id, None)
+        self._cancel(session, reason)
+        session.camera.close()
+
+    @staticmethod
+    async def _json(request: web.Request) -> Dict:
+        """JSON object body of a request; anything else is a 400"""
+        try:
+            body = await request.json()
+        except json.JSONDecodeError as e:
+            raise web.HTTPBadRequest(text=f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Expected a JSON object")
+        return body
+
+    def _session(self, request: web.Request) -> Session:
+        session = self.sessions.get(request.match_info["id"])
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown session")
+        session.last_active = time.monotonic()
+        return session
+
+    # ---- HTTP ----
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"sessions": len(self.sessions), "response_cache": self.response_cache.stats()})
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        if len(self.sessions) >= self.max_sessions:
+            raise web.HTTPServiceUnavailable(text="Too many sessions")
+        options = await self._json(request) if request.can_read_body else {}
+        manager = await self._run(ConversationManager, tts_manager=self.tts_manager,
+                                  tool_executor=self.tool_executor, play_audio=False,
+                                  response_cache=self.response_cache)
+        model = options.get("model")
+        if model and model != "ChatGPT":
+            try:
+                await self._run(manager.set_ai_model, str(model))
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+        session = Session(uuid.uuid4().hex[:12], manager, RemoteCamera())
+        self.sessions[session.id] = session
+        logger.info("Opened session %s with %s (%d open)", session.id,
+                    manager.current_model.get_model_name(), len(self.sessions))
+        return web.json_response({"session_id": session.id})
+
+    async def close_session(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        self._close(session, "session closed")
+        return web.json_response({"closed": session.id})
+
+    async def upload_image(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        await self._set_frame(session, await request.read())
+        return web.json_response({"ok": True})
+
+    async def _set_frame(self, session: Session, jpeg: bytes) -> None:
+        try:
+            await self._run(session.camera.update, jpeg)
+        except OSError as e:
+            raise web.HTTPBadRequest(text=f"Not an image: {e}")
+        if session.manager.camera is None:
+            # Camera tools are offered once the station has sent a frame
+            session.manager.set_camera(session.camera)
+
+    async def post_message(self, request: web.Request) -> web.Response:
+        session = self._session(request)
+        body = await self._json(request)
+        text = str(body.get("text", "")).strip()
+        if not text:
+            raise web.HTTPBadRequest(text="Empty message")
+        result = {}
+        async with session.lock:
+            result["text"] = await self._run(session.manager.get_response, text)
+            if body.get("speak") and result["text"] and not result["text"].startswith("Error"):
+                audio = await self._run(self.tts_manager.synthesize, result["text"],
+                                        session.manager.current_model.get_model_name())
+                result["audio"] = base64.b64encode(audio).decode("ascii")
+        return web.json_response(result)
+
+    # ---- WebSocket ----
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        Client to server:
+            {"type": "message", "text": ..., "speak": true}
+            {"type": "cancel"}
+            {"type": "model", "name": "Claude"}
+            binary: a JPEG camera frame
+        Server to client:
+            {"type": "status" | "delta" | "response", "turn_id": ..., "text": ...}
+            binary: MP3 audio of the reply, in pieces, then {"type": "audio_end", "turn_id": ...}
+            {"type": "error", "text": ...}
+        """
+        session = self._session(request)
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+
+        loop = asyncio.get_running_loop()
+        outgoing: "asyncio.Queue" = asyncio.Queue()
+
+        def send_soon(item) -> None:
+            """Queue a message for the client; safe to call from worker threads"""
+            loop.call_soon_threadsafe(outgoing.put_nowait, item)
+
+        sender = asyncio.create_task(self._send_loop(ws, outgoing))
+        turns = set()
+        session.connections += 1
+        try:
+            async for message in ws:
+                session.last_active = time.monotonic()
+                if message.type == WSMsgType.BINARY:
+                    try:
+                        await self._set_frame(session, message.data)
+                    except web.HTTPBadRequest as e:
+                        send_soon({"type": "error", "text": e.text})
+                elif message.type == WSMsgType.TEXT:
+                    try:
+                        data = json.loads(message.data)
+                    except json.JSONDecodeError as e:
+                        send_soon({"type": "error", "text": f"Invalid JSON: {e}"})
+                        continue
+                    kind = data.get("type") if isinstance(data, dict) else None
+                    if kind == "message":
+                        turn = asyncio.create_task(self._ws_turn(session, data, send_soon))
+                        turns.add(turn)
+                        turn.add_done_callback(turns.discard)
+                    elif kind == "cancel":
+                        self._cancel(session, "cancelled by station")
+                    elif kind == "model":
+                        try:
+                            async with session.lock:
+                                await self._run(session.manager.set_ai_model, str(data.get("name")))
+                        except Exception as e:
+                            # The station keeps its connection and its current model
+                            send_soon({"type": "error", "text": str(e)})
+                            continue
+                        send_soon({"type": "status", "text": f"Model: {data.get('name')}"})
+        finally:
+            session.connections -= 1
+            session.last_active = time.monotonic()
+            self._cancel(session, "station disconnected")
+            for turn in turns:
+                turn.cancel()
+            sender.cancel()
+        return ws
+
+    @staticmethod
+    async def _send_loop(ws: web.WebSocketResponse, outgoing: "asyncio.Queue") -> None:
+        while True:
+            item = await outgoing.get()
+            if ws.closed:
+                continue
+            if isinstance(item, bytes):
+                await ws.send_bytes(item)
+            else:
+                await ws.send_json(item)
+
+    def _cancel(self, session: Session, reason: str) -> None:
+        session.manager.cancel_current_turn(reason)
+        if session.speech_token:
+            session.speech_token.cancel(reason)
+
+    async def _ws_turn(self, session: Session, data: Dict, send_soon: Callable) -> None:
+        text = str(data.get("text", "")).strip()
+        if not text:
+            return
+        async with session.lock:
+            turn_id = get_tracer().new_turn()
+            manager = session.manager
+            response = await self._run(
+                manager.get_response,
+                text,
+                status_callback=lambda status: send_soon({"type": "status", "turn_id": turn_id, "text": status}),
+                turn_id=turn_id,
+                delta_callback=lambda delta: send_soon({"type": "delta", "turn_id": turn_id, "text": delta})
+            )
+            send_soon({"type": "response", "turn_id": turn_id, "text": response})
+            if not data.get("speak", True) or not response or response.startswith("Error"):
+                return
+            session.speech_token = CancellationToken()
+            try:
+                await self._run(self.tts_manager.synthesize, response,
+                                manager.current_model.get_model_name(), send_soon,
+                                session.speech_token, turn_id)
+            except TurnCancelledError:
+                pass
+            except Exception as e:
+                logger.warning("Speech for session %s failed: %s", session.id, e)
+                send_soon({"type": "error", "turn_id": turn_id, "text": f"Speech failed: {e}"})
+            send_soon({"type": "audio_end", "turn_id": turn_id})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless multi-session conversation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+    setup_logging()
+    server = ConversationServer(args.max_sessions, args.workers)
+    web.run_app(server.app(), host=args.host, port=args.port)
@@ -0,0 +1,168 @@
+# stream_utils.py
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+from ai_interface import ModelResponse, ToolCall, Usage
+from cancellation import CancellationToken, TurnCancelledError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tool_arguments(arguments: str) -> Dict:
+    """Parse a JSON arguments string, tolerating empty or malformed input"""
+    if not arguments:
+        return {}
+    try:
+        parsed = json.loads(arguments)
+        return parsed if isinstance(parsed, dict) else {}
+    except json.JSONDecodeError:
+        logger.warning("Could not parse tool arguments: %s", arguments)
+        return {}
+
+
+def collect_chat_stream(stream: Iterable,
+                        cancel_token: Optional[CancellationToken] = None,
+                        on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                        on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
+    """
+    Collect text and tool calls from an OpenAI-compatible chat completion stream
+    Args:
+        stream: Stream returned by chat.completions.create(stream=True)
+        cancel_token: Optional token; cancelling it closes the HTTP stream
+        on_tool_call: Called as soon as each tool call has fully streamed in
+        on_delta: Called with each chunk of response text
+    Returns:
+        ModelResponse: Full response text, tool calls and the token counts the
+                       stream reported (request them with stream_options include_usage)
+    Raises:
+        TurnCancelledError: If the token was cancelled while streaming
+    """
+    unregister = cancel_token.register(stream.close) if cancel_token else None
+    parts = []
+    tool_calls = []
+    pending: Dict[int, Dict] = {}
+    usage = Usage()
+    model_id = ""
+
+    def finish(index: int) -> None:
+        # Tool call deltas arrive in index order; one is complete when the next starts
+        entry = pending.pop(index)
+        call = ToolCall(
+            id=entry["id"] or f"call_{index}",
+            name=entry["name"],
+            arguments=parse_tool_arguments(entry["arguments"])
+        )
+        tool_calls.append(call)
+        if on_tool_call:
+            on_tool_call(call)
+
+    try:
+        for chunk in stream:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            if getattr(chunk, "usage", None):
+                # Sent with the last chunk, or with every chunk by some providers
+                usage = usage_from_openai(chunk.usage)
+            model_id = getattr(chunk, "model", None) or model_id
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if not delta:
+                continue
+            if delta.content:
+                parts.append(delta.content)
+                if on_delta:
+                    on_delta(delta.content)
+            for tool_delta in delta.tool_calls or []:
+                index = tool_delta.index
+                for earlier in [i for i in pending if i < index]:
+                    finish(earlier)
+                entry = pending.setdefault(index, {"id": None, "name": "", "arguments": ""})
+                if tool_delta.id:
+                    entry["id"] = tool_delta.id
+                if tool_delta.function:
+                    if tool_delta.function.name:
+                        entry["name"] += tool_delta.function.name
+                    if tool_delta.function.arguments:
+                        entry["arguments"] += tool_delta.function.arguments
+    except TurnCancelledError:
+        raise
+    except Exception:
+        # Closing the stream from another thread surfaces as a read error
+        if cancel_token and cancel_token.is_cancelled:
+            raise TurnCancelledError(cancel_token.reason or "cancelled")
+        raise
+    finally:
+        if unregister:
+            unregister()
+        stream.close()
+
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    for index in sorted(pending):
+        finish(index)
+    usage.model = model_id
+    return ModelResponse(text="".join(parts), tool_calls=tool_calls, usage=usage)
+
+
+def usage_from_openai(usage) -> Usage:
+    """Convert the usage block of an OpenAI-compatible response"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return Usage(
+        prompt_tokens=usage.prompt_tokens or 0,
+        completion_tokens=usage.completion_tokens or 0,
+        cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0
+    )
+
+
+def count_image_parts(messages: List[Dict], part_type: str = "image_url") -> int:
+    """Number of image parts of the given type in provider-formatted messages"""
+    count = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            count += sum(1 for part in content if isinstance(part, dict) and part.get("type") == part_type)
+    return count
+
+
+def format_openai_tool_message(message: Dict) -> Dict:
+    """
+    Convert a tool-related history message to the OpenAI chat format.
+    Used by OpenAI-compatible adapters for assistant tool calls and tool results.
+    """
+    if message["role"] == "tool":
+        return {
+            "role": "tool",
+            "tool_call_id": message["tool_call_id"],
+            "content": message["content"]
+        }
+    return {
+        "role": "assistant",
+        "content": message.get("content") or None,
+        "tool_calls": [
+            {
+                "id": call["id"],
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call["arguments"])
+                }
+            }
+            for call in message["tool_calls"]
+        ]
+    }
+
+
+def is_tool_message(message: Dict) -> bool:
+    """Whether a history message is an assistant tool call or a tool result"""
+    return message["role"] == "tool" or bool(message.get("tool_calls"))
+
+
+def tool_message_as_text(message: Dict) -> Dict:
+    """Flatten a tool-related history message for providers without tool support"""
+    if message["role"] == "tool":
+        return {
+            "role": "user",
+            "content": f"Result of {message.get('name', 'tool')}:\n{message['content']}"
+        }
+    return {"role": "assistant", "content": message.get("content") or ""}
@@ -0,0 +1,108 @@
+# tests/conftest.py
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import pytest
+from ai_interface import AIModelInterface, ModelResponse, ToolCall, Usage
+from cancellation import CancellationToken
+from conversation_store import ConversationStore, get_store, set_store
+from key_manager import KeyManager
+from search_cache import SearchCache, get_search_cache, set_search_cache
+from turn_tracer import TurnTracer, get_tracer, set_tracer
+from usage_ledger import UsageLedger, get_ledger, set_ledger
+
+
+class ScriptedModel(AIModelInterface):
+    """
+    Adapter that answers with reply(messages, cancel_token) instead of calling a provider.
+    reply returns the text, or a ModelResponse to make native tool calls.
+    """
+
+    def __init__(self,
+                 reply: Optional[Callable[[List[Dict], Optional[CancellationToken]],
+                                          Union[str, ModelResponse]]] = None,
+                 name: str = "ChatGPT",
+                 supports_tools: bool = False):
+        self.reply = reply or (lambda messages, cancel_token: "Hello!")
+        self.name = name
+        self.supports_tools = supports_tools
+        self.calls: List[List[Dict]] = []
+        self.tools: List[Optional[List[Dict]]] = []
+        self.exchanges: List[Tuple[str, str]] = []
+        self.sessions: List[List[Dict]] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_model_name(self) -> str:
+        return self.name
+
+    def record_exchange(self, user_text: str, answer: str) -> None:
+        self.exchanges.append((user_text, answer))
+
+    def reset_session(self, conversation_history: List[Dict]) -> None:
+        self.sessions.append(list(conversation_history))
+
+    def format_messages(self, conversation_history: List[Dict], image_path: Optional[str] = None) -> List[Dict]:
+        return list(conversation_history)
+
+    def generate_response(self,
+                          messages: List[Dict],
+                          model: str,
+                          image_path: Optional[str] = None,
+                          cancel_token: Optional[CancellationToken] = None,
+                          tools: Optional[List[Dict]] = None,
+                          on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+                          on_delta: Optional[Callable[[str], None]] = None) -> ModelResponse:
+        with self._lock:
+            self.calls.append(list(messages))
+            self.tools.append(tools)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            response = self.reply(messages, cancel_token)
+            if isinstance(response, str):
+                response = ModelResponse(text=response)
+            response.usage = Usage(provider=self.name, completion_tokens=1)
+            if on_delta:
+                # Streamed in small pieces, like a provider would
+                for start in range(0, len(response.text), 4):
+                    on_delta(response.text[start:start + 4])
+            if on_tool_call:
+                for call in response.tool_calls:
+                    on_tool_call(call)
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            return response
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def isolated_services(tmp_path, monkeypatch):
+    """Fake keys, and a tracer, ledger, store and search cache that stay out of the real files"""
+    for service in KeyManager.DEFAULT_KEYS:
+        monkeypatch.setenv(KeyManager.env_var(service, "KEY"), "test-key")
+    # model_routes.json and data/ are looked up relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    saved = get_tracer(), get_ledger(), get_store(), get_search_cache()
+    set_tracer(TurnTracer(enabled=False))
+    set_ledger(UsageLedger(enabled=False))
+    set_store(ConversationStore(tmp_path / "conversations.sqlite3"))
+    set_search_cache(SearchCache())
+    yield tmp_path
+    get_store().close()
+    tracer, ledger, store, search_cache = saved
+    set_tracer(tracer)
+    set_ledger(ledger)
+    set_store(store)
+    set_search_cache(search_cache)
+
+
+@pytest.fixture
+def manager(isolated_services):
+    """ConversationManager without audio, answering through a ScriptedModel"""
+    from conversation_manager import ConversationManager
+    manager = ConversationManager(play_audio=False)
+    manager.current_model = ScriptedModel()
+    return manager
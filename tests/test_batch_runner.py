@@ -0,0 +1,35 @@
+# tests/test_batch_runner.py
+from batch_runner import BatchRunner, BatchTurn, add_trace
+from conftest import ScriptedModel
+from conversation_manager import ConversationManager
+from turn_tracer import TurnTracer
+
+
+class ScriptedManager(ConversationManager):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.current_model = ScriptedModel()
+
+
+def test_a_failing_transcript_does_not_stop_the_batch(isolated_services):
+    runner = BatchRunner(TurnTracer(enabled=False), workers=2)
+    runner.conversation_manager_class = ScriptedManager
+    transcripts = {
+        "zoo": [BatchTurn("zoo", 0, "Hi"), BatchTurn("zoo", 1, "What is this?", image="missing.jpg")],
+        "park": [BatchTurn("park", 0, "Hello")],
+    }
+
+    # "Bogus" fails when its conversations are set up
+    results = runner.run(transcripts, ["ChatGPT", "Bogus"])
+    add_trace(results, isolated_services / "none.jsonl")
+
+    assert [(row["model"], row["transcript"], row["turn"], row["error"]) for row in results] == [
+        ("ChatGPT", "zoo", 0, False),
+        ("ChatGPT", "zoo", 1, True),
+        ("ChatGPT", "park", 0, False),
+        ("Bogus", "zoo", 0, True),
+        ("Bogus", "zoo", 1, True),
+        ("Bogus", "park", 0, True),
+    ]
+    assert results[-1]["turn_ms"] is None
+    assert results[-1]["response"].startswith("Error")
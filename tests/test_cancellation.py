@@ -0,0 +1,124 @@
+# tests/test_cancellation.py
+import threading
+import pytest
+from ai_interface import ModelResponse, ToolCall
+from camera_utils import CameraManager
+from cancellation import CancellationToken, TurnCancelledError
+from conftest import ScriptedModel
+from tools import ToolDefinitions
+
+
+def test_cancel_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.register(lambda: calls.append("closed"))
+    token.cancel("stopped")
+    token.cancel("again")
+    assert calls == ["closed"]
+    assert token.reason == "stopped"
+    with pytest.raises(TurnCancelledError):
+        token.raise_if_cancelled()
+
+
+def test_register_after_cancel_runs_immediately():
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+    token.register(lambda: calls.append("closed"))
+    assert calls == ["closed"]
+
+
+def test_unregistered_callback_is_not_run():
+    token = CancellationToken()
+    calls = []
+    unregister = token.register(lambda: calls.append("closed"))
+    unregister()
+    token.cancel()
+    assert calls == []
+
+
+def test_child_is_cancelled_with_parent_but_not_the_reverse():
+    parent = CancellationToken()
+    child = parent.child()
+    child.cancel("tool command detected")
+    assert not parent.is_cancelled
+
+    other_child = parent.child()
+    parent.cancel("stopped")
+    assert other_child.is_cancelled
+    assert other_child.reason == "stopped"
+
+
+def _blocking_model(release: threading.Event, started: threading.Event) -> ScriptedModel:
+    def reply(messages, cancel_token):
+        started.set()
+        # Stands in for a stream that a cancel closes
+        while not release.wait(0.01):
+            if cancel_token and cancel_token.is_cancelled:
+                break
+        return f"Answer to {messages[-1]['content']}"
+    return ScriptedModel(reply)
+
+
+def test_turns_run_one_at_a_time(manager):
+    release, started = threading.Event(), threading.Event()
+    manager.current_model = _blocking_model(release, started)
+    responses = {}
+    first = threading.Thread(target=lambda: responses.update(first=manager.get_response("first question")))
+    second = threading.Thread(target=lambda: responses.update(second=manager.get_response("second question")))
+    first.start()
+    assert started.wait(2)
+    second.start()
+    second.join(0.2)
+    assert second.is_alive()  # Waits for the first turn
+    release.set()
+    first.join(2)
+    second.join(2)
+
+    assert responses == {"first": "Answer to first question", "second": "Answer to second question"}
+    assert manager.current_model.max_active == 1
+    assert [message["content"] for message in manager.conversation_history[1:]] == [
+        "first question", "Answer to first question", "second question", "Answer to second question"]
+
+
+def test_cancel_stops_running_and_waiting_turns(manager):
+    manager.get_response("earlier question")
+    history_before = list(manager.conversation_history)
+    release, started = threading.Event(), threading.Event()
+    manager.current_model = _blocking_model(release, started)
+
+    responses = {}
+    first = threading.Thread(target=lambda: responses.update(first=manager.get_response("first question")))
+    second = threading.Thread(target=lambda: responses.update(second=manager.get_response("second question")))
+    first.start()
+    assert started.wait(2)
+    second.start()
+    second.join(0.2)
+    manager.cancel_current_turn()
+    first.join(2)
+    second.join(2)
+
+    assert responses == {"first": "", "second": ""}
+    assert manager.conversation_history == history_before
+    assert manager.current_turn_token is None
+
+
+def test_cancel_during_tool_round_resets_the_provider_session(manager):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+    manager.get_response("earlier question")
+    history_before = list(manager.conversation_history)
+
+    def reply(messages, cancel_token):
+        if messages[-1]["role"] == "user" and isinstance(messages[-1]["content"], str):
+            return ModelResponse(text="Let me look.", tool_calls=[ToolCall("call_1", ToolDefinitions.CAMERA)])
+        # Stopped while the model works on the tool result
+        manager.cancel_current_turn()
+        return "A test pattern."
+
+    model = ScriptedModel(reply, supports_tools=True)
+    manager.current_model = model
+
+    assert manager.get_response("What can you see right now?") == ""
+
+    assert manager.conversation_history == history_before
+    assert model.sessions == [history_before]
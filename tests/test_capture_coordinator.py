@@ -0,0 +1,70 @@
+# tests/test_capture_coordinator.py
+import os
+import threading
+from ai_interface import ModelResponse, ToolCall
+from camera_utils import CameraManager
+from capture_coordinator import CaptureCoordinator
+from conftest import ScriptedModel
+from tools import ToolDefinitions
+from turn_tracer import TurnTracer
+
+
+def counting_camera():
+    camera = CameraManager.setup_camera("fake")
+    camera.frames = 0
+    capture_array = camera.capture_array
+
+    def counted(*args):
+        camera.frames += 1
+        return capture_array(*args)
+
+    camera.capture_array = counted
+    return camera
+
+
+def test_concurrent_requests_share_one_capture():
+    camera = counting_camera()
+    capture = CaptureCoordinator(camera, "turn-1", TurnTracer(enabled=False))
+    start = threading.Barrier(4, timeout=2.0)
+    paths = []
+
+    def request():
+        start.wait()
+        paths.append(capture.get_image())
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+
+    assert camera.frames == 1
+    assert (capture.captures, capture.reuses) == (1, 3)
+    assert len(set(paths)) == 1 and os.path.exists(paths[0])
+    capture.close()
+    assert not os.path.exists(paths[0])
+
+
+def test_no_camera_means_no_image():
+    capture = CaptureCoordinator(None, "turn-1", TurnTracer(enabled=False))
+    assert capture.get_image() is None
+    capture.close()
+
+
+def test_one_capture_per_turn_across_camera_tool_calls(manager):
+    camera = counting_camera()
+    manager.set_camera(camera)
+
+    def reply(messages, token):
+        rounds = sum(1 for message in messages if message["role"] == "tool")
+        if rounds < 2:
+            # Asks for the camera again after seeing the first frame
+            return ModelResponse(text="", tool_calls=[ToolCall(f"call_{rounds}", ToolDefinitions.CAMERA)])
+        return "A test pattern."
+
+    model = ScriptedModel(reply, supports_tools=True)
+    manager.current_model = model
+
+    assert manager.get_response("What is in front of me?") == "A test pattern."
+    assert len(model.calls) == 3
+    assert camera.frames == 1
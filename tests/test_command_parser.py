@@ -0,0 +1,77 @@
+# tests/test_command_parser.py
+from camera_utils import CameraManager
+from command_parser import IncrementalCommandParser
+from conftest import ScriptedModel
+from tools import ToolDefinitions
+
+
+def feed_all(parser: IncrementalCommandParser, text: str, chunk: int) -> None:
+    for start in range(0, len(text), chunk):
+        parser.feed(text[start:start + chunk])
+
+
+def test_finds_commands_split_across_chunks():
+    reported = []
+    parser = IncrementalCommandParser(camera_available=True, on_command=reported.append)
+    feed_all(parser, 'Let me look! {"camera": "1"} and {"Online search": "mars rover"} ok', chunk=3)
+    assert [call.name for call in reported] == [ToolDefinitions.CAMERA, ToolDefinitions.SEARCH]
+    assert reported[1].arguments == {"query": "mars rover"}
+    assert parser.commands == reported
+
+
+def test_camera_command_ignored_without_camera():
+    parser = IncrementalCommandParser(camera_available=False)
+    parser.feed('{"camera": "1"}')
+    assert parser.commands == []
+
+
+def test_repeated_commands_are_reported_once():
+    parser = IncrementalCommandParser(camera_available=True)
+    parser.feed('{"camera": "1"}{"camera": "1"}{"Online search": "cats"}{"Online search": "cats"}')
+    assert [call.name for call in parser.commands] == [ToolDefinitions.CAMERA, ToolDefinitions.SEARCH]
+
+
+def test_should_stop_once_prose_follows_a_command():
+    parser = IncrementalCommandParser(camera_available=True)
+    parser.feed('Checking. {"Online search": "weather"}')
+    assert not parser.should_stop()
+    parser.feed(' {')
+    assert not parser.should_stop()  # Could be another command
+    parser = IncrementalCommandParser(camera_available=True)
+    parser.feed('{"Online search": "weather"} It is sunny')
+    assert parser.should_stop()
+    assert parser.text_through_commands == '{"Online search": "weather"}'
+
+
+def test_no_command_keeps_whole_text():
+    parser = IncrementalCommandParser(camera_available=True)
+    feed_all(parser, "A plain answer with a {brace} in it.", chunk=5)
+    assert parser.commands == []
+    assert not parser.should_stop()
+    assert parser.text_through_commands == "A plain answer with a {brace} in it."
+
+
+def test_strip_commands():
+    text = 'Let me check {"Online search": "dinosaurs"} {"camera": "1"}'
+    assert IncrementalCommandParser.strip_commands(text) == "Let me check"
+
+
+def test_prose_is_released_once_it_cannot_be_a_command():
+    parser = IncrementalCommandParser(camera_available=True)
+    shown = []
+    for chunk in ['Let me ', 'look. {"cam', 'era": "1"}', ' Hmm {not', ' json']:
+        parser.feed(chunk)
+        shown.append(parser.take_prose())
+    assert shown == ["Let me ", "look. ", "", " Hmm ", ""]
+    assert parser.take_prose(final=True) == "{not json"
+
+
+def test_text_command_models_stream_their_prose(manager):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+    replies = iter(['Looking. {"camera": "1"}', "A test pattern."])
+    manager.current_model = ScriptedModel(lambda messages, token: next(replies), name="Perplexity")
+    deltas = []
+
+    manager.get_response("Can you see anything?", delta_callback=deltas.append)
+
+    assert "".join(deltas) == "Looking. \n\nA test pattern."
@@ -0,0 +1,71 @@
+# tests/test_conversation_store.py
+import base64
+from conversation_manager import ConversationManager
+from conversation_store import ConversationStore, get_store
+
+IMAGE = base64.b64encode(b"jpeg bytes").decode()
+
+
+def image_message(text: str) -> dict:
+    return {"role": "user", "content": [
+        {"type": "text", "text": text},
+        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{IMAGE}"}},
+    ]}
+
+
+def test_messages_are_read_back_in_order(tmp_path):
+    store = ConversationStore(tmp_path / "store.sqlite3")
+    store.append("c1", [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}],
+                 provider="Claude", turn_id="t1")
+    store.append("c1", [image_message("What is this?"), {"role": "assistant", "content": "A cat."}],
+                 provider="Claude", turn_id="t2")
+    store.append("c1", [image_message("And now?"), {"role": "assistant", "content": "Still a cat."}],
+                 provider="Claude", turn_id="t3")
+
+    assert store.latest_conversation() == "c1"
+    assert store.provider("c1") == "Claude"
+    page = store.page("c1", limit=4)
+    assert [message.text for message in page] == ["What is this?", "A cat.", "And now?", "Still a cat."]
+    assert [message.text for message in store.page("c1", before_id=page[0].id)] == ["Hi", "Hello!"]
+    # The same image is stored once and restored from its hash
+    assert page[0].image_hash == page[2].image_hash
+    assert store.image(page[0].image_hash) == b"jpeg bytes"
+    store.close()
+
+
+def test_tail_starts_at_a_user_message(tmp_path):
+    store = ConversationStore(tmp_path / "store.sqlite3")
+    call = {"id": "call_1", "name": "search", "arguments": {"query": "weather"}}
+    store.append("c1", [
+        {"role": "user", "content": "Weather?"},
+        {"role": "assistant", "content": "", "tool_calls": [call]},
+        {"role": "tool", "tool_call_id": "call_1", "name": "search", "content": "Sunny"},
+        {"role": "assistant", "content": "It is sunny."},
+    ])
+
+    assert store.load_tail("c1", limit=3) == []
+    tail = store.load_tail("c1", limit=4)
+    assert tail[1]["tool_calls"] == [call]
+    assert tail[2] == {"role": "tool", "content": "Sunny", "tool_call_id": "call_1", "name": "search"}
+    store.close()
+
+
+def test_disabled_store_saves_nothing(tmp_path):
+    store = ConversationStore(tmp_path / "store.sqlite3", enabled=False)
+    store.append("c1", [{"role": "user", "content": "Hi"}])
+    assert store.latest_conversation() is None
+
+
+def test_resume_continues_with_the_model_that_held_the_conversation(isolated_services):
+    get_store().append("c1", [{"role": "user", "content": "My name is Ada."},
+                              {"role": "assistant", "content": "Nice to meet you, Ada."}],
+                       provider="Gemini")
+
+    manager = ConversationManager(play_audio=False)
+    assert manager.resume_latest() == 2
+
+    assert manager.conversation_id == "c1"
+    assert manager.current_model.get_model_name() == "Gemini"
+    session = manager.current_model.primary.chat.history
+    assert [(content.role, content.parts[0].text) for content in session] == [
+        ("user", "My name is Ada."), ("model", "Nice to meet you, Ada.")]
@@ -0,0 +1,102 @@
+# tests/test_hedging.py
+import time
+import pytest
+from ai_interface import ModelResponse
+from cancellation import CancellationToken, TurnCancelledError
+from conftest import ScriptedModel
+from hedging import HedgedCaller
+from latency_stats import LatencyStats
+
+
+def make_generate(first_token_delays, errors=None):
+    """generate() whose models send one delta after their delay, or raise their error"""
+    errors = errors or {}
+    cancelled = []
+
+    def generate(model, token, on_delta, on_tool_call):
+        name = model.get_model_name()
+        if name in errors:
+            raise errors[name]
+        if token.wait(first_token_delays[name]):
+            cancelled.append(name)
+            raise TurnCancelledError(token.reason)
+        on_delta(f"{name} says hi")
+        return ModelResponse(text=f"{name} answer")
+
+    return generate, cancelled
+
+
+def test_hedge_delay_uses_default_until_enough_samples():
+    stats = LatencyStats()
+    caller = HedgedCaller(stats, percentile=0.9, min_samples=3, default_delay=4.0, min_delay=0.5)
+    assert caller.hedge_delay("ChatGPT") == 4.0
+    for seconds in (0.1, 0.2, 2.0):
+        stats.record("ChatGPT", LatencyStats.FIRST_TOKEN, seconds)
+    assert caller.hedge_delay("ChatGPT") == 2.0
+    stats.record("Claude", LatencyStats.FIRST_TOKEN, 0.01)
+    assert HedgedCaller(stats, min_samples=1).hedge_delay("Claude") == 0.5
+
+
+def test_fast_primary_is_not_hedged():
+    caller = HedgedCaller(LatencyStats(), default_delay=1.0)
+    generate, _ = make_generate({"ChatGPT": 0.0, "Claude": 0.0})
+    deltas = []
+    response = caller.call(ScriptedModel(name="ChatGPT"), ScriptedModel(name="Claude"),
+                           generate, CancellationToken(), on_delta=deltas.append)
+    assert response.text == "ChatGPT answer"
+    assert deltas == ["ChatGPT says hi"]
+
+
+def test_slow_primary_loses_to_secondary_and_is_cancelled():
+    caller = HedgedCaller(LatencyStats(), default_delay=0.05)
+    generate, cancelled = make_generate({"ChatGPT": 5.0, "Claude": 0.0})
+    started = time.monotonic()
+    response = caller.call(ScriptedModel(name="ChatGPT"), ScriptedModel(name="Claude"),
+                           generate, CancellationToken())
+    assert response.text == "Claude answer"
+    assert time.monotonic() - started < 2.0
+    deadline = time.monotonic() + 1.0
+    while not cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cancelled == ["ChatGPT"]
+
+
+def test_failed_primary_hedges_immediately():
+    caller = HedgedCaller(LatencyStats(), default_delay=10.0)
+    generate, _ = make_generate({"Claude": 0.0}, errors={"ChatGPT": RuntimeError("down")})
+    started = time.monotonic()
+    response = caller.call(ScriptedModel(name="ChatGPT"), ScriptedModel(name="Claude"),
+                           generate, CancellationToken())
+    assert response.text == "Claude answer"
+    assert time.monotonic() - started < 2.0
+
+
+def test_primary_error_wins_when_both_fail():
+    caller = HedgedCaller(LatencyStats(), default_delay=0.01)
+    generate, _ = make_generate({}, errors={"ChatGPT": RuntimeError("primary down"),
+                                            "Claude": RuntimeError("secondary down")})
+    with pytest.raises(RuntimeError, match="primary down"):
+        caller.call(ScriptedModel(name="ChatGPT"), ScriptedModel(name="Claude"), generate, CancellationToken())
+
+
+def test_cancel_stops_the_call():
+    caller = HedgedCaller(LatencyStats(), default_delay=10.0)
+    generate, _ = make_generate({"ChatGPT": 10.0, "Claude": 10.0})
+    token = CancellationToken()
+    token.cancel("stopped")
+    with pytest.raises(TurnCancelledError):
+        caller.call(ScriptedModel(name="ChatGPT"), ScriptedModel(name="Claude"), generate, token)
+
+
+def test_stateful_providers_are_not_hedged(manager):
+    with pytest.raises(ValueError):
+        manager.set_hedge_model("Gemini")
+
+    hedge = ScriptedModel(lambda messages, token: "hedge", name="Claude")
+    hedge.is_stateful = True
+    manager.hedge_model = hedge
+    manager.hedged_caller.default_delay = 0.0
+    manager.current_model = ScriptedModel(lambda messages, token: time.sleep(0.1) or "primary")
+
+    assert manager.get_response("Hello there") == "primary"
+    assert hedge.calls == []
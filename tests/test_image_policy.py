@@ -0,0 +1,51 @@
+# tests/test_image_policy.py
+import numpy as np
+from PIL import Image
+from chatgpt import ChatGPTModel
+from image_policy import ImagePolicy
+
+
+def write_image(path, width: int, height: int) -> str:
+    Image.fromarray(np.zeros((height, width, 3), dtype=np.uint8)).save(path, "JPEG")
+    return str(path)
+
+
+def test_classify_and_choose():
+    assert ImagePolicy.classify("What does this sign say?") == ImagePolicy.READ
+    assert ImagePolicy.classify("What do you see around me?") == ImagePolicy.SCENE
+    assert ImagePolicy.classify("What animal is this?") == ImagePolicy.IDENTIFY
+    assert ImagePolicy.choose("ChatGPT", "Read this page").size == 1024
+    assert ImagePolicy.choose("Unknown", "What is this?") == ImagePolicy.DEFAULT_SPEC
+
+
+def test_openai_detail_and_token_estimates():
+    assert ImagePolicy.openai_detail(512, 512) == "low"
+    assert ImagePolicy.openai_detail(1024, 768) == "high"
+    assert ImagePolicy.estimate_tokens("ChatGPT", 512, 512) == 85
+    assert ImagePolicy.estimate_tokens("ChatGPT", 1024, 768) == 85 + 170 * 4
+    assert ImagePolicy.estimate_tokens("Gemini", 4000, 3000) == 258
+
+
+def test_shape_never_scales_up():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert ImagePolicy.shape(frame, ImagePolicy.choose("ChatGPT", "What is this?")).size == (480, 480)
+    assert ImagePolicy.shape(frame, ImagePolicy.choose("ChatGPT", "Read this")).size == (640, 480)
+
+
+def test_chatgpt_sends_detail_for_image_turns_added_with_add_message(manager, isolated_services):
+    small = write_image(isolated_services / "small.jpg", 512, 512)
+    large = write_image(isolated_services / "large.jpg", 1024, 768)
+    manager.add_message("user", "What is this?", small)
+    manager.add_message("assistant", "A black square.")
+    manager.add_message("user", "Read the sign", large)
+    history = manager.conversation_history
+    model = ChatGPTModel()
+
+    messages = model.format_messages(history, large)
+
+    earlier, latest = messages[1]["content"], messages[-1]["content"]
+    assert latest[0] == {"type": "text", "text": "Read the sign"}
+    assert latest[1]["image_url"]["detail"] == "high"
+    # Older images are kept at low detail; the history itself is left as it was
+    assert earlier[1]["image_url"]["detail"] == "low"
+    assert "detail" not in history[-3]["content"][1]["image_url"]
@@ -0,0 +1,90 @@
+# tests/test_incremental_transcript.py
+from grok import GrokModel
+from incremental_transcript import IncrementalTranscript
+
+
+class CountingFormatter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, message):
+        self.calls += 1
+        if message["role"] == "system":
+            return []
+        return [{"role": message["role"], "content": [message["content"]]}]
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+def contents(formatted):
+    return [(entry["role"], entry["content"]) for entry in formatted]
+
+
+def test_only_new_messages_are_formatted():
+    formatter = CountingFormatter()
+    transcript = IncrementalTranscript(formatter)
+    history = [message("system", "prompt"), message("user", "hi")]
+    transcript.sync(history)
+    assert formatter.calls == 2
+    history.append(message("assistant", "hello"))
+    history.append(message("user", "how are you"))
+    assert contents(transcript.sync(history)) == [
+        ("user", ["hi"]), ("assistant", ["hello"]), ("user", ["how are you"])]
+    assert formatter.calls == 4
+
+
+def test_last_override_is_not_cached():
+    formatter = CountingFormatter()
+    transcript = IncrementalTranscript(formatter)
+    history = [message("user", "what is this")]
+    with_image = [{"role": "user", "content": ["what is this", "<image>"]}]
+    assert contents(transcript.sync(history, with_image)) == [("user", ["what is this", "<image>"])]
+    assert formatter.calls == 0
+    # On the next turn the message is formatted normally
+    history.append(message("assistant", "a cat"))
+    assert contents(transcript.sync(history)) == [("user", ["what is this"]), ("assistant", ["a cat"])]
+
+
+def test_rollback_and_replacement():
+    formatter = CountingFormatter()
+    transcript = IncrementalTranscript(formatter)
+    history = [message("user", "one"), message("assistant", "two")]
+    transcript.sync(history)
+    history.append(message("user", "cancelled"))
+    transcript.sync(history)
+    del history[2:]
+    history.append(message("user", "three"))
+    assert contents(transcript.sync(history)) == [
+        ("user", ["one"]), ("assistant", ["two"]), ("user", ["three"])]
+    # A new list (clear_history, resume) is reformatted from scratch
+    replaced = [message("user", "fresh")]
+    assert contents(transcript.sync(replaced)) == [("user", ["fresh"])]
+
+
+def test_merged_roles_survive_rollback():
+    transcript = IncrementalTranscript(CountingFormatter(), merge_roles=True)
+    history = [message("user", "a"), message("user", "b")]
+    assert contents(transcript.sync(history)) == [("user", ["a", "b"])]
+    history.append(message("user", "c"))
+    assert contents(transcript.sync(history)) == [("user", ["a", "b", "c"])]
+    del history[2:]
+    assert contents(transcript.sync(history)) == [("user", ["a", "b"])]
+    del history[1:]
+    assert contents(transcript.sync(history)) == [("user", ["a"])]
+
+
+def test_results_are_new_lists():
+    transcript = IncrementalTranscript(CountingFormatter())
+    history = [message("user", "hi")]
+    first = transcript.sync(history)
+    first.append("mutated")
+    assert len(transcript.sync(history)) == 1
+
+
+def test_grok_sends_one_system_message(manager):
+    manager.add_message("user", "hi")
+    formatted = GrokModel().format_messages(manager.conversation_history)
+    assert [entry["role"] for entry in formatted] == ["system", "user"]
+    assert formatted[0]["content"] == manager.conversation_history[0]["content"]
@@ -0,0 +1,75 @@
+# tests/test_model_comparison.py
+import threading
+import pytest
+from ai_interface import ModelResponse, ToolCall
+from camera_utils import CameraManager
+from conftest import ScriptedModel
+from model_comparison import ModelComparison
+from tools import ToolDefinitions
+
+
+def test_text_commands_run_the_camera_like_a_conversation(manager, monkeypatch):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+    replies = iter(['Looking. {"camera": "1"}', "A test pattern."])
+    model = ScriptedModel(lambda messages, token: next(replies), name="Perplexity")
+    monkeypatch.setattr(manager, "create_model", lambda provider: model)
+    comparison = ModelComparison(manager)
+    deltas = []
+
+    results = comparison.ask("What do you see?", ["Perplexity"], on_delta=lambda provider, delta: deltas.append(delta))
+
+    result = results["Perplexity"]
+    assert result.error is None
+    assert result.text == "Looking.\n\nA test pattern."
+    assert "".join(deltas) == "Looking. \n\nA test pattern."
+    assert result.usage.completion_tokens == 2
+    # The follow-up call carried the captured image
+    assert model.calls[1][-1]["content"][1]["type"] == "image_url"
+    comparison.close()
+
+
+def test_close_stops_the_pool(manager):
+    comparison = ModelComparison(manager)
+    comparison.close()
+    with pytest.raises(RuntimeError):
+        comparison.ask("Hi", ["ChatGPT"])
+
+
+def test_tool_calls_run_together_and_always_attach_the_image(manager, monkeypatch):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+    # The current model has described this scene; that answer is not for other models
+    manager.get_response("What is this?")
+    both_running = threading.Barrier(2, timeout=2.0)
+
+    def search(messages, token):
+        both_running.wait()
+        return "Sunny and warm."
+
+    manager.search_model = ScriptedModel(search, name="Perplexity")
+    capture_array = manager.camera.capture_array
+
+    def capture_when_search_runs(*args):
+        both_running.wait()
+        return capture_array(*args)
+
+    manager.camera.capture_array = capture_when_search_runs
+    calls = [ToolCall("call_camera", ToolDefinitions.CAMERA),
+             ToolCall("call_search", ToolDefinitions.SEARCH, {"query": "weather in Taipei"})]
+
+    def reply(messages, token):
+        if len(messages) == 2:
+            return ModelResponse(text="", tool_calls=calls)
+        return "Take an umbrella anyway."
+
+    model = ScriptedModel(reply, supports_tools=True)
+    monkeypatch.setattr(manager, "create_model", lambda provider: model)
+    comparison = ModelComparison(manager)
+
+    result = comparison.ask("Should I wear this outside?", ["ChatGPT"])["ChatGPT"]
+
+    assert result.error is None and result.text == "Take an umbrella anyway."
+    follow_up = model.calls[1]
+    assert [message["tool_call_id"] for message in follow_up if message["role"] == "tool"] == [
+        "call_camera", "call_search"]
+    assert follow_up[-1]["content"][1]["type"] == "image_url"
+    comparison.close()
@@ -0,0 +1,66 @@
+# tests/test_model_router.py
+import json
+from latency_stats import LatencyStats
+from model_router import ModelRouter, TurnClass
+
+
+def router(**kwargs) -> ModelRouter:
+    return ModelRouter(LatencyStats(), routes={"ChatGPT": {
+        TurnClass.CHAT: ["fast", "slow"],
+        TurnClass.GENERAL: ["big"],
+    }}, **kwargs)
+
+
+def record_first_tokens(model_router: ModelRouter, model: str, seconds: float, samples: int = 5) -> None:
+    for _ in range(samples):
+        model_router.latency_stats.record(ModelRouter.stats_key("ChatGPT", model), LatencyStats.FIRST_TOKEN, seconds)
+
+
+def test_classify():
+    model_router = router()
+    assert model_router.classify("Hi there!") == TurnClass.CHAT
+    assert model_router.classify("What is 12 x 7?") == TurnClass.MATH
+    assert model_router.classify("What is the weather today?") == TurnClass.SEARCH
+    assert model_router.classify("Hi", has_image=True) == TurnClass.VISION
+    assert model_router.classify("Can you explain to me why the sky looks blue in the day and red at sunset?") \
+        == TurnClass.GENERAL
+    assert model_router.classify("你好") == TurnClass.CHAT
+
+
+def test_first_candidate_until_measured_and_unknown_classes_fall_back_to_general():
+    model_router = router()
+    record_first_tokens(model_router, "fast", 5.0, samples=4)
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "fast"
+    assert model_router.choose("ChatGPT", TurnClass.MATH) == "big"
+    assert model_router.choose("Claude", TurnClass.CHAT) is None
+
+
+def test_slow_models_give_way_to_the_next_candidate_or_the_fastest():
+    model_router = router(latency_budgets={TurnClass.CHAT: 1.0})
+    record_first_tokens(model_router, "fast", 2.0)
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "slow"
+    record_first_tokens(model_router, "slow", 3.0)
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "fast"
+
+
+def test_failing_models_are_skipped_while_others_are_healthy():
+    model_router = router()
+    for _ in range(5):
+        model_router.record("ChatGPT", "fast", False)
+    assert model_router.failure_rate("ChatGPT", "fast") == 1.0
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "slow"
+    for _ in range(5):
+        model_router.record("ChatGPT", "slow", False)
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "fast"
+
+
+def test_load_overrides_defaults_and_ignores_broken_files(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"routes": {"ChatGPT": {"chat": ["custom"]}}, "latency_budgets": {"chat": 0.5}}))
+    model_router = ModelRouter.load(LatencyStats(), path)
+    assert model_router.choose("ChatGPT", TurnClass.CHAT) == "custom"
+    assert model_router.choose("ChatGPT", TurnClass.MATH) == "gpt-4o"
+    assert model_router.latency_budgets[TurnClass.CHAT] == 0.5
+
+    path.write_text("{broken")
+    assert ModelRouter.load(LatencyStats(), path).choose("ChatGPT", TurnClass.CHAT) == "gpt-4o-mini"
@@ -0,0 +1,152 @@
+# tests/test_resilience.py
+import time
+import pytest
+from ai_interface import ModelResponse
+from cancellation import CancellationToken, TurnCancelledError
+from conftest import ScriptedModel
+from resilience import (CircuitBreaker, ProviderError, ProviderTimeoutError, ResilientModel, RetryPolicy,
+                        is_retryable)
+
+
+class Flaky(Exception):
+    status_code = 503
+
+
+def hang_until_cancelled(token):
+    token.wait(10)
+    token.raise_if_cancelled()
+
+
+def test_is_retryable_follows_causes():
+    assert is_retryable(Flaky())
+    assert not is_retryable(ValueError("bad request"))
+    try:
+        try:
+            raise Flaky()
+        except Flaky as e:
+            raise ProviderError("wrapped", "ChatGPT") from e
+    except ProviderError as wrapped:
+        assert is_retryable(wrapped)
+    assert not is_retryable(ProviderError("explicit", retryable=False))
+    assert not is_retryable(TurnCancelledError())
+
+
+def test_retries_transient_errors_until_success():
+    attempts = []
+
+    def call(token):
+        attempts.append(token)
+        if len(attempts) < 3:
+            raise Flaky()
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+    assert policy.run(call) == "ok"
+    assert len(attempts) == 3
+
+
+def test_permanent_errors_are_not_retried():
+    attempts = []
+
+    def call(token):
+        attempts.append(token)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=3, base_delay=0.01).run(call)
+    assert len(attempts) == 1
+
+
+def test_deadline_covers_all_attempts():
+    policy = RetryPolicy(max_attempts=3, deadline=0.3, base_delay=0.01)
+    started = time.monotonic()
+    with pytest.raises(ProviderTimeoutError):
+        policy.run(hang_until_cancelled)
+    # Three hung attempts used to take three deadlines
+    assert time.monotonic() - started < 0.6
+
+
+def test_no_attempt_after_shared_deadline():
+    attempts = []
+    with pytest.raises(ProviderTimeoutError):
+        RetryPolicy().run(attempts.append, deadline_at=time.monotonic() - 1)
+    assert attempts == []
+
+
+def test_circuit_breaker_opens_and_lets_one_trial_through():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # Only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    return breaker
+
+
+@pytest.mark.parametrize("error", [ValueError("bad request"), TurnCancelledError("user cancelled")])
+def test_half_open_trial_ends_when_it_records_nothing(error):
+    breaker = half_open_breaker()
+    token = CancellationToken()
+
+    def call(attempt_token):
+        if isinstance(error, TurnCancelledError):
+            token.cancel("user cancelled")
+        raise error
+
+    with pytest.raises(type(error)):
+        RetryPolicy(base_delay=0.01).run(call, token, breaker=breaker)
+    # The failed trial reopens the breaker instead of leaving it half-open for good
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+
+class HangingModel(ScriptedModel):
+    def generate_response(self, messages, model, image_path=None, cancel_token=None, **kwargs):
+        hang_until_cancelled(cancel_token)
+
+
+def test_hung_primary_leaves_time_for_fallback():
+    fallback = ScriptedModel(lambda messages, token: "fallback answer", name="Claude")
+    model = ResilientModel(HangingModel(name="HungTestProvider"), lambda: fallback,
+                           RetryPolicy(max_attempts=3, deadline=0.5, base_delay=0.01))
+    started = time.monotonic()
+    response = model.generate_response([{"role": "user", "content": "hi"}], None)
+    assert response.text == "fallback answer"
+    assert time.monotonic() - started < 0.5
+
+
+def test_whole_call_bounded_when_fallback_hangs_too():
+    model = ResilientModel(HangingModel(name="HungTestProvider2"), lambda: HangingModel(name="HungTestFallback"),
+                           RetryPolicy(max_attempts=3, deadline=0.4, base_delay=0.01))
+    started = time.monotonic()
+    with pytest.raises(ProviderTimeoutError):
+        model.generate_response([{"role": "user", "content": "hi"}], None)
+    assert time.monotonic() - started < 0.7
+
+
+def test_no_fallback_after_output_reached_the_user():
+    class FailsAfterText(ScriptedModel):
+        def generate_response(self, messages, model, image_path=None, cancel_token=None,
+                              tools=None, on_tool_call=None, on_delta=None):
+            on_delta("Half an answer")
+            raise Flaky()
+
+    fallback = ScriptedModel(name="Claude")
+    model = ResilientModel(FailsAfterText(name="PartialTestProvider"), lambda: fallback,
+                           RetryPolicy(max_attempts=3, base_delay=0.01))
+    with pytest.raises(Flaky):
+        model.generate_response([{"role": "user", "content": "hi"}], None, on_delta=lambda delta: None)
+    assert fallback.calls == []
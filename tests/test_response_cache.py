@@ -0,0 +1,55 @@
+# tests/test_response_cache.py
+import time
+from conftest import ScriptedModel
+from response_cache import ResponseCache
+
+
+def test_normalized_questions_share_a_key():
+    cache = ResponseCache()
+    key = cache.key("What's 7 times 8?", "ChatGPT", "prompt", [])
+    assert cache.key("  whats 7 TIMES 8 ", "ChatGPT", "prompt", []) == key
+    assert cache.key("什么是猫", "ChatGPT", "prompt", []) == cache.key("什麼是貓？", "ChatGPT", "prompt", [])
+    assert cache.key("What's 7 times 8?", "Claude", "prompt", []) != key
+    assert cache.key("What's 7 times 8?", "ChatGPT", "new prompt", []) != key
+
+
+def test_follow_ups_key_on_the_reply_before_them():
+    cache = ResponseCache()
+    cats = [{"role": "assistant", "content": "Cats purr."}]
+    dogs = [{"role": "assistant", "content": "Dogs bark."}]
+    assert cache.key("Why?", "ChatGPT", "prompt", cats) != cache.key("Why?", "ChatGPT", "prompt", dogs)
+    assert cache.key("Hello", "ChatGPT", "prompt", cats) == cache.key("Hello", "ChatGPT", "prompt", dogs)
+
+
+def test_time_sensitive_and_variety_questions_are_not_cached():
+    cache = ResponseCache()
+    assert cache.cacheable("What is 7 times 8?")
+    assert not cache.cacheable("What's the weather today?")
+    assert not cache.cacheable("Tell me a joke")
+    assert not cache.cacheable("  ")
+
+
+def test_entries_expire_and_the_least_recently_used_are_evicted():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.store("a", "A")
+    cache.store("b", "B")
+    assert cache.lookup("a") == "A"
+    cache.store("c", "C")
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == "A"
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.lookup("c") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_cached_answer_reaches_the_model_session(manager):
+    model = ScriptedModel(lambda messages, token: "56", name="Gemini")
+    manager.current_model = model
+    assert manager.get_response("What is 7 times 8?") == "56"
+    manager.clear_history()
+    assert manager.get_response("What is 7 times 8?") == "56"
+
+    assert len(model.calls) == 1
+    assert model.exchanges == [("What is 7 times 8?", "56")]
+    assert [message["content"] for message in manager.conversation_history[1:]] == ["What is 7 times 8?", "56"]
@@ -0,0 +1,62 @@
+# tests/test_scene_cache.py
+import time
+import numpy as np
+from PIL import Image
+from camera_utils import CameraManager
+from conftest import ScriptedModel
+from scene_cache import SceneCache
+
+
+def write_image(path, seed: int) -> str:
+    pixels = np.random.default_rng(seed).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    Image.fromarray(pixels).resize((512, 512)).save(path, "JPEG")
+    return str(path)
+
+
+def test_same_scene_hashes_close_and_other_scene_far(tmp_path):
+    first = SceneCache.image_hash(write_image(tmp_path / "a.jpg", 1))
+    again = SceneCache.image_hash(write_image(tmp_path / "b.jpg", 1))
+    other = SceneCache.image_hash(write_image(tmp_path / "c.jpg", 2))
+    assert SceneCache.distance(first, again) <= 5
+    assert SceneCache.distance(first, other) > 5
+
+
+def test_lookup_matches_provider_distance_and_age():
+    cache = SceneCache(max_distance=2, ttl=60)
+    cache.store(0b1111, "what is this", "a cat", "ChatGPT")
+    assert cache.lookup(0b1110, "ChatGPT").answer == "a cat"
+    assert cache.lookup(0b1111, "Claude") is None
+    assert cache.lookup(0b0000, "ChatGPT") is None
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.lookup(0b1111, "ChatGPT") is None
+
+
+def test_same_question_tolerates_small_differences():
+    cache = SceneCache()
+    assert cache.same_question("What is this?", "what is this")
+    assert cache.same_question("這是什麼？", "這是什麼")
+    assert not cache.same_question("What is this?", "What color is it?")
+
+
+def test_repeated_scene_answer_reaches_the_model_session(manager):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+    model = ScriptedModel(lambda messages, token: "A test pattern.", name="Gemini")
+    manager.current_model = model
+    assert manager.get_response("What is this?") == "A test pattern."
+    assert manager.get_response("What is this?") == "A test pattern."
+
+    assert len(model.calls) == 1
+    assert model.exchanges == [("What is this?", "A test pattern.")]
+    assert [message["role"] for message in manager.conversation_history[1:]] == [
+        "user", "assistant", "user", "assistant"]
+
+
+def test_gemini_session_gets_cached_exchanges(isolated_services):
+    from gemini import GeminiModel
+    model = GeminiModel()
+    model.record_exchange("What is this?", "A red ball.")
+    model.record_exchange("What is this?", "Still a red ball.")
+    history = model.chat.history
+    assert [content.role for content in history] == ["user", "model", "user", "model"]
+    assert history[-1].parts[0].text == "Still a red ball."
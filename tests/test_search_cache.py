@@ -0,0 +1,58 @@
+# tests/test_search_cache.py
+import sqlite3
+from search_cache import SearchCache
+
+
+def age(cache: SearchCache, seconds: float) -> None:
+    """Make every stored result look older"""
+    for entry in cache._entries.values():
+        entry.created -= seconds
+    if cache.path:
+        with sqlite3.connect(cache.path) as connection:
+            connection.execute("UPDATE search_results SET created = created - ?", (seconds,))
+
+
+def test_rephrased_searches_share_a_result():
+    cache = SearchCache()
+    assert cache.terms("Search the news about the Mars rover") == cache.terms("mars rover news")
+    assert cache.terms("火星車") == cache.terms("火星车")
+    cache.store("Mars rover news", "Perseverance found a rock.")
+    assert cache.lookup("search the news about the Mars rover") == "Perseverance found a rock."
+    assert cache.lookup("Mars weather") is None
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_current_events_questions_get_only_recent_results():
+    cache = SearchCache(news_ttl=15 * 60)
+    cache.store("Mars rover mission", "Landed in 2021.")
+    age(cache, 20 * 60)
+
+    # "latest" is dropped from the terms, but an answer from 20 minutes ago is too old for it
+    assert cache.lookup("latest Mars rover mission") is None
+    assert cache.lookup("Mars rover mission") == "Landed in 2021."
+
+
+def test_results_expire():
+    cache = SearchCache(ttl=60, news_ttl=10)
+    cache.store("Mars rover news", "old news")
+    cache.store("Mars rover mission", "Landed in 2021.")
+    for entry in cache._entries.values():
+        entry.expires -= 30
+    assert cache.lookup("Mars rover news") is None
+    assert cache.lookup("Mars rover mission") == "Landed in 2021."
+
+
+def test_processes_share_results_through_the_file(tmp_path):
+    path = tmp_path / "search.sqlite3"
+    first, second = SearchCache(path), SearchCache(path)
+    first.store("Mars rover mission", "Landed in 2021.")
+    first.store("giant panda diet", "Mostly bamboo.")
+
+    assert second.lookup("the Mars rover mission") == "Landed in 2021."
+    # Near-identical searches are found when the exact terms are not stored
+    assert second.lookup("giant panda diet facts") == "Mostly bamboo."
+    age(second, 20 * 60)
+    third = SearchCache(path)
+    assert third.lookup("latest Mars rover mission") is None
+    for cache in (first, second, third):
+        cache.close()
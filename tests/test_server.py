@@ -0,0 +1,104 @@
+# tests/test_server.py
+import asyncio
+import io
+from pathlib import Path
+import numpy as np
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+from conftest import ScriptedModel
+from server import ConversationServer
+
+
+def jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.zeros((48, 64, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def run(scenario) -> None:
+    async def main():
+        server = ConversationServer(workers=2)
+        async with TestClient(TestServer(server.app())) as client:
+            await scenario(server, client)
+    asyncio.run(main())
+
+
+def test_malformed_json_is_a_bad_request(isolated_services):
+    async def scenario(server, client):
+        assert (await client.post("/sessions", data="{nope")).status == 400
+        session_id = (await (await client.post("/sessions", json={})).json())["session_id"]
+        assert (await client.post(f"/sessions/{session_id}/messages", data="{nope")).status == 400
+        assert (await client.post(f"/sessions/{session_id}/messages", json=["hi"])).status == 400
+    run(scenario)
+
+
+def test_take_photo_saves_the_uploaded_frame(isolated_services, monkeypatch):
+    monkeypatch.setattr(Path, "home", lambda: isolated_services)
+
+    async def scenario(server, client):
+        session_id = (await (await client.post("/sessions", json={})).json())["session_id"]
+        server.sessions[session_id].manager.current_model = ScriptedModel()
+        frame = jpeg()
+        assert (await client.post(f"/sessions/{session_id}/image", data=frame)).status == 200
+        reply = await (await client.post(f"/sessions/{session_id}/messages", json={"text": "take photo"})).json()
+        assert reply["text"].startswith("Photo saved to: ")
+        assert Path(reply["text"].split(": ", 1)[1]).read_bytes() == frame
+    run(scenario)
+
+
+def test_closing_a_session_cancels_its_turn(isolated_services):
+    async def scenario(server, client):
+        session_id = (await (await client.post("/sessions", json={})).json())["session_id"]
+        session = server.sessions[session_id]
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def wait_for_cancel(messages, token):
+            loop.call_soon_threadsafe(started.set)
+            token.wait(5.0)
+            return "too late"
+
+        session.manager.current_model = ScriptedModel(wait_for_cancel)
+        turn = asyncio.create_task(client.post(f"/sessions/{session_id}/messages", json={"text": "Hi"}))
+        await started.wait()
+        server._close(session, "session idle")
+        assert (await (await turn).json())["text"] == ""
+        assert session_id not in server.sessions
+    run(scenario)
+
+
+def test_unknown_model_is_a_bad_request_and_keeps_the_websocket_open(isolated_services):
+    async def scenario(server, client):
+        response = await client.post("/sessions", json={"model": "Nope"})
+        assert response.status == 400
+        assert "Unsupported model" in (await response.json())["error"]
+
+        session_id = (await (await client.post("/sessions", json={})).json())["session_id"]
+        session = server.sessions[session_id]
+        async with client.ws_connect(f"/sessions/{session_id}/ws") as ws:
+            await ws.send_json({"type": "model", "name": "Nope"})
+            error = await ws.receive_json(timeout=2)
+            assert error["type"] == "error" and "Unsupported model" in error["text"]
+            # Still open, and still on the old model and prompt
+            await ws.send_json({"type": "model", "name": "Nope"})
+            assert (await ws.receive_json(timeout=2))["type"] == "error"
+        assert session.manager.current_model.get_model_name() == "ChatGPT"
+    run(scenario)
+
+
+def test_sessions_with_an_open_websocket_are_not_reaped(isolated_services):
+    async def scenario(server, client):
+        session_id = (await (await client.post("/sessions", json={})).json())["session_id"]
+        session = server.sessions[session_id]
+        async with client.ws_connect(f"/sessions/{session_id}/ws") as ws:
+            while session.connections == 0:
+                await asyncio.sleep(0.01)
+            session.last_active -= server.idle_timeout + 1
+            server._close_idle()
+            assert session_id in server.sessions
+        while session.connections:
+            await asyncio.sleep(0.01)
+        session.last_active -= server.idle_timeout + 1
+        server._close_idle()
+        assert session_id not in server.sessions
+    run(scenario)
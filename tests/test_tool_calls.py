@@ -0,0 +1,40 @@
+# tests/test_tool_calls.py
+from ai_interface import ModelResponse, ToolCall
+from camera_utils import CameraManager
+from conftest import ScriptedModel
+from tools import ToolDefinitions
+
+
+def test_native_tool_call_result_goes_back_to_the_model(manager):
+    manager.set_camera(CameraManager.setup_camera("fake"))
+
+    def reply(messages, token):
+        if messages[-1]["role"] == "user" and isinstance(messages[-1]["content"], str):
+            return ModelResponse(text="Let me look.", tool_calls=[ToolCall("call_1", ToolDefinitions.CAMERA)])
+        return "A test pattern."
+
+    model = ScriptedModel(reply, supports_tools=True)
+    manager.current_model = model
+
+    assert manager.get_response("What can you see right now?") == "Let me look.\n\nA test pattern."
+
+    assert len(model.calls) == 2
+    assert {tool["name"] for tool in model.tools[0]} == {ToolDefinitions.CAMERA, ToolDefinitions.SEARCH}
+    follow_up = model.calls[1]
+    assert follow_up[-3]["tool_calls"] == [{"id": "call_1", "name": ToolDefinitions.CAMERA, "arguments": {}}]
+    assert follow_up[-2]["role"] == "tool" and follow_up[-2]["tool_call_id"] == "call_1"
+    # The captured image follows the tool result as user content
+    assert follow_up[-1]["content"][1]["type"] == "image_url"
+    assert manager.conversation_history[-1] == {"role": "assistant", "content": "A test pattern."}
+
+
+def test_last_round_has_to_answer_without_tools(manager):
+    manager.max_tool_rounds = 1
+    model = ScriptedModel(lambda messages, token: ModelResponse(
+        text="", tool_calls=[ToolCall(f"call_{len(messages)}", ToolDefinitions.CAMERA)]), supports_tools=True)
+    manager.current_model = model
+
+    manager.get_response("Look again and again")
+
+    assert len(model.calls) == 2
+    assert model.tools[1] is None
@@ -0,0 +1,67 @@
+# tests/test_tool_executor.py
+import threading
+import time
+from ai_interface import ModelResponse, ToolCall
+from camera_utils import CameraManager
+from conftest import ScriptedModel
+from tool_executor import ToolExecutor
+from tools import ToolDefinitions, ToolResult
+
+
+def test_calls_run_concurrently_and_results_keep_call_order():
+    both_running = threading.Barrier(2, timeout=2.0)
+
+    def execute(call):
+        both_running.wait()
+        time.sleep(0.05 if call.id == "first" else 0.0)
+        return ToolResult(call, call.id)
+
+    executor = ToolExecutor(max_workers=2)
+    run = executor.start(execute)
+    calls = [ToolCall("first", "a"), ToolCall("second", "b")]
+    assert [result.text for result in run.results(calls)] == ["first", "second"]
+    executor.shutdown()
+
+
+def test_identical_calls_run_once():
+    executed = []
+    executor = ToolExecutor()
+    run = executor.start(lambda call: executed.append(call.id) or ToolResult(call, "ok"))
+    results = run.results([ToolCall("1", "search", {"query": "cats"}), ToolCall("2", "search", {"query": "cats"})])
+    assert len(executed) == 1
+    assert [result.call.id for result in results] == ["1", "2"]
+    executor.shutdown()
+
+
+def test_camera_and_search_from_one_reply_run_together(manager):
+    camera = CameraManager.setup_camera("fake")
+    both_running = threading.Barrier(2, timeout=2.0)
+    capture_array = camera.capture_array
+
+    def capture_when_search_runs(*args):
+        both_running.wait()
+        return capture_array(*args)
+
+    camera.capture_array = capture_when_search_runs
+    manager.set_camera(camera)
+
+    def search(messages, token):
+        both_running.wait()
+        return "Sunny and warm."
+
+    manager.search_model = ScriptedModel(search, name="Perplexity")
+    calls = [ToolCall("call_camera", ToolDefinitions.CAMERA),
+             ToolCall("call_search", ToolDefinitions.SEARCH, {"query": "weather in Taipei"})]
+
+    def reply(messages, token):
+        if len(messages) == 2:
+            return ModelResponse(text="", tool_calls=calls)
+        return "Take an umbrella anyway."
+
+    model = ScriptedModel(reply, supports_tools=True)
+    manager.current_model = model
+
+    assert manager.get_response("Should I wear this outside?") == "Take an umbrella anyway."
+    tool_messages = [message for message in model.calls[1] if message["role"] == "tool"]
+    assert [message["tool_call_id"] for message in tool_messages] == ["call_camera", "call_search"]
+    assert tool_messages[1]["content"].endswith("Sunny and warm.")
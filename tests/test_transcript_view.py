@@ -0,0 +1,88 @@
+# tests/test_transcript_view.py
+from transcript_view import TranscriptModel
+
+
+def filled(count: int, max_history: int = 5000) -> TranscriptModel:
+    model = TranscriptModel(max_history)
+    for number in range(count):
+        model.add("human", "You: ", f"message {number}")
+    return model
+
+
+def test_new_messages_are_taken_once():
+    model = filled(3)
+    assert [message.text for message in model.take_new()] == ["message 0", "message 1", "message 2"]
+    assert model.take_new() == []
+    model.add("ChatGPT", "ChatGPT: ", "reply")
+    assert [message.text for message in model.take_new()] == ["reply"]
+
+
+def test_find_by_id_after_forgetting():
+    model = filled(10)
+    model.take_new()
+    model.trim(4)
+    model.forget(3)
+    assert model.messages[0].text == "message 3"
+    assert model.find(model.messages[0].id).text == "message 3"
+    assert model.find(1) is None
+    assert model.find(model.messages[-1].id + 1) is None
+
+
+def test_trim_keeps_max_visible():
+    model = filled(10)
+    model.take_new()
+    removed, first_kept = model.trim(4)
+    assert [message.text for message in removed] == [f"message {number}" for number in range(6)]
+    assert first_kept.text == "message 6"
+    assert model.first_visible == 6
+    assert model.trim(4) == ([], None)
+
+
+def test_previous_page_moves_back_and_keeps_anchor():
+    model = filled(10)
+    model.take_new()
+    model.trim(2)
+    page, anchor = model.previous_page(3)
+    assert [message.text for message in page] == ["message 5", "message 6", "message 7"]
+    assert anchor.text == "message 8"
+    assert model.first_visible == 5
+    page, anchor = model.previous_page(50)
+    assert len(page) == 5 and anchor.text == "message 5"
+    assert model.first_visible == 0
+    assert model.previous_page(50) == ([], None)
+
+
+def test_history_is_bounded_but_shown_messages_are_kept():
+    model = filled(10, max_history=4)
+    # Nothing has left the widget yet, so nothing can be forgotten
+    assert len(model.messages) == 10
+    model.take_new()
+    model.trim(2)
+    model.add("human", "You: ", "one more")
+    assert len(model.messages) == 4
+    assert model.messages[-1].text == "one more"
+    assert model.first_visible == 1 and model.rendered_count == 3
+    assert [message.text for message in model.messages[model.first_visible:model.rendered_count]] == [
+        "message 8", "message 9"]
+
+
+def test_only_rendered_changes_are_taken():
+    model = filled(5)
+    model.take_new()
+    model.trim(2)
+    streaming = model.add("ChatGPT", "ChatGPT: ", "", streaming=True)
+    model.mark_dirty(model.messages[0].id)   # Trimmed off the widget
+    model.mark_dirty(streaming.id)           # Not inserted yet
+    assert model.take_changed() == []
+    model.take_new()
+    model.mark_dirty(streaming.id)
+    assert model.take_changed() == [streaming]
+    assert model.take_changed() == []
+
+
+def test_length_counts_label_text_and_newlines():
+    model = TranscriptModel()
+    tagged = model.add("human", "You: ", "hi")
+    plain = model.add(None, "", "Welcome")
+    assert TranscriptModel.length(tagged) == 1 + 5 + 2 + 1
+    assert TranscriptModel.length(plain) == 7 + 1
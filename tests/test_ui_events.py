@@ -0,0 +1,82 @@
+# tests/test_ui_events.py
+from ui_events import AudioStateEvent, ResponseEvent, StatusEvent, TokenEvent, UIEventBus
+
+
+class FakeWidget:
+    """Records after() jobs instead of running a Tk loop; run_pending() fires them"""
+
+    def __init__(self):
+        self.jobs = {}
+        self._next_id = 0
+
+    def after(self, ms, callback):
+        self._next_id += 1
+        job = f"after#{self._next_id}"
+        self.jobs[job] = callback
+        return job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run_pending(self):
+        jobs, self.jobs = self.jobs, {}
+        for callback in jobs.values():
+            callback()
+
+
+def make_bus():
+    widget = FakeWidget()
+    bus = UIEventBus(widget)
+    applied = []
+    for event_type in (StatusEvent, TokenEvent, ResponseEvent, AudioStateEvent):
+        bus.subscribe(event_type, applied.append)
+    bus.start()
+    return widget, bus, applied
+
+
+def test_token_deltas_of_a_turn_are_joined():
+    widget, bus, applied = make_bus()
+    for text in ("Hel", "lo ", "there"):
+        bus.post(TokenEvent("t1", "ChatGPT", text))
+    bus.post(TokenEvent("t2", "ChatGPT", "Next"))
+
+    widget.run_pending()
+
+    assert applied == [TokenEvent("t1", "ChatGPT", "Hello there"), TokenEvent("t2", "ChatGPT", "Next")]
+    assert bus.posted == 4 and bus.batches == 1
+
+
+def test_audio_and_response_events_are_kept_and_only_the_last_status_shown():
+    widget, bus, applied = make_bus()
+    bus.status_callback("Thinking...")
+    bus.post(TokenEvent("t1", "ChatGPT", "Hi"))
+    bus.audio_callback(AudioStateEvent.PLAYING)
+    bus.post(TokenEvent("t1", "ChatGPT", "!"))
+    bus.status_callback("Speaking...")
+    bus.post(ResponseEvent("t1", "ChatGPT", "Hi!"))
+    bus.audio_callback(AudioStateEvent.STOPPED)
+
+    widget.run_pending()
+
+    # Audio events split the token run; nothing but the older status is dropped
+    assert applied == [
+        TokenEvent("t1", "ChatGPT", "Hi"),
+        AudioStateEvent(AudioStateEvent.PLAYING),
+        TokenEvent("t1", "ChatGPT", "!"),
+        ResponseEvent("t1", "ChatGPT", "Hi!"),
+        AudioStateEvent(AudioStateEvent.STOPPED),
+        StatusEvent("Speaking..."),
+    ]
+
+
+def test_broken_handler_does_not_stop_the_consumer():
+    widget, bus, applied = make_bus()
+    bus.subscribe(StatusEvent, lambda event: 1 / 0)
+    bus.status_callback("first")
+    widget.run_pending()
+    bus.status_callback("second")
+    widget.run_pending()
+
+    assert applied == [StatusEvent("first"), StatusEvent("second")]
+    bus.stop()
+    assert widget.jobs == {}
@@ -0,0 +1,79 @@
+# tool_executor.py
+import concurrent.futures
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from ai_interface import ToolCall
+from cancellation import CancellationToken
+from tools import ToolResult
+
+
+class ToolRun:
+    """
+    Tool calls of a single model reply, executed concurrently.
+    Calls may be submitted while the reply is still streaming; identical calls
+    (same name and arguments) run once and share their result.
+    """
+
+    def __init__(self,
+                 pool: concurrent.futures.ThreadPoolExecutor,
+                 execute: Callable[[ToolCall], ToolResult]):
+        self._pool = pool
+        self._execute = execute
+        self._lock = threading.Lock()
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._by_key: Dict[Tuple[str, str], concurrent.futures.Future] = {}
+
+    def submit(self, call: ToolCall) -> None:
+        """Start a tool call unless it (or an identical one) is already running"""
+        key = (call.name, repr(sorted(call.arguments.items())))
+        with self._lock:
+            if call.id in self._futures:
+                return
+            future = self._by_key.get(key)
+            if future is None:
+                future = self._pool.submit(self._execute, call)
+                self._by_key[key] = future
+            self._futures[call.id] = future
+
+    def results(self,
+                calls: List[ToolCall],
+                cancel_token: Optional[CancellationToken] = None) -> List[ToolResult]:
+        """
+        Wait for all calls and return their results in call order.
+        Total wait is the slowest tool, not the sum of all of them.
+        """
+        for call in calls:
+            self.submit(call)
+        with self._lock:
+            futures = [self._futures[call.id] for call in calls]
+
+        pending = set(futures)
+        while pending:
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            _, pending = concurrent.futures.wait(pending, timeout=0.1)
+
+        results = []
+        for call, future in zip(calls, futures):
+            result = future.result()
+            # Shared results are re-addressed to each call id
+            results.append(result if result.call.id == call.id else
+                           ToolResult(call, result.text, result.image_path))
+        return results
+
+
+class ToolExecutor:
+    """Worker pool shared by all turns for running tool calls"""
+
+    def __init__(self, max_workers: int = 4):
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="tool"
+        )
+
+    def start(self, execute: Callable[[ToolCall], ToolResult]) -> ToolRun:
+        """Begin collecting tool calls for one model reply"""
+        return ToolRun(self._pool, execute)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,86 @@
+# tools.py
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from ai_interface import ToolCall
+
+
+@dataclass
+class ToolResult:
+    """Outcome of running a single tool call"""
+    call: ToolCall
+    text: str
+    image_path: Optional[str] = None
+
+
+class ToolDefinitions:
+    """Provider-neutral definitions of the tools models can call"""
+
+    CAMERA = "capture_camera"
+    SEARCH = "online_search"
+
+    CAMERA_SPEC = {
+        "name": CAMERA,
+        "description": (
+            "Capture a photo with the camera in front of the user and receive it "
+            "for analysis. Use when the user asks about something they are showing, "
+            "e.g. 'what is this?'."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }
+
+    SEARCH_SPEC = {
+        "name": SEARCH,
+        "description": (
+            "Search the internet for current or factual information that you do not "
+            "know, such as news, recent events or exact figures."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Precise search query"
+                }
+            },
+            "required": ["query"]
+        }
+    }
+
+    @staticmethod
+    def get_tools(camera_available: bool) -> List[Dict]:
+        """Get the tool specs available for a turn"""
+        tools = [ToolDefinitions.SEARCH_SPEC]
+        if camera_available:
+            tools.insert(0, ToolDefinitions.CAMERA_SPEC)
+        return tools
+
+    @staticmethod
+    def to_openai(tools: List[Dict]) -> List[Dict]:
+        """Convert specs to the OpenAI-compatible `tools` format (ChatGPT, Grok)"""
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "parameters": tool["parameters"]
+                }
+            }
+            for tool in tools
+        ]
+
+    @staticmethod
+    def to_anthropic(tools: List[Dict]) -> List[Dict]:
+        """Convert specs to the Anthropic `tools` format"""
+        return [
+            {
+                "name": tool["name"],
+                "description": tool["description"],
+                "input_schema": tool["parameters"]
+            }
+            for tool in tools
+        ]
@@ -0,0 +1,325 @@
+# transcript_view.py
+import tkinter as tk
+from dataclasses import dataclass
+from tkinter import font, scrolledtext
+from typing import Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class TranscriptMessage:
+    """One chat message held by the view's model"""
+    id: int
+    tag: Optional[str]   # Color tag; None for plain text such as the welcome message
+    label: str           # Speaker label, e.g. "You: "
+    text: str
+    rendered: int = 0    # Characters of text already in the widget
+    streaming: bool = False
+
+
+class TranscriptModel:
+    """
+    Python-side bookkeeping of a TranscriptView, kept apart from Tk so it can
+    be tested and measured without a display.
+
+    Messages are held oldest first. The widget shows the slice from
+    first_visible up to rendered_count; messages past rendered_count are
+    waiting to be inserted. Message ids are consecutive, so a message is
+    found by subtraction rather than by search.
+    """
+
+    def __init__(self, max_history: int = 5000):
+        """
+        Args:
+            max_history: Messages kept for paging back; older ones are forgotten once they leave the widget
+        """
+        self.max_history = max_history
+        self.messages: List[TranscriptMessage] = []
+        self.first_visible = 0      # Index of the first message in the widget
+        self.rendered_count = 0     # Messages from the start of the model already in the widget
+        self._next_id = 0
+        self._dirty: Set[int] = set()
+
+    def add(self, tag: Optional[str], label: str, text: str, streaming: bool = False) -> TranscriptMessage:
+        self._next_id += 1
+        message = TranscriptMessage(self._next_id, tag, label, text, streaming=streaming)
+        self.messages.append(message)
+        if len(self.messages) > self.max_history + self.max_history // 2:
+            # Drop in chunks so the list copy is amortized over many messages
+            self.forget(len(self.messages) - self.max_history)
+        return message
+
+    def forget(self, count: int) -> None:
+        """Remove the oldest messages; ones shown in the widget are kept"""
+        count = min(count, self.first_visible)
+        if count <= 0:
+            return
+        del self.messages[:count]
+        self.first_visible -= count
+        self.rendered_count -= count
+
+    def position(self, message_id: int) -> int:
+        """Index of a message in the model"""
+        return message_id - self.messages[0].id if self.messages else -1
+
+    def find(self, message_id: int) -> Optional[TranscriptMessage]:
+        position = self.position(message_id)
+        return self.messages[position] if 0 <= position < len(self.messages) else None
+
+    def is_rendered(self, message: TranscriptMessage) -> bool:
+        return self.first_visible <= self.position(message.id) < self.rendered_count
+
+    def mark_dirty(self, message_id: int) -> Optional[TranscriptMessage]:
+        """Note that a message changed; returns it, or None if it is no longer held"""
+        message = self.find(message_id)
+        if message is not None:
+            self._dirty.add(message_id)
+        return message
+
+    def take_changed(self) -> List[TranscriptMessage]:
+        """Changed messages that are in the widget, clearing the change set"""
+        changed = [message for message in map(self.find, self._dirty)
+                   if message is not None and self.is_rendered(message)]
+        self._dirty.clear()
+        return changed
+
+    def take_new(self) -> List[TranscriptMessage]:
+        """Messages still to be inserted at the end of the widget; they count as rendered from now on"""
+        new = self.messages[self.rendered_count:]
+        self.rendered_count = len(self.messages)
+        return new
+
+    def trim(self, max_visible: int) -> Tuple[List[TranscriptMessage], Optional[TranscriptMessage]]:
+        """
+        Drop the oldest messages from the widget's slice so at most max_visible remain
+        Returns:
+            Tuple: Messages to remove from the widget, and the first one kept (None if nothing is removed)
+        """
+        excess = self.rendered_count - self.first_visible - max_visible
+        if excess <= 0:
+            return [], None
+        removed = self.messages[self.first_visible:self.first_visible + excess]
+        self.first_visible += excess
+        return removed, self.messages[self.first_visible]
+
+    def previous_page(self, page_size: int) -> Tuple[List[TranscriptMessage], Optional[TranscriptMessage]]:
+        """
+        Extend the widget's slice by up to page_size older messages
+        Returns:
+            Tuple: Messages to insert at the top, oldest first, and the message that was
+                   first before (None if there is nothing older)
+        """
+        if self.first_visible <= 0:
+            return [], None
+        anchor = self.messages[self.first_visible]
+        start = max(0, self.first_visible - page_size)
+        page = self.messages[start:self.first_visible]
+        self.first_visible = start
+        return page, anchor
+
+    def clear(self) -> None:
+        self.messages.clear()
+        self._dirty.clear()
+        self.first_visible = self.rendered_count = 0
+
+    @staticmethod
+    def length(message: TranscriptMessage) -> int:
+        """Characters a rendered message takes up in the widget"""
+        newline = 1 if message.tag else 0
+        return newline + len(message.label) + len(message.text) + 1
+
+
+class TranscriptView:
+    """
+    Bounded, virtualized chat transcript.
+
+    All messages live in a Python-side model; the Text widget only holds the
+    newest max_visible of them. Older messages are paged back in when the
+    user scrolls to the top, and dropped again once the view follows new
+    output. Inserts and streamed text are applied in one batch per frame,
+    so the cost of a message does not grow with the length of the session.
+
+    Tags use named fonts: resizing the fonts restyles every tag without
+    reconfiguring them. Must be used from the Tk thread.
+    """
+
+    FRAME_MS = 16    # One batched widget update per frame
+    PAGE_SIZE = 50   # Older messages paged in per scroll to the top
+
+    def __init__(self,
+                 parent: tk.Widget,
+                 text_font: font.Font,
+                 colors: Dict[str, str],
+                 max_visible: int = 200,
+                 max_history: int = 5000,
+                 **text_options):
+        """
+        Args:
+            parent: Parent widget
+            text_font: Font for message text; the bold speaker font follows its family and size
+            colors: Foreground color per speaker tag
+            max_visible: Messages kept in the widget while it follows new output
+            max_history: Messages kept in the model for paging back
+            text_options: Extra ScrolledText options, e.g. height
+        """
+        self.text_font = text_font
+        self.bold_font = font.Font(**text_font.actual())
+        self.bold_font.configure(weight="bold")
+        self.max_visible = max_visible
+
+        self.text = scrolledtext.ScrolledText(parent, wrap=tk.WORD, font=text_font, **text_options)
+        # Watch the scroll position to page in older messages at the top
+        self.text.configure(yscrollcommand=self._on_yscroll)
+
+        self.model = TranscriptModel(max_history)
+        self._flush_job: Optional[str] = None
+        self._page_job: Optional[str] = None
+
+        self.configure_speakers(colors)
+
+    # ---- Public API ----
+
+    def configure_speakers(self, colors: Dict[str, str]) -> None:
+        """Create the tags for each speaker; only needed again when colors change"""
+        for tag, color in colors.items():
+            self.text.tag_configure(tag, foreground=color, font=self.bold_font)
+            self.text.tag_configure(f"{tag}_text", foreground=color, font=self.text_font)
+
+    def set_font_size(self, size: int) -> None:
+        """Resize the transcript fonts; tags pick up the change by themselves"""
+        self.text_font.configure(size=size)
+        self.bold_font.configure(size=size)
+
+    def add_message(self, tag: Optional[str], label: str, text: str) -> int:
+        """
+        Append a complete message
+        Returns:
+            int: Message id
+        """
+        message = self.model.add(tag, label, text)
+        self._schedule_flush()
+        return message.id
+
+    def begin_message(self, tag: Optional[str], label: str) -> int:
+        """
+        Start a message whose text arrives in pieces through append_text
+        Returns:
+            int: Message id
+        """
+        message = self.model.add(tag, label, "", streaming=True)
+        self._schedule_flush()
+        return message.id
+
+    def append_text(self, message_id: int, delta: str) -> None:
+        """Add streamed text to a message started with begin_message"""
+        if not delta:
+            return
+        message = self.model.mark_dirty(message_id)
+        if message is not None:
+            message.text += delta
+            self._schedule_flush()
+
+    def finish_message(self, message_id: int) -> None:
+        """Mark a streamed message as complete"""
+        message = self.model.mark_dirty(message_id)
+        if message is not None:
+            message.streaming = False
+            self._schedule_flush()
+
+    def clear(self) -> None:
+        if self._flush_job:
+            self.text.after_cancel(self._flush_job)
+            self._flush_job = None
+        self.model.clear()
+        self.text.delete("1.0", tk.END)
+        for mark in self.text.mark_names():
+            if mark.startswith("msg"):
+                self.text.mark_unset(mark)
+
+    # ---- Widget updates ----
+
+    def _schedule_flush(self) -> None:
+        if self._flush_job is None:
+            self._flush_job = self.text.after(self.FRAME_MS, self._flush)
+
+    def _flush(self) -> None:
+        """Apply everything that changed since the last frame in one pass"""
+        self._flush_job = None
+        following = self._at_bottom()
+
+        # Streamed text for messages already in the widget
+        for message in self.model.take_changed():
+            self._append_rendered(message)
+
+        # New messages at the end
+        for message in self.model.take_new():
+            self._render(message, tk.END)
+
+        if following:
+            self._trim_top()
+            self.text.see(tk.END)
+
+    def _at_bottom(self) -> bool:
+        return self.text.yview()[1] >= 0.999
+
+    def _render(self, message: TranscriptMessage, index: str) -> None:
+        """Insert a message at index ("1.0" or END) and mark where it starts"""
+        start = self.text.index("1.0" if index == "1.0" else "end-1c")
+        if message.tag:
+            self.text.insert(index, f"\n{message.label}", message.tag)
+            self.text.insert(self._after(start, message.label, 1), f"{message.text}\n", f"{message.tag}_text")
+        else:
+            self.text.insert(index, f"{message.label}{message.text}\n")
+        message.rendered = len(message.text)
+        # Default (right) gravity: text paged in above pushes the mark along
+        self.text.mark_set(f"msg{message.id}", start)
+        if message.streaming:
+            # Streamed text goes in front of the message's trailing newline
+            end = self.text.index(f"msg{message.id} + {TranscriptModel.length(message)} chars - 1 chars")
+            self.text.mark_set(f"msg{message.id}_end", end)
+
+    def _append_rendered(self, message: TranscriptMessage) -> None:
+        end_mark = f"msg{message.id}_end"
+        if end_mark not in self.text.mark_names():
+            return
+        if message.rendered < len(message.text):
+            tags = (f"{message.tag}_text",) if message.tag else ()
+            self.text.insert(end_mark, message.text[message.rendered:], *tags)
+            message.rendered = len(message.text)
+        if not message.streaming:
+            self.text.mark_unset(end_mark)
+
+    def _after(self, start: str, label: str, extra: int) -> str:
+        return self.text.index(f"{start} + {len(label) + extra} chars")
+
+    def _trim_top(self) -> None:
+        """Keep at most max_visible messages in the widget"""
+        removed, new_first = self.model.trim(self.max_visible)
+        if not removed:
+            return
+        self.text.delete("1.0", f"msg{new_first.id}")
+        for message in removed:
+            self.text.mark_unset(f"msg{message.id}")
+            if f"msg{message.id}_end" in self.text.mark_names():
+                self.text.mark_unset(f"msg{message.id}_end")
+
+    # ---- Paging ----
+
+    def _on_yscroll(self, first: str, last: str) -> None:
+        self.text.vbar.set(first, last)
+        if float(first) <= 0.0 and self.model.first_visible > 0 and self._page_job is None:
+            # Not from inside the scroll callback; the widget is mid-update here
+            self._page_job = self.text.after_idle(self._page_in)
+
+    def _page_in(self) -> None:
+        """Insert the previous page of messages above the ones shown"""
+        self._page_job = None
+        if self.text.yview()[0] > 0.0:
+            return
+        page, anchor = self.model.previous_page(self.PAGE_SIZE)
+        if anchor is None:
+            return
+        # Inserting newest first at the top leaves them in order
+        for message in reversed(page):
+            self._render(message, "1.0")
+        # Keep the message the user was looking at in place
+        self.text.yview(f"msg{anchor.id}")
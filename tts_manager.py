@@ -1,25 +1,39 @@
 # tts_manager.py
 from pathlib import Path
-from openai import OpenAI
 import pygame
 import threading
 import os
-from typing import Callable
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
 import time
+from cancellation import CancellationToken, TurnCancelledError
+from resilience import ProviderError, RetryPolicy, get_breaker
+from provider_clients import openai_client
+from turn_tracer import get_tracer
+from key_manager import KeyManager
+import logging
+
+logger = logging.getLogger(__name__)
 
 class TTSManager:
-    def __init__(self, api_key_path: str = "openai_key.txt"):
+    def __init__(self, api_key_path: str = "openai_key.txt", audio_cache_entries: int = 32):
         """
         Initialize the TTS Manager.
         Args:
             api_key_path (str): Path to the file containing the OpenAI API key
+            audio_cache_entries (int): Recent replies whose audio is kept for repeats
         """
-        self.client = OpenAI(api_key=self._load_api_key(api_key_path))
-        pygame.mixer.init()
+        self.client = openai_client(self._load_api_key(api_key_path), KeyManager.get_base_url("openai"))
+        self.retry_policy = RetryPolicy(deadline=30.0)
+        # The mixer is opened on first playback; synthesize() alone needs no audio device
         self.is_playing = False
         self.current_thread = None
         self.current_audio_path = None
         self._lock = threading.Lock()
+        # MP3 of recent replies by (voice, text); a repeated answer is not synthesized again
+        self.audio_cache_entries = audio_cache_entries
+        self._audio_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._audio_cache_lock = threading.Lock()
    
         # Define voice mapping for different AI models
         self.voice_mapping = {
@@ -33,12 +47,15 @@ class TTSManager:
 
     def _load_api_key(self, filepath: str) -> str:
         """
-        Load the OpenAI API key from file.
+        Load the OpenAI API key from the environment override or from file.
         Args:
             filepath (str): Path to the API key file
         Returns:
             str: The API key
         """
+        override = os.environ.get(KeyManager.env_var("openai", "KEY"))
+        if override:
+            return override.strip()
         try:
             with open(filepath, "r") as file:
                 return file.read().strip()
@@ -50,8 +67,16 @@ class TTSManager:
                       text: str, 
                       language: str = "en",
                       status_callback: Callable[[str], None] = None,
-                      model_name: str = "ChatGPT") -> None:
-        """Modified to better communicate playback state"""
+                      model_name: str = "ChatGPT",
+                      cancel_token: Optional[CancellationToken] = None,
+                      turn_id: Optional[str] = None,
+                      audio_callback: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Synthesize text and start playback in the background.
+        Cancelling cancel_token closes the synthesis stream and skips playback.
+        audio_callback gets "playing" and "stopped" (see ui_events.AudioStateEvent)
+        from the player thread.
+        """
         if status_callback:
             status_callback("Generating speech...")
         
@@ -63,12 +88,36 @@ class TTSManager:
         try:
             voice = self.voice_mapping.get(model_name, self.voice_mapping['default'])
             
-            with self.client.audio.speech.with_streaming_response.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            ) as response:
-                response.stream_to_file(str(output_path))
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+
+            audio = self._cached_audio(voice, text)
+            if audio is not None:
+                output_path.write_bytes(audio)
+                get_tracer().metric(turn_id, "tts.cache", 1)
+            else:
+                chunks: List[bytes] = []
+
+                def synthesize_to_file(token: CancellationToken) -> None:
+                    chunks.clear()
+                    with open(output_path, "wb") as audio_file:
+                        def write(chunk: bytes) -> None:
+                            audio_file.write(chunk)
+                            chunks.append(chunk)
+                        self._synthesize(text, voice, write, token)
+
+                # Synthesis is idempotent until playback starts, so it can be retried
+                with get_tracer().span(turn_id, "tts.synthesis", characters=len(text)):
+                    self.retry_policy.run(
+                        synthesize_to_file,
+                        cancel_token,
+                        breaker=get_breaker("TTS"),
+                        name="TTS"
+                    )
+                self._remember_audio(voice, text, b"".join(chunks))
+
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
             
             if status_callback:
                 status_callback("Playing audio...")  # This will trigger the button state change
@@ -77,43 +126,150 @@ class TTSManager:
                 self.current_audio_path = output_path
                 self.current_thread = threading.Thread(
                     target=self._play_audio,
-                    args=(output_path, status_callback)
+                    args=(output_path, status_callback, turn_id, audio_callback)
                 )
                 self.current_thread.daemon = True
                 self.current_thread.start()
             
         except Exception as e:
-            print(f"[DEBUG] Error in text to speech conversion: {e}")
-            if status_callback:
-                status_callback(f"Error: {str(e)}")
+            if cancel_token and cancel_token.is_cancelled:
+                logger.debug("Text to speech cancelled")
+            else:
+                logger.warning("Error in text to speech conversion: %s", e)
+                if status_callback:
+                    status_callback(f"Error: {str(e)}")
             if output_path.exists():
                 try:
                     os.remove(output_path)
                 except Exception as e:
-                    print(f"[DEBUG] Error removing temporary file: {e}")
+                    logger.warning("Error removing temporary file: %s", e)
+
+
+
+    def synthesize(self,
+                   text: str,
+                   model_name: str = "ChatGPT",
+                   on_chunk: Optional[Callable[[bytes], None]] = None,
+                   cancel_token: Optional[CancellationToken] = None,
+                   turn_id: Optional[str] = None) -> bytes:
+        """
+        Synthesize speech without playing it, for callers that deliver the audio themselves
+        Args:
+            text: Text to speak
+            model_name: Model whose voice to use
+            on_chunk: Gets the MP3 data in pieces as it arrives
+        Returns:
+            bytes: The whole MP3
+        """
+        voice = self.voice_mapping.get(model_name, self.voice_mapping['default'])
+        audio = self._cached_audio(voice, text)
+        if audio is not None:
+            get_tracer().metric(turn_id, "tts.cache", 1)
+            if on_chunk:
+                on_chunk(audio)
+            return audio
+        chunks: List[bytes] = []
+
+        def write(chunk: bytes) -> None:
+            chunks.append(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+
+        def attempt(token: CancellationToken) -> None:
+            try:
+                self._synthesize(text, voice, write, token)
+            except TurnCancelledError:
+                raise
+            except Exception as e:
+                if chunks:
+                    # A retry would send the start of the audio twice
+                    raise ProviderError(f"Speech stream failed after audio was sent: {e}", "TTS",
+                                        retryable=False) from e
+                raise
+
+        with get_tracer().span(turn_id, "tts.synthesis", characters=len(text)):
+            self.retry_policy.run(attempt, cancel_token, breaker=get_breaker("TTS"), name="TTS")
+        audio = b"".join(chunks)
+        self._remember_audio(voice, text, audio)
+        return audio
+
+    def _cached_audio(self, voice: str, text: str) -> Optional[bytes]:
+        with self._audio_cache_lock:
+            audio = self._audio_cache.get((voice, text))
+            if audio is not None:
+                self._audio_cache.move_to_end((voice, text))
+            return audio
+
+    def clear_audio_cache(self) -> None:
+        with self._audio_cache_lock:
+            self._audio_cache.clear()
 
+    def _remember_audio(self, voice: str, text: str, audio: bytes) -> None:
+        if not audio or not self.audio_cache_entries:
+            return
+        with self._audio_cache_lock:
+            self._audio_cache[(voice, text)] = audio
+            self._audio_cache.move_to_end((voice, text))
+            while len(self._audio_cache) > self.audio_cache_entries:
+                self._audio_cache.popitem(last=False)
 
+    def _synthesize(self,
+                    text: str,
+                    voice: str,
+                    write: Callable[[bytes], None],
+                    cancel_token: CancellationToken) -> None:
+        """Stream synthesized speech to write, closing the stream on cancel"""
+        with self.client.audio.speech.with_streaming_response.create(
+            model="tts-1",
+            voice=voice,
+            input=text
+        ) as response:
+            unregister = cancel_token.register(response.close)
+            try:
+                for chunk in response.iter_bytes():
+                    cancel_token.raise_if_cancelled()
+                    write(chunk)
+            except TurnCancelledError:
+                raise
+            except Exception:
+                if cancel_token.is_cancelled:
+                    raise TurnCancelledError(cancel_token.reason or "cancelled")
+                raise
+            finally:
+                unregister()
 
-    def _play_audio(self, audio_path: Path, status_callback: Callable[[str], None] = None) -> None:
+    def _play_audio(self,
+                    audio_path: Path,
+                    status_callback: Callable[[str], None] = None,
+                    turn_id: Optional[str] = None,
+                    audio_callback: Optional[Callable[[str], None]] = None) -> None:
         """
         Play the audio file and clean up afterwards.
         """
         try:
             with self._lock:
                 if not self.is_playing:
+                    if not pygame.mixer.get_init():
+                        pygame.mixer.init()
                     pygame.mixer.music.load(str(audio_path))
                     self.is_playing = True
                     # Notify that audio is starting
                     if status_callback:
                         status_callback("Playing audio...")
+                    if audio_callback:
+                        audio_callback("playing")
                     pygame.mixer.music.play()
+                    # Time from the start of the turn until the kid hears something
+                    since_start = get_tracer().since_turn_start(turn_id) if turn_id else None
+                    if since_start is not None:
+                        get_tracer().record(turn_id, "tts.playback_start", since_start)
         
             # Wait for playback to finish or stop command
             while self.is_playing and pygame.mixer.music.get_busy():
                 time.sleep(0.1)
         
         except Exception as e:
-            print(f"Error playing audio: {e}")
+            logger.warning("Error playing audio: %s", e)
             if status_callback:
                 status_callback(f"Error playing audio: {str(e)}")
     
@@ -125,17 +281,19 @@ class TTSManager:
                     pygame.mixer.music.stop()
                     pygame.mixer.music.unload()
                 except Exception as e:
-                    print(f"Error stopping audio: {e}")
+                    logger.warning("Error stopping audio: %s", e)
             
                 if audio_path.exists():
                     try:
                         os.remove(audio_path)
                     except Exception as e:
-                        print(f"Error removing audio file: {e}")
+                        logger.warning("Error removing audio file: %s", e)
             
                 # Notify that audio has stopped
                 if status_callback:
                     status_callback("---")
+                if audio_callback:
+                    audio_callback("stopped")
             
                 self.current_audio_path = None
 
@@ -149,13 +307,13 @@ class TTSManager:
                     pygame.mixer.music.stop()
                     pygame.mixer.music.unload()
                 except Exception as e:
-                    print(f"[DEBUG] Error stopping playback: {e}")
+                    logger.warning("Error stopping playback: %s", e)
                 
                 if self.current_audio_path and self.current_audio_path.exists():
                     try:
                         os.remove(self.current_audio_path)
                     except Exception as e:
-                        print(f"[DEBUG] Error removing current audio file: {e}")
+                        logger.warning("Error removing current audio file: %s", e)
                 
                 self.current_audio_path = None
 
@@ -0,0 +1,173 @@
+# turn_tracer.py
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+class TurnTracer:
+    """
+    Structured timing spans for conversation turns.
+
+    Every span carries a turn id and a stage name (record_stop, transcribe,
+    llm, llm.first_token, camera, search, tts.synthesis, tts.playback_start)
+    and is appended to a JSONL trace file by a background writer thread, so
+    tracing never blocks the conversation.
+    """
+
+    DEFAULT_PATH = Path("traces") / "turns.jsonl"
+
+    def __init__(self, path: Optional[Path] = None, enabled: bool = True):
+        self.path = Path(path) if path else self.DEFAULT_PATH
+        self.enabled = enabled
+        self._turn_started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def new_turn(self) -> str:
+        """Start a new turn and return its id"""
+        turn_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._turn_started[turn_id] = time.monotonic()
+            # Keep only recent turns; old ids are never looked up again
+            if len(self._turn_started) > 1000:
+                oldest = next(iter(self._turn_started))
+                del self._turn_started[oldest]
+        return turn_id
+
+    def since_turn_start(self, turn_id: str) -> Optional[float]:
+        """Seconds elapsed since the turn started, if known"""
+        with self._lock:
+            started = self._turn_started.get(turn_id)
+        return time.monotonic() - started if started is not None else None
+
+    @contextmanager
+    def span(self, turn_id: Optional[str], stage: str, **attributes) -> Iterator[Dict]:
+        """
+        Time a block of work. The yielded dict can be filled with attributes
+        that are only known once the work is done.
+        """
+        started = time.monotonic()
+        extra: Dict = {}
+        error = None
+        try:
+            yield extra
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            attributes.update(extra)
+            if error:
+                attributes["error"] = error
+            self.record(turn_id, stage, time.monotonic() - started, **attributes)
+
+    def record(self, turn_id: Optional[str], stage: str, seconds: float, **attributes) -> None:
+        """Record a duration measured elsewhere"""
+        self._put(turn_id, stage, {"duration_ms": round(seconds * 1000, 2)}, attributes)
+
+    def metric(self, turn_id: Optional[str], name: str, value: float, **attributes) -> None:
+        """Record a per-turn count or other value that is not a duration"""
+        self._put(turn_id, name, {"value": value}, attributes)
+
+    def _put(self, turn_id: Optional[str], stage: str, measurement: Dict, attributes: Dict) -> None:
+        if not self.enabled or not turn_id:
+            return
+        self._ensure_writer()
+        entry = {
+            "turn_id": turn_id,
+            "stage": stage,
+            "ts": round(time.time(), 3),
+        }
+        entry.update(measurement)
+        entry.update(attributes)
+        self._queue.put(entry)
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="turn-tracer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as trace_file:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    break
+                trace_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                # Flush when idle so the file is current without a write per span
+                if self._queue.empty():
+                    trace_file.flush()
+
+    def close(self) -> None:
+        """Flush pending spans and stop the writer thread"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            self._queue.put(None)
+            writer.join(timeout=2.0)
+
+    @staticmethod
+    def percentile(values: List[float], fraction: float) -> float:
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+    @staticmethod
+    def summarize(path: Optional[Path] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize a trace file
+        Returns:
+            Dict[str, Dict[str, float]]: Per stage: count, p50_ms and p95_ms
+                                         (metrics are left out)
+        """
+        durations: Dict[str, List[float]] = {}
+        with open(Path(path) if path else TurnTracer.DEFAULT_PATH, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if "duration_ms" in entry:
+                    durations.setdefault(entry["stage"], []).append(entry["duration_ms"])
+
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": TurnTracer.percentile(values, 0.50),
+                "p95_ms": TurnTracer.percentile(values, 0.95),
+            }
+            for stage, values in sorted(durations.items())
+        }
+
+
+# The writer thread only starts with the first recorded span
+_default_tracer = TurnTracer()
+
+
+def get_tracer() -> TurnTracer:
+    """Get the process-wide tracer"""
+    return _default_tracer
+
+
+def set_tracer(tracer: TurnTracer) -> None:
+    """Replace the process-wide tracer, e.g. to trace a benchmark run to its own file"""
+    global _default_tracer
+    _default_tracer = tracer
+
+
+if __name__ == "__main__":
+    # Usage: python turn_tracer.py [trace.jsonl]
+    summary = TurnTracer.summarize(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}")
+    for stage, stats in summary.items():
+        print(f"{stage:<24}{stats['count']:>8}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}")
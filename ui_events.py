@@ -0,0 +1,137 @@
+# ui_events.py
+import logging
+import queue
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusEvent:
+    """Status line text; only the newest one in a batch is shown"""
+    message: str
+
+
+@dataclass(frozen=True)
+class TokenEvent:
+    """A piece of streamed reply text for a turn"""
+    turn_id: str
+    speaker: str
+    text: str
+
+
+@dataclass(frozen=True)
+class ResponseEvent:
+    """A finished turn: the full reply, empty if the turn was cancelled"""
+    turn_id: str
+    speaker: str
+    text: str
+
+
+@dataclass(frozen=True)
+class TranscriptionEvent:
+    """Text transcribed from a voice recording, to be sent as the next input"""
+    turn_id: str
+    text: str
+
+
+@dataclass(frozen=True)
+class AudioStateEvent:
+    """Microphone and speaker state changes"""
+    state: str
+
+    RECORDING_STOPPED = "recording_stopped"
+    PLAYING = "playing"
+    STOPPED = "stopped"
+
+
+class UIEventBus:
+    """
+    Hands events from worker threads to the Tk thread.
+
+    Producers call post() from any thread; nothing there touches Tk. A single
+    consumer, driven by after() on the Tk thread, drains the queue every
+    interval and applies the batch: adjacent token events for the same turn
+    are joined, and only the last status of the batch is shown, so a burst of
+    events costs one redraw instead of one per event.
+    """
+
+    def __init__(self, widget, interval_ms: int = 33):
+        """
+        Args:
+            widget: Any Tk widget, used for after() scheduling
+            interval_ms: Time between drains of the queue
+        """
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._handlers: Dict[Type, List[Callable]] = defaultdict(list)
+        self._job: Optional[str] = None
+        # Counters for checking how much coalescing saves
+        self.posted = 0
+        self.batches = 0
+
+    def subscribe(self, event_type: Type, handler: Callable) -> None:
+        """Call handler(event) on the Tk thread for every applied event of event_type"""
+        self._handlers[event_type].append(handler)
+
+    def post(self, event) -> None:
+        """Queue an event; safe to call from any thread"""
+        self.posted += 1
+        self._queue.put(event)
+
+    def status_callback(self, message: str) -> None:
+        """Drop-in status_callback for ConversationManager and TTSManager"""
+        self.post(StatusEvent(message))
+
+    def audio_callback(self, state: str) -> None:
+        self.post(AudioStateEvent(state))
+
+    def start(self) -> None:
+        if self._job is None:
+            self._job = self.widget.after(self.interval_ms, self._drain)
+
+    def stop(self) -> None:
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _drain(self) -> None:
+        events = []
+        try:
+            while True:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if events:
+            self.batches += 1
+            self._apply(self._coalesce(events))
+        self._job = self.widget.after(self.interval_ms, self._drain)
+
+    @staticmethod
+    def _coalesce(events: List) -> List:
+        """Join adjacent token events of one turn; keep only the last status, applied last"""
+        result = []
+        status = None
+        for event in events:
+            if isinstance(event, StatusEvent):
+                status = event
+            elif (isinstance(event, TokenEvent) and result and isinstance(result[-1], TokenEvent)
+                  and result[-1].turn_id == event.turn_id):
+                result[-1] = TokenEvent(event.turn_id, event.speaker, result[-1].text + event.text)
+            else:
+                result.append(event)
+        if status is not None:
+            result.append(status)
+        return result
+
+    def _apply(self, events: List) -> None:
+        for event in events:
+            for handler in self._handlers.get(type(event), ()):
+                try:
+                    handler(event)
+                except Exception as e:
+                    # One broken handler must not stop the consumer loop
+                    logger.warning("Error handling %s: %s", type(event).__name__, e)
@@ -0,0 +1,218 @@
+# usage_ledger.py
+import argparse
+import atexit
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ai_interface import Usage
+
+
+class UsageLedger:
+    """
+    Token and cost accounting for provider calls.
+
+    Every generate_response call becomes one row (provider, model, session,
+    turn, prompt/completion/cached/image tokens, latency) in a local SQLite
+    database. Rows are written by a background thread, so accounting never
+    blocks the conversation. report() aggregates the rows by provider, model,
+    day or session with cost and output tokens per second.
+    """
+
+    DEFAULT_PATH = Path("traces") / "usage.sqlite3"
+
+    # USD per million tokens: (prompt, cached prompt, completion), matched by model id prefix
+    PRICES: Dict[str, Tuple[float, float, float]] = {
+        "gpt-4o-mini": (0.15, 0.075, 0.60),
+        "gpt-4o": (2.50, 1.25, 10.00),
+        "claude-3-5-sonnet": (3.00, 0.30, 15.00),
+        "claude-3-5-haiku": (0.80, 0.08, 4.00),
+        "gemini-1.5-flash": (0.075, 0.01875, 0.30),
+        "gemini-1.5-flash-8b": (0.0375, 0.01, 0.15),
+        "gemini-1.5-pro": (1.25, 0.3125, 5.00),
+        "grok-beta": (5.00, 5.00, 15.00),
+        "grok-vision-beta": (5.00, 5.00, 15.00),
+        "llama-3.1-sonar-small": (0.20, 0.20, 0.20),
+        "llama-3.1-sonar-large": (1.00, 1.00, 1.00),
+    }
+
+    GROUPS = ("provider", "model", "day", "session_id")
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS usage (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            day TEXT NOT NULL,
+            session_id TEXT,
+            turn_id TEXT,
+            round INTEGER,
+            provider TEXT NOT NULL,
+            model TEXT,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            cached_tokens INTEGER NOT NULL,
+            image_tokens INTEGER NOT NULL,
+            latency REAL NOT NULL
+        )
+    """
+
+    def __init__(self, path: Optional[Path] = None, enabled: bool = True):
+        self.path = Path(path) if path else self.DEFAULT_PATH
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def record(self,
+               usage: Usage,
+               session_id: Optional[str] = None,
+               turn_id: Optional[str] = None,
+               round_number: int = 0) -> None:
+        """Queue one provider call for the ledger"""
+        if not self.enabled or not usage.provider:
+            return
+        self._ensure_writer()
+        now = time.time()
+        self._queue.put((
+            round(now, 3), time.strftime("%Y-%m-%d", time.localtime(now)), session_id, turn_id, round_number,
+            usage.provider, usage.model, usage.prompt_tokens, usage.completion_tokens,
+            usage.cached_tokens, usage.image_tokens, round(usage.latency, 4)
+        ))
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="usage-ledger", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute(self._SCHEMA)
+            while True:
+                row = self._queue.get()
+                if row is None:
+                    break
+                connection.execute(
+                    "INSERT INTO usage (ts, day, session_id, turn_id, round, provider, model, prompt_tokens,"
+                    " completion_tokens, cached_tokens, image_tokens, latency)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                # Commit when idle so bursts share one transaction
+                if self._queue.empty():
+                    connection.commit()
+        finally:
+            connection.commit()
+            connection.close()
+
+    def close(self) -> None:
+        """Write pending rows and stop the writer thread"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            self._queue.put(None)
+            writer.join(timeout=2.0)
+
+    @classmethod
+    def price_for(cls, model: Optional[str]) -> Optional[Tuple[float, float, float]]:
+        """Prices for a model id; the longest matching prefix wins"""
+        matches = [prefix for prefix in cls.PRICES if model and model.startswith(prefix)]
+        return cls.PRICES[max(matches, key=len)] if matches else None
+
+    @classmethod
+    def cost(cls, model: Optional[str], prompt_tokens: int, cached_tokens: int,
+             completion_tokens: int) -> Optional[float]:
+        """Cost in USD, or None for a model without a price"""
+        prices = cls.price_for(model)
+        if prices is None:
+            return None
+        prompt_price, cached_price, completion_price = prices
+        return ((prompt_tokens - cached_tokens) * prompt_price + cached_tokens * cached_price
+                + completion_tokens * completion_price) / 1_000_000
+
+    @classmethod
+    def report(cls, path: Optional[Path] = None, group_by: str = "provider") -> List[Dict]:
+        """
+        Aggregate the ledger
+        Args:
+            path: Ledger database (default DEFAULT_PATH)
+            group_by: One of GROUPS
+        Returns:
+            List[Dict]: Per group: calls, token sums, prompt tokens per call,
+                        cost in USD (None if no call had a known price) and
+                        output tokens per second
+        """
+        if group_by not in cls.GROUPS:
+            raise ValueError(f"group_by must be one of {cls.GROUPS}")
+        connection = sqlite3.connect(Path(path) if path else cls.DEFAULT_PATH)
+        try:
+            # Grouped by model as well, since prices are per model
+            rows = connection.execute(
+                f"SELECT {group_by}, model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens),"
+                " SUM(cached_tokens), SUM(image_tokens), SUM(latency)"
+                f" FROM usage GROUP BY {group_by}, model ORDER BY {group_by}"
+            ).fetchall()
+        finally:
+            connection.close()
+
+        groups: Dict[str, Dict] = {}
+        for key, model, calls, prompt, completion, cached, image, latency in rows:
+            group = groups.setdefault(key, {
+                group_by: key, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cached_tokens": 0, "image_tokens": 0, "latency": 0.0, "cost": None,
+            })
+            group["calls"] += calls
+            group["prompt_tokens"] += prompt
+            group["completion_tokens"] += completion
+            group["cached_tokens"] += cached
+            group["image_tokens"] += image
+            group["latency"] += latency
+            cost = cls.cost(model, prompt, cached, completion)
+            if cost is not None:
+                group["cost"] = (group["cost"] or 0.0) + cost
+
+        for group in groups.values():
+            group["prompt_per_call"] = group["prompt_tokens"] / group["calls"]
+            group["tokens_per_second"] = (group["completion_tokens"] / group["latency"]
+                                          if group["latency"] else 0.0)
+        return list(groups.values())
+
+
+# The writer thread only starts with the first recorded call
+_default_ledger = UsageLedger()
+
+
+def get_ledger() -> UsageLedger:
+    """Get the process-wide usage ledger"""
+    return _default_ledger
+
+
+def set_ledger(ledger: UsageLedger) -> None:
+    """Replace the process-wide ledger, e.g. to keep a benchmark run out of the real one"""
+    global _default_ledger
+    _default_ledger = ledger
+
+
+if __name__ == "__main__":
+    # Usage: python usage_ledger.py [--by provider|model|day|session_id] [--path usage.sqlite3]
+    parser = argparse.ArgumentParser(description="Token and cost report from the usage ledger")
+    parser.add_argument("--by", choices=UsageLedger.GROUPS, default="provider")
+    parser.add_argument("--path", type=Path, default=UsageLedger.DEFAULT_PATH)
+    args = parser.parse_args()
+    if not args.path.exists():
+        print(f"No usage ledger at {args.path}")
+        sys.exit(1)
+
+    print(f"{args.by:<36}{'calls':>7}{'prompt':>10}{'/call':>8}{'cached':>9}{'image':>9}"
+          f"{'output':>9}{'tok/s':>8}{'cost $':>10}")
+    for group in UsageLedger.report(args.path, args.by):
+        cost = f"{group['cost']:>10.4f}" if group["cost"] is not None else f"{'?':>10}"
+        print(f"{str(group[args.by]):<36}{group['calls']:>7}{group['prompt_tokens']:>10}"
+              f"{group['prompt_per_call']:>8.0f}{group['cached_tokens']:>9}{group['image_tokens']:>9}"
+              f"{group['completion_tokens']:>9}{group['tokens_per_second']:>8.1f}{cost}")